@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Measures how long it takes to read a subreddit, resolve its videos and download them.
+
+Run once with `--record` and Reddit credentials to save the traffic to a fixture archive. Later
+runs replay the archive, so they need no network access and are reproducible. Must be run from
+a directory with a `reddit_api_config.toml`; when replaying, its credentials can be made up.
+With `--fast`, listings are read straight from the JSON API instead of through PRAW.
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+
+from rvidmaker.net import set_session
+from rvidmaker.readers.reddit import RedditReader
+from rvidmaker.replay import record_session, replay_session
+
+
+def main(archive, subreddit, limit, downloads, record, latency, bandwidth, fast):
+    if record:
+        session = record_session(archive)
+    else:
+        session = replay_session(archive, latency=latency, bandwidth=bandwidth)
+    set_session(session)
+
+    timings = []
+    start = time.perf_counter()
+    reader = RedditReader(session=session, fast_listings=fast)
+    articles = list(
+        reader.iter_articles(
+            subreddit, time_filter="week", limit=limit, video_only=True
+        )
+    )
+    timings.append(("listing", time.perf_counter() - start))
+
+    start = time.perf_counter()
+    results = reader.get_videos(articles)
+    videos = [r.video for r in results if r.video is not None]
+    timings.append(("resolve", time.perf_counter() - start))
+
+    work_dir = tempfile.mkdtemp(prefix="rvidmaker-bench-")
+    try:
+        start = time.perf_counter()
+        for i, video in enumerate(videos[:downloads]):
+            video.download("{}/vid{:04d}.mp4".format(work_dir, i))
+        timings.append(("download", time.perf_counter() - start))
+    finally:
+        shutil.rmtree(work_dir)
+
+    print(
+        "{} articles, {} videos, {} downloaded".format(
+            len(articles), len(videos), min(downloads, len(videos))
+        )
+    )
+    listing_time = timings[0][1]
+    if listing_time > 0:
+        print("{:.0f} articles per minute".format(len(articles) * 60 / listing_time))
+    print()
+    print("{:<10} {:>10}".format("stage", "seconds"))
+    for stage, elapsed in timings:
+        print("{:<10} {:>10.2f}".format(stage, elapsed))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("archive", help="directory of the fixture archive")
+    parser.add_argument("-s", "--subreddit", default="videos", help="subreddit to read")
+    parser.add_argument(
+        "-n", "--limit", type=int, default=100, help="number of articles to read"
+    )
+    parser.add_argument(
+        "-d", "--downloads", type=int, default=5, help="number of videos to download"
+    )
+    parser.add_argument(
+        "--record", action="store_true", help="record live traffic to the archive"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds of latency when replaying"
+    )
+    parser.add_argument(
+        "--bandwidth",
+        type=float,
+        default=None,
+        help="bytes per second per response when replaying (default: unlimited)",
+    )
+    parser.add_argument(
+        "--fast", action="store_true", help="read listings without PRAW"
+    )
+    args = parser.parse_args()
+    main(
+        args.archive,
+        args.subreddit,
+        args.limit,
+        args.downloads,
+        args.record,
+        args.latency,
+        args.bandwidth,
+        args.fast,
+    )
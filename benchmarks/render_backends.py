@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Compares how long each `VideoCompiler` backend takes to render the same compilation.
+
+Synthetic clips of varying sizes and durations are generated with FFmpeg, so no network access
+or Reddit credentials are needed.
+"""
+
+import argparse
+import ffmpeg
+import os
+import shutil
+import tempfile
+import time
+
+from rvidmaker.editor import VideoCompiler
+from rvidmaker.editor.videocomp import VALID_BACKENDS
+from rvidmaker.videos import VideoRef
+
+# Sizes of generated clips. Mixes landscape, portrait and square clips.
+CLIP_SIZES = ((1280, 720), (720, 1280), (640, 480), (1080, 1080), (1920, 1080))
+
+
+class LocalVideoRef(VideoRef):
+    """References a video that is already on disk"""
+
+    def __init__(self, path, title, author, duration):
+        self._path = path
+        self._title = title
+        self._author = author
+        self._duration = duration
+
+    def download(self, output_path):
+        output_path = "{}.mp4".format(os.path.splitext(output_path)[0])
+        shutil.copyfile(self._path, output_path)
+        return output_path
+
+    @property
+    def title(self):
+        return self._title
+
+    @property
+    def author(self):
+        return self._author
+
+    @property
+    def duration(self):
+        return self._duration
+
+
+def make_clips(root, count, duration):
+    """
+    Generates synthetic clips with a test pattern and a tone.
+
+    Args:
+        root (str): Directory to write clips to.
+        count (int): Number of clips to generate.
+        duration (float): Duration of each clip in seconds.
+
+    Returns:
+        list: List of `LocalVideoRef`s for the generated clips.
+    """
+    videos = []
+    for i in range(count):
+        w, h = CLIP_SIZES[i % len(CLIP_SIZES)]
+        path = os.path.join(root, "clip{:04d}.mp4".format(i))
+        video = ffmpeg.input(
+            "testsrc2=size={}x{}:rate=30".format(w, h), f="lavfi", t=duration
+        )
+        audio = ffmpeg.input(
+            "sine=frequency={}:sample_rate=44100".format(220 + 20 * i),
+            f="lavfi",
+            t=duration,
+        )
+        ffmpeg.output(video, audio, path, vcodec="libx264", acodec="aac").run(
+            quiet=True, overwrite_output=True
+        )
+        title = "Synthetic clip number {}".format(i)
+        videos.append(LocalVideoRef(path, title, "benchmark", duration))
+    return videos
+
+
+def main(count, duration, res, backends):
+    work_dir = tempfile.mkdtemp(prefix="rvidmaker-bench-")
+    try:
+        print("Generating {} clips of {}s...".format(count, duration))
+        videos = make_clips(work_dir, count, duration)
+        results = []
+        for backend in backends:
+            compiler = VideoCompiler(censor=None, backend=backend)
+            for v in videos:
+                compiler.add_video(v)
+            output_path = os.path.join(work_dir, "{}.mp4".format(backend))
+            start = time.perf_counter()
+            compiler.render_video(res, output_path)
+            elapsed = time.perf_counter() - start
+            results.append((backend, elapsed))
+
+        total = count * duration
+        print()
+        print("{:<10} {:>10} {:>12}".format("backend", "seconds", "x realtime"))
+        for backend, elapsed in results:
+            print(
+                "{:<10} {:>10.2f} {:>12.2f}".format(backend, elapsed, total / elapsed)
+            )
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--count", type=int, default=10, help="number of clips")
+    parser.add_argument(
+        "-d", "--duration", type=float, default=5, help="duration of each clip"
+    )
+    parser.add_argument(
+        "-r",
+        "--resolution",
+        type=int,
+        nargs=2,
+        default=[1920, 1080],
+        help="width and height of the compilation",
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        action="append",
+        choices=VALID_BACKENDS,
+        help="backend to benchmark, may be repeated (default: all)",
+    )
+    args = parser.parse_args()
+    main(args.count, args.duration, args.resolution, args.backend or VALID_BACKENDS)
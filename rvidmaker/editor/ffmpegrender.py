@@ -0,0 +1,167 @@
+"""Renders a compilation of video clips as a single FFmpeg filter graph"""
+
+import ffmpeg
+import os
+
+# Frame rate every clip is converted to before concatenation.
+FPS = 30
+# Sample rate every audio track is converted to before concatenation.
+AUDIO_RATE = 44100
+
+
+def probe_clip(path):
+    """
+    Reads the duration of a clip and whether it has audio.
+
+    Args:
+        path (str): Path to the clip.
+
+    Returns:
+        (float, bool): Duration of the clip in seconds and whether it has an audio stream.
+
+    Raises:
+        ffmpeg.Error: If probing fails.
+        ValueError: If the clip has no video stream or no known duration.
+    """
+    info = ffmpeg.probe(path)
+    streams = info.get("streams", [])
+    if not any(s.get("codec_type") == "video" for s in streams):
+        raise ValueError('"{}" has no video stream'.format(path))
+    has_audio = any(s.get("codec_type") == "audio" for s in streams)
+    duration = float(info["format"]["duration"])
+    return duration, has_audio
+
+
+def _hex_color(color):
+    """
+    Args:
+        color (int, int, int): RGB color, [0, 255].
+
+    Returns:
+        str: Color in a format understood by FFmpeg filters.
+    """
+    return "0x{:02x}{:02x}{:02x}".format(*color)
+
+
+def _clip_video(path, caption_path, res, bg_color):
+    """
+    Builds the video stream for a single clip. The clip is scaled to fit within the resolution,
+    letterboxed and has its caption overlaid in the top-left corner.
+
+    Args:
+        path (str): Path to the clip.
+        caption_path (str): Path to the clip's caption image.
+        res (int, int): Width and height of the compilation.
+        bg_color (int, int, int): Color of the letterbox as RGB, [0, 255].
+
+    Returns:
+        ffmpeg.nodes.FilterableStream: The video stream.
+    """
+    w, h = res
+    video = (
+        ffmpeg.input(path)
+        .video.filter(
+            "scale",
+            w,
+            h,
+            force_original_aspect_ratio="decrease",
+            force_divisible_by=2,
+        )
+        .filter("pad", w, h, "(ow-iw)/2", "(oh-ih)/2", color=_hex_color(bg_color))
+        .filter("setsar", 1)
+        .filter("fps", FPS)
+    )
+
+    caption = ffmpeg.input(caption_path)
+    video = video.overlay(caption, x=0, y=0).filter("format", "yuv420p")
+    return video
+
+
+def _clip_audio(path, duration, has_audio, stats, audio_level):
+    """
+    Builds the audio stream for a single clip. Clips without audio are given silence so that
+    every clip can be concatenated. Audio is normalized the same way as the Moviepy backends,
+    so that the peak is at the audio level.
+
+    Args:
+        path (str): Path to the clip.
+        duration (float): Duration of the clip in seconds.
+        has_audio (bool): Whether the clip has an audio stream.
+        stats (rvidmaker.editor.loudness.LoudnessStats): Loudness of the clip's audio. None if
+            not known.
+        audio_level (float): Audio level to normalize the clip around, (0, 1].
+
+    Returns:
+        ffmpeg.nodes.FilterableStream: The audio stream.
+    """
+    if has_audio:
+        audio = ffmpeg.input(path).audio
+        gain = stats.gain(audio_level) if stats is not None else None
+        if gain is not None:
+            audio = audio.filter("volume", "{:.6f}".format(gain))
+    else:
+        audio = ffmpeg.input(
+            "anullsrc=r={}:cl=stereo".format(AUDIO_RATE), f="lavfi", t=duration
+        ).audio
+    return audio.filter(
+        "aformat",
+        sample_fmts="fltp",
+        sample_rates=AUDIO_RATE,
+        channel_layouts="stereo",
+    )
+
+
+def build_compilation(clips, res, output_path, audio_level=0.7, bg_color=(0, 0, 0)):
+    """
+    Builds a single FFmpeg command that renders all clips into a compilation.
+
+    Args:
+        clips (list): List of `(path, caption_path, duration, has_audio, stats)` tuples in the
+            order they should play. `caption_path` is an image to overlay on the clip,
+            `duration` and `has_audio` are as returned by `probe_clip`, and `stats` is the
+            clip's `LoudnessStats` or None if not known.
+        res (int, int): Width and height of video.
+        output_path (str): Path to write video to.
+        audio_level (float): Audio level to normalize all videos around, (0, 1].
+        bg_color (int, int, int): Color of background as RGB, [0, 255].
+
+    Returns:
+        ffmpeg.nodes.OutputStream: The command, ready to be run.
+    """
+    streams = []
+    for path, caption_path, duration, has_audio, stats in clips:
+        streams.append(_clip_video(path, caption_path, res, bg_color))
+        streams.append(_clip_audio(path, duration, has_audio, stats, audio_level))
+    joined = ffmpeg.concat(*streams, v=1, a=1).node
+    return ffmpeg.output(
+        joined[0],
+        joined[1],
+        output_path,
+        vcodec="libx264",
+        acodec="aac",
+        pix_fmt="yuv420p",
+        movflags="+faststart",
+    )
+
+
+def concat_segments(segment_paths, output_path):
+    """
+    Builds an FFmpeg command that joins segments with the concat demuxer. Streams are copied,
+    so every segment must have been encoded with the same parameters. The list of segments the
+    demuxer reads is written next to the first segment.
+
+    Args:
+        segment_paths (list): Paths of the segments in the order they should play.
+        output_path (str): Path to write video to.
+
+    Returns:
+        ffmpeg.nodes.OutputStream: The command, ready to be run.
+    """
+    list_path = os.path.join(os.path.dirname(segment_paths[0]), "segments.txt")
+    with open(list_path, "w") as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write("file '{}'\n".format(escaped))
+    return ffmpeg.input(list_path, f="concat", safe=0).output(
+        output_path, c="copy", movflags="+faststart"
+    )
@@ -0,0 +1,202 @@
+"""Measures the loudness of clips and caches the measurements next to them"""
+
+import ffmpeg
+import json
+import os
+import re
+
+# Appended to a clip's path to get the path of its cached measurements.
+SIDECAR_SUFFIX = ".loudness.json"
+# Increment when the measurements change so that stale sidecars are ignored.
+_VERSION = 1
+
+_NUMBER = r"(-?(?:inf|[\d.]+))"
+_SUMMARY_PATTERNS = {
+    "integrated": re.compile(r"I:\s+" + _NUMBER + r" LUFS"),
+    "threshold": re.compile(r"Threshold:\s+" + _NUMBER + r" LUFS"),
+    "lra": re.compile(r"LRA:\s+" + _NUMBER + r" LU"),
+    "sample_peak": re.compile(r"Sample peak:\s+Peak:\s+" + _NUMBER + r" dBFS"),
+    "true_peak": re.compile(r"True peak:\s+Peak:\s+" + _NUMBER + r" dBFS"),
+}
+
+
+class LoudnessException(Exception):
+    """Raised when measuring loudness fails"""
+
+
+class LoudnessStats:
+    """
+    EBU R128 loudness measurements of a clip's audio.
+
+    Attributes:
+        integrated (float): Integrated loudness in LUFS.
+        threshold (float): Relative gating threshold of the integrated loudness in LUFS.
+        lra (float): Loudness range in LU.
+        sample_peak (float): Highest sample in dBFS.
+        true_peak (float): Highest true peak in dBFS.
+        peak (float): Highest sample as a linear amplitude, [0, 1].
+    """
+
+    _FIELDS = ("integrated", "threshold", "lra", "sample_peak", "true_peak")
+
+    def __init__(self, integrated, threshold, lra, sample_peak, true_peak):
+        self._integrated = integrated
+        self._threshold = threshold
+        self._lra = lra
+        self._sample_peak = sample_peak
+        self._true_peak = true_peak
+
+    @property
+    def integrated(self):
+        return self._integrated
+
+    @property
+    def threshold(self):
+        return self._threshold
+
+    @property
+    def lra(self):
+        return self._lra
+
+    @property
+    def sample_peak(self):
+        return self._sample_peak
+
+    @property
+    def true_peak(self):
+        return self._true_peak
+
+    @property
+    def peak(self):
+        return 10 ** (self._sample_peak / 20)
+
+    def gain(self, audio_level):
+        """
+        Args:
+            audio_level (float): Level the highest sample should be at, (0, 1].
+
+        Returns:
+            float: Linear gain that brings the highest sample to `audio_level`. None if the
+                audio is silent.
+        """
+        peak = self.peak
+        if not peak > 0:
+            return None
+        return audio_level / peak
+
+    @staticmethod
+    def parse(summary):
+        """
+        Parses the summary FFmpeg's `ebur128` filter writes to stderr.
+
+        Args:
+            summary (str): Output of FFmpeg.
+
+        Returns:
+            LoudnessStats: The parsed measurements.
+
+        Raises:
+            LoudnessException: If a measurement is missing.
+        """
+        start = summary.rfind("Summary:")
+        if start < 0:
+            raise LoudnessException("No loudness summary found")
+        summary = summary[start:]
+        values = {}
+        for field, pattern in _SUMMARY_PATTERNS.items():
+            match = pattern.search(summary)
+            if match is None:
+                raise LoudnessException("No {} found in summary".format(field))
+            values[field] = float(match.group(1))
+        return LoudnessStats(**values)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in LoudnessStats._FIELDS}
+
+    @staticmethod
+    def from_dict(d):
+        return LoudnessStats(**{field: d[field] for field in LoudnessStats._FIELDS})
+
+
+def analyze(path):
+    """
+    Measures the loudness of a clip. FFmpeg decodes the audio in a single streaming pass, so
+    the audio is never held in memory all at once.
+
+    Args:
+        path (str): Path to the clip.
+
+    Returns:
+        LoudnessStats/None: Measurements of the clip's audio, or `None` if the clip has no
+            audio.
+
+    Raises:
+        LoudnessException: If measuring fails.
+    """
+    cmd = (
+        ffmpeg.input(path)
+        .audio.filter("ebur128", peak="sample+true", framelog="verbose")
+        .output("-", f="null")
+        .global_args("-nostats")
+    )
+    try:
+        _, err = cmd.run(capture_stdout=True, capture_stderr=True)
+    except ffmpeg.Error as e:
+        err = e.stderr.decode(errors="replace")
+        if "matches no streams" in err:
+            return None
+        raise LoudnessException(
+            'Failed to measure loudness of "{}": {}'.format(path, err.strip())
+        )
+    return LoudnessStats.parse(err.decode(errors="replace"))
+
+
+def sidecar_path(path):
+    """
+    Args:
+        path (str): Path to a clip.
+
+    Returns:
+        str: Path the clip's measurements are cached at.
+    """
+    return path + SIDECAR_SUFFIX
+
+
+def load_or_analyze(path):
+    """
+    Gets the measurements cached next to a clip, or measures the clip and caches them.
+
+    Args:
+        path (str): Path to the clip.
+
+    Returns:
+        LoudnessStats/None: Measurements of the clip's audio, or `None` if the clip has no
+            audio.
+
+    Raises:
+        LoudnessException: If measuring fails.
+    """
+    size = os.path.getsize(path)
+    sidecar = sidecar_path(path)
+    try:
+        with open(sidecar) as f:
+            data = json.load(f)
+        if data["version"] == _VERSION and data["size"] == size:
+            if data["stats"] is None:
+                return None
+            return LoudnessStats.from_dict(data["stats"])
+    except (OSError, ValueError, KeyError, TypeError):
+        # Missing or corrupted. Measure again.
+        pass
+
+    stats = analyze(path)
+    data = {
+        "version": _VERSION,
+        "size": size,
+        "stats": stats.to_dict() if stats is not None else None,
+    }
+    temp_path = sidecar + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(temp_path, sidecar)
+    return stats
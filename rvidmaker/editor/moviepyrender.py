@@ -0,0 +1,106 @@
+"""Edits clips for a compilation with Moviepy"""
+
+from moviepy.editor import (
+    afx,
+    AudioClip,
+    CompositeVideoClip,
+    ImageClip,
+    VideoFileClip,
+)
+import numpy as np
+
+from . import overlay
+from .ffmpegrender import AUDIO_RATE, FPS
+
+
+def compose_clip(path, title, author, stats, res, audio_level, bg_color):
+    """
+    Loads, normalizes, resizes and captions a single clip.
+
+    Args:
+        path (str): Path to the clip.
+        title (str): Title to caption the clip with.
+        author (str): Author to caption the clip with.
+        stats (rvidmaker.editor.loudness.LoudnessStats): Loudness of the clip's audio. None if
+            not known.
+        res (int, int): Width and height of video.
+        audio_level (float): Audio level to normalize all videos around, (0, 1].
+        bg_color (int, int, int): Color of background as RGB, [0, 255].
+
+    Returns:
+        moviepy.video.VideoClip.VideoClip: The edited clip.
+    """
+    w, h = res
+    clip = VideoFileClip(path)
+
+    # Adjust audio levels so the peak is at the audio level.
+    gain = stats.gain(audio_level) if stats is not None else None
+    if clip.audio is not None and gain is not None:
+        clip = clip.fx(afx.volumex, gain)
+
+    # Resize video.
+    cw, ch = clip.size
+    size_mult = min(w / cw, h / ch)
+    new_size = (cw * size_mult, ch * size_mult)
+    clip = clip.resize(newsize=new_size).on_color(
+        size=res, color=bg_color, pos="center"
+    )
+
+    # Add the caption as a single layer.
+    caption = np.array(overlay.render_caption(title, author, res))
+    caption_clip = (
+        ImageClip(caption, transparent=True)
+        .set_position((0, 0))
+        .set_duration(clip.duration)
+    )
+    clip = CompositeVideoClip([clip, caption_clip], size=res)
+    return clip
+
+
+def _silence(t):
+    """Generates stereo silence for an `AudioClip`"""
+    if isinstance(t, np.ndarray):
+        return np.zeros((len(t), 2))
+    return [0, 0]
+
+
+def render_segment(
+    path, title, author, stats, res, audio_level, bg_color, segment_path
+):
+    """
+    Edits a single clip and renders it to its own file. All segments are encoded with the same
+    parameters, so they can be joined without re-encoding. Intended to be run in a separate
+    process.
+
+    Args:
+        path (str): Path to the clip.
+        title (str): Title to caption the clip with.
+        author (str): Author to caption the clip with.
+        stats (rvidmaker.editor.loudness.LoudnessStats): Loudness of the clip's audio. None if
+            not known.
+        res (int, int): Width and height of video.
+        audio_level (float): Audio level to normalize all videos around, (0, 1].
+        bg_color (int, int, int): Color of background as RGB, [0, 255].
+        segment_path (str): Path to write the segment to.
+
+    Returns:
+        float: Duration of the segment in seconds.
+    """
+    clip = compose_clip(path, title, author, stats, res, audio_level, bg_color)
+    if clip.audio is None:
+        # Every segment needs an audio stream to be joined.
+        silence = AudioClip(_silence, duration=clip.duration, fps=AUDIO_RATE)
+        clip = clip.set_audio(silence)
+    clip.write_videofile(
+        segment_path,
+        fps=FPS,
+        codec="libx264",
+        audio_codec="aac",
+        audio_fps=AUDIO_RATE,
+        ffmpeg_params=["-pix_fmt", "yuv420p"],
+        threads=1,
+        logger=None,
+    )
+    duration = clip.duration
+    clip.close()
+    return duration
@@ -0,0 +1,57 @@
+"""Draws the title and author caption shown over each clip"""
+
+from functools import lru_cache
+from PIL import Image, ImageDraw
+
+from rvidmaker.utils import load_font
+
+# Font used for titles and authors.
+FONT = "IBMPlexSans-Regular"
+# Titles longer than this won't fit on the screen anyway.
+MAX_TITLE_LEN = 100
+# Text drawn for each caption as (offset, font size, color). Drawn in order.
+_TITLE_SHADOW = ((12, 12), 60, (0, 0, 0, 255))
+_TITLE = ((10, 10), 60, (255, 255, 255, 255))
+_AUTHOR = ((40, 75), 40, (128, 128, 128, 255))
+
+
+def render_caption(title, author, res):
+    """
+    Draws the title, its shadow and the author of a clip onto a single transparent image.
+    Captions are cached, so drawing the same caption again is free.
+
+    Args:
+        title (str): Title of the clip.
+        author (str): Author of the clip.
+        res (int, int): Width and height of the compilation.
+
+    Returns:
+        PIL.Image.Image: RGBA image to place in the top-left corner of the clip. It is only as
+            large as the text, and never larger than the compilation. The image is shared
+            between calls and must not be modified.
+    """
+    return _render_caption(title[:MAX_TITLE_LEN], author, tuple(res))
+
+
+@lru_cache(maxsize=8)
+def _render_caption(title, author, res):
+    author_text = "u/{}".format(author)
+    texts = [
+        (title, *_TITLE_SHADOW),
+        (title, *_TITLE),
+        (author_text, *_AUTHOR),
+    ]
+
+    # Find the area covered by all text.
+    w, h = 1, 1
+    for text, pos, size, _ in texts:
+        left, top, right, bottom = load_font(FONT, size).getbbox(text)
+        w = max(w, pos[0] + right)
+        h = max(h, pos[1] + bottom)
+    size = (min(int(w), res[0]), min(int(h), res[1]))
+
+    img = Image.new("RGBA", size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    for text, pos, font_size, color in texts:
+        draw.text(pos, text, font=load_font(FONT, font_size), fill=color)
+    return img
@@ -0,0 +1,74 @@
+"""Chooses which clips to use in a compilation before any are downloaded"""
+
+
+class ClipPlan:
+    """
+    Clips chosen for a compilation.
+
+    Attributes:
+        clips (list): Chosen candidates, in the order they were given.
+        standby (list): Candidates to use in place of chosen clips that fail to download, best
+            first. Each fits in place of any chosen clip without going over the target duration.
+        duration (float): Total duration of the chosen clips in seconds.
+    """
+
+    def __init__(self, clips, standby):
+        self._clips = clips
+        self._standby = standby
+
+    @property
+    def clips(self):
+        return self._clips
+
+    @property
+    def standby(self):
+        return self._standby
+
+    @property
+    def duration(self):
+        return sum(c.duration for c in self._clips)
+
+
+def plan_clips(candidates, target_duration, standby_count=3, length_weight=0.5):
+    """
+    Chooses clips whose total duration fits within a target duration. Clips are ranked by their
+    score relative to their length, so a short clip can beat a long clip with a higher score.
+
+    Args:
+        candidates (list): Candidates to choose from, with `score` and `duration` attributes.
+            Candidates with an unknown duration are ignored.
+        target_duration (float): Maximum total duration of the chosen clips in seconds.
+        standby_count (int): Maximum number of unchosen candidates to keep on standby.
+        length_weight (float): How much a clip's length counts against its score. 0 ranks by
+            score alone, and 1 ranks by score per second.
+
+    Returns:
+        ClipPlan: The chosen clips and standby clips.
+    """
+    known = [(i, c) for i, c in enumerate(candidates) if c.duration]
+    ranked = sorted(
+        known,
+        key=lambda ic: ic[1].score / ic[1].duration ** length_weight,
+        reverse=True,
+    )
+
+    chosen = []
+    rest = []
+    total = 0
+    for i, c in ranked:
+        if total + c.duration <= target_duration:
+            chosen.append((i, c))
+            total += c.duration
+        else:
+            rest.append(c)
+
+    # A standby clip replaces a chosen clip that failed, so it must fit in the budget left
+    # after removing even the shortest chosen clip.
+    budget = target_duration - total
+    if chosen:
+        budget += min(c.duration for _, c in chosen)
+    standby = [c for c in rest if c.duration <= budget]
+
+    chosen.sort(key=lambda ic: ic[0])
+    clips = [c for _, c in chosen]
+    return ClipPlan(clips, standby[:standby_count])
@@ -1,29 +1,42 @@
 """Creates a compilation of video clips"""
 
 from bisect import insort
-from concurrent.futures import ThreadPoolExecutor
-from glob import glob
-from moviepy.editor import (
-    afx,
-    CompositeVideoClip,
-    concatenate_videoclips,
-    TextClip,
-    VideoFileClip,
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
 )
+import ffmpeg
+from glob import glob
+from moviepy.editor import concatenate_videoclips
 import multiprocessing
 import os
 from rvidmaker.videos import DownloadException
 from shutil import rmtree
 import sys
+import time
+
+from . import ffmpegrender, loudness, moviepyrender, overlay
 
 # Temporary directory for storing downloaded videos.
 _DOWNLOAD_DIR = ".downloaded"
+# Number of times a video is tried before it is replaced with a standby video.
+DOWNLOAD_ATTEMPTS = 3
+# Seconds to wait before the first retry of a download, doubled for each later retry.
+_RETRY_DELAY = 1
+# Backends that can render a compilation.
+VALID_BACKENDS = ("moviepy", "ffmpeg", "segments")
 
 
 class NotEnoughVideos(Exception):
     """Raised when there are not enough videos for a compilation"""
 
 
+class RenderException(Exception):
+    """Raised when rendering a compilation fails"""
+
+
 class ManifestEntry:
     """Store the timestamp where a video is start playing in a compilation"""
 
@@ -94,14 +107,28 @@ class VideoCompiler:
         video_count (int): Number of videos added by `add_video`, ready to be compiled.
     """
 
-    def __init__(self, censor):
+    def __init__(self, censor, backend="moviepy", cache=None):
         """
         Args:
             censor (better_profanity.Profanity): Used to censor undesirable words in rendered text.
                 None to not censor words.
+            backend (str): How to render the compilation. One of "moviepy", which edits every
+                frame in Python, "ffmpeg", which renders everything with a single FFmpeg filter
+                graph, or "segments", which edits each video with Moviepy in its own process
+                and joins the results with FFmpeg.
+            cache (rvidmaker.videos.ClipCache): Cache to reuse previously downloaded videos from
+                and to store newly downloaded videos in. None to not cache videos.
+
+        Raises:
+            ValueError: If the backend is not valid.
         """
+        if backend not in VALID_BACKENDS:
+            raise ValueError("backend must be one of {}".format(VALID_BACKENDS))
         self._videos = []
+        self._standby = []
         self._censor = censor
+        self._backend = backend
+        self._cache = cache
 
     def add_video(self, video):
         """
@@ -112,65 +139,217 @@ class VideoCompiler:
         """
         self._videos.append(video)
 
+    def add_standby(self, video):
+        """
+        Adds a video to use in place of an added video that fails to download. Standby videos
+        are used in a first-in-first-out order.
+
+        Args:
+            video (VideoRef): Video to keep on standby.
+        """
+        self._standby.append(video)
+
     @property
     def video_count(self):
         return len(self._videos)
 
     @staticmethod
-    def _dl_video(video, path):
+    def _dl_video(video, path, cache=None, attempts=DOWNLOAD_ATTEMPTS):
         """
-        Downloads a single video.
+        Downloads a single video. A failed download is retried, resuming from where it
+        stopped if the video supports it.
 
         Args:
             video (VideoRef): Video to download.
             path (str): Path to save video to.
+            cache (rvidmaker.videos.ClipCache): Cache to download the video through. None to
+                always download the video.
+            attempts (int): Number of times to try downloading the video.
 
         Returns:
             (VideoRef, str)/None: The video and the path the video is downloaded to,
                 `None` on failure.
         """
-        try:
-            print('Downloading "{}"...'.format(video.title))
-            actual_path = video.download(path)
-        except DownloadException as e:
-            print('WARNING: Failed to download "{}": {}'.format(video.title, e))
-            return None
+        print('Downloading "{}"...'.format(video.title))
+        for attempt in range(attempts):
+            try:
+                if cache is not None:
+                    actual_path = cache.download(video, path)
+                else:
+                    actual_path = video.download(path)
+                break
+            except DownloadException as e:
+                if attempt + 1 >= attempts:
+                    print('WARNING: Failed to download "{}": {}'.format(video.title, e))
+                    return None
+                print(
+                    'WARNING: Failed to download "{}", retrying: {}'.format(
+                        video.title, e
+                    )
+                )
+                time.sleep(_RETRY_DELAY * 2 ** attempt)
         print('Finished downloading "{}"'.format(video.title))
         return video, actual_path
 
     def _batch_dl(self, max_workers=4):
         """
-        Uses multithreading to download all added videos, in order.
+        Uses multithreading to download all added videos. A video that fails to download is
+        replaced with the next standby video, if there is one.
 
         Args:
             max_workers (int): Maximum number of workers to use for multithreaded downloading.
 
         Yields:
-            (VideoRef, str): The video and the path it was downloaded to. Videos that fail to
-                download are not yielded.
+            (int, VideoRef, str): Index of the video in the compilation, the video, and the path
+                it was downloaded to, as soon as each download finishes. The path is `None` if
+                the download failed and no standby video could replace it.
         """
         if not os.path.exists(_DOWNLOAD_DIR):
             os.mkdir(_DOWNLOAD_DIR)
-        params = []
+        standby = list(self._standby)
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        futures = {}
         for i, v in enumerate(self._videos):
             dl_path = os.path.join(_DOWNLOAD_DIR, "vid{:04d}".format(i))
-            params.append((v, dl_path))
-        pool = ThreadPoolExecutor(max_workers=max_workers)
+            future = pool.submit(VideoCompiler._dl_video, v, dl_path, self._cache)
+            futures[future] = (i, v)
+        pending = set(futures)
         try:
-            for res in pool.map(lambda ps: VideoCompiler._dl_video(*ps), params):
-                if res is not None:
-                    yield res
-        except KeyboardInterrupt as e:
-            vinfo = sys.version_info
-            if vinfo.major >= 3 and vinfo.major >= 9:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i, v = futures.pop(future)
+                    res = future.result()
+                    if res is None and standby:
+                        replacement = standby.pop(0)
+                        print(
+                            'Using standby video "{}" in place of "{}"'.format(
+                                replacement.title, v.title
+                            )
+                        )
+                        dl_path = os.path.join(
+                            _DOWNLOAD_DIR,
+                            "standby{:04d}".format(len(self._standby) - len(standby)),
+                        )
+                        future = pool.submit(
+                            VideoCompiler._dl_video, replacement, dl_path, self._cache
+                        )
+                        futures[future] = (i, replacement)
+                        pending.add(future)
+                        continue
+                    path = res[1] if res is not None else None
+                    yield i, v, path
+            pool.shutdown()
+        except (KeyboardInterrupt, GeneratorExit) as e:
+            if sys.version_info >= (3, 9):
                 pool.shutdown(cancel_futures=True)
             else:
                 pool.shutdown()
             raise e
 
-    def render_video(self, res, output_path, audio_level=0.7, bg_color=(0, 0, 0)):
+    def _pipeline(self, prepare):
+        """
+        Prepares each video for rendering as soon as it is downloaded, while other videos are
+        still downloading. Prepared videos are held in a reorder buffer so they are yielded in
+        the order they were added.
+
+        Args:
+            prepare (callable): Takes a video and the path it was downloaded to, and returns
+                anything needed to render the video, or `None` if the video can't be used.
+
+        Yields:
+            (VideoRef, object): Each usable video and what `prepare` returned for it.
+
+        Raises:
+            NotEnoughVideos: If fewer than two videos are successfully downloaded.
+        """
+        reorder = {}
+        next_index = 0
+        downloaded = 0
+        for i, v, path in self._batch_dl():
+            if path is None:
+                reorder[i] = None
+            else:
+                downloaded += 1
+                prepared = prepare(v, path)
+                reorder[i] = (v, prepared) if prepared is not None else None
+            while next_index in reorder:
+                ready = reorder.pop(next_index)
+                if ready is not None:
+                    yield ready
+                next_index += 1
+
+        if downloaded < 2:
+            raise NotEnoughVideos(
+                "Only {} videos downloaded successfully, need at least 2".format(
+                    downloaded
+                )
+            )
+
+    def _get_captions(self, video):
+        """
+        Args:
+            video (VideoRef): Video to get captions for.
+
+        Returns:
+            (str, str): Title and author of the video, censored if a censor is set.
+        """
+        title = video.title
+        author = video.author
+        if self._censor is not None:
+            title = self._censor.censor(title)
+            author = self._censor.censor(author)
+        return title, author
+
+    def _get_loudness(self, video, path):
+        """
+        Gets the loudness of a downloaded video, measuring it only if it has not been measured
+        before. New measurements are stored in the clip cache alongside the video.
+
+        Args:
+            video (VideoRef): Video to measure.
+            path (str): Path the video was downloaded to.
+
+        Returns:
+            loudness.LoudnessStats/None: Loudness of the video's audio, or `None` if it has no
+                audio or measuring fails.
+        """
+        sidecar = loudness.sidecar_path(path)
+        measured = os.path.exists(sidecar)
+        try:
+            stats = loudness.load_or_analyze(path)
+        except loudness.LoudnessException as e:
+            print(
+                'WARNING: Failed to measure loudness of "{}": {}'.format(video.title, e)
+            )
+            return None
+        if not measured and self._cache is not None and video.cache_key is not None:
+            self._cache.put_sidecar(video.cache_key, sidecar, loudness.SIDECAR_SUFFIX)
+        return stats
+
+    def _prepare_moviepy(self, video, path, res, audio_level, bg_color):
+        """
+        Loads, normalizes, resizes and captions a single downloaded video.
+
+        Args:
+            video (VideoRef): Video to prepare.
+            path (str): Path the video was downloaded to.
+            res (int, int): Width and height of video.
+            audio_level (float): Audio level to normalize all videos around, (0, 1].
+            bg_color (int, int, int): Color of background as RGB, [0, 255].
+
+        Returns:
+            moviepy.video.VideoClip.VideoClip: The edited clip.
+        """
+        title, author = self._get_captions(video)
+        stats = self._get_loudness(video, path)
+        return moviepyrender.compose_clip(
+            path, title, author, stats, res, audio_level, bg_color
+        )
+
+    def _render_moviepy(self, res, output_path, audio_level, bg_color):
         """
-        Renders all added videos into a complete compilation.
+        Renders all added videos by editing every frame with Moviepy.
 
         Args:
             res (int, int): Width and height of video.
@@ -178,107 +357,217 @@ class VideoCompiler:
             audio_level (float): Audio level to normalize all videos around, (0, 1].
             bg_color (int, int, int): Color of background as RGB, [0, 255].
 
+        Returns:
+            Manifest: Timestamps of all videos used in the compilation.
+
         Raises:
-            NotEnoughVideos: There are fewer than two video provided, or fewer than two videos are
-                successfully downloaded.
+            NotEnoughVideos: If fewer than two videos are successfully downloaded or editted.
         """
-        if self.video_count < 2:
-            raise NotEnoughVideos("Need at least 2 videos for a compilation")
+        prepare = lambda v, path: self._prepare_moviepy(
+            v, path, res, audio_level, bg_color
+        )
+        timestamp = 0
+        manifest = Manifest()
+        clips = []
+        for v, clip in self._pipeline(prepare):
+            clips.append(clip)
+            manifest.add_entry(v, timestamp)
+            timestamp += clip.duration
 
-        # Download videos.
-        dl = list(self._batch_dl())
-        if len(dl) < 2:
+        # Videos might have been skipped due to recoverable errors.
+        if len(clips) < 2:
             raise NotEnoughVideos(
-                "Only {} videos downloaded successfully, need at least 2".format(
-                    len(dl)
+                "Only {} videos successfully editted, need at least 2".format(
+                    len(clips)
                 )
             )
+        final = concatenate_videoclips(clips)
+        thread_cnt = multiprocessing.cpu_count()
+        final.write_videofile(output_path, threads=thread_cnt)
+
+        return manifest
+
+    def _prepare_ffmpeg(self, video, path, res):
+        """
+        Probes a single downloaded video, measures its loudness and draws its caption.
 
-        # Load all clips.
+        Args:
+            video (VideoRef): Video to prepare.
+            path (str): Path the video was downloaded to.
+            res (int, int): Width and height of video.
+
+        Returns:
+            tuple/None: Clip as expected by `ffmpegrender.build_compilation`, or `None` if
+                probing failed.
+        """
+        try:
+            duration, has_audio = ffmpegrender.probe_clip(path)
+        except (ffmpeg.Error, KeyError, ValueError) as e:
+            print('WARNING: Failed to probe "{}": {}'.format(video.title, e))
+            return None
+        stats = self._get_loudness(video, path) if has_audio else None
+        title, author = self._get_captions(video)
+        caption_path = "{}.caption.png".format(path)
+        overlay.render_caption(title, author, res).save(caption_path)
+        return path, caption_path, duration, has_audio, stats
+
+    def _render_ffmpeg(self, res, output_path, audio_level, bg_color):
+        """
+        Renders all added videos with a single FFmpeg filter graph.
+
+        Args:
+            res (int, int): Width and height of video.
+            output_path (str): Path to write video to.
+            audio_level (float): Audio level to normalize all videos around, (0, 1].
+            bg_color (int, int, int): Color of background as RGB, [0, 255].
+
+        Returns:
+            Manifest: Timestamps of all videos used in the compilation.
+
+        Raises:
+            NotEnoughVideos: If fewer than two videos are successfully downloaded or probed.
+            RenderException: If FFmpeg fails to render the compilation.
+        """
         timestamp = 0
         manifest = Manifest()
         clips = []
-        w, h = res
-        videos_used = 0
-        for v, path in dl:
-            title = v.title
-            author = v.author
-            if self._censor is not None:
-                title = self._censor.censor(title)
-                author = self._censor.censor(author)
-            clip = VideoFileClip(path)
-
-            # Adjust audio levels.
-            if clip.audio is not None:
-                if clip.audio.max_volume() > 0:
-                    audio = clip.audio.fx(afx.audio_normalize)
-                    max_volume = clip.audio.max_volume()
-                    volume_mult = audio_level / max_volume
-                    clip.set_audio(audio)
-                    clip = clip.fx(afx.volumex, volume_mult)
-
-            # Resize video.
-            cw, ch = clip.size
-            size_mult = min(w / cw, h / ch)
-            new_size = (cw * size_mult, ch * size_mult)
-            clip = clip.resize(newsize=new_size).on_color(
-                size=res, color=bg_color, pos="center"
-            )
+        prepare = lambda v, path: self._prepare_ffmpeg(v, path, res)
+        for v, clip in self._pipeline(prepare):
+            clips.append(clip)
+            manifest.add_entry(v, timestamp)
+            duration = clip[2]
+            timestamp += duration
 
-            # Add text.
-            try:
-                # A title that is too long can cause ImageMagick to fail.
-                # Titles longer than 100 characters won't fit on the screen anyway.
-                title_slice = title[:100]
-                title_clip = TextClip(
-                    title_slice, font="IBM Plex Sans", fontsize=60, color="white"
-                )
-                title_clip = title_clip.set_position((10, 10)).set_duration(
-                    clip.duration
-                )
-                title_clip_shadow = TextClip(
-                    title_slice, font="IBM Plex Sans", fontsize=60, color="black"
-                )
-                title_clip_shadow = title_clip_shadow.set_position(
-                    (12, 12)
-                ).set_duration(clip.duration)
-                author_text = "u/{}".format(author)
-                author_clip = TextClip(
-                    author_text, font="IBM Plex Sans", fontsize=40, color="grey"
-                )
-                author_clip = author_clip.set_position((40, 75)).set_duration(
-                    clip.duration
+        if len(clips) < 2:
+            raise NotEnoughVideos(
+                "Only {} videos successfully probed, need at least 2".format(len(clips))
+            )
+        cmd = ffmpegrender.build_compilation(
+            clips, res, output_path, audio_level=audio_level, bg_color=bg_color
+        )
+        try:
+            cmd.run(quiet=True, overwrite_output=True)
+        except ffmpeg.Error as e:
+            raise RenderException(
+                "FFmpeg failed to render compilation: {}".format(
+                    e.stderr.decode(errors="replace").strip()
                 )
-            except OSError as e:
-                # This is intended to catch ImageMagick related errors.
-                # ImageMagick can fail in unexpected ways, but it happens seldom enough that
-                # we can just ignore it.
-                # Future versions of Moviepy will likely move away from ImageMagick (https://github.com/Zulko/moviepy/issues/1145#issuecomment-623594679)
-                print("Unexpected error: {}".format(e), file=sys.stderr)
-                continue
-
-            clip = CompositeVideoClip(
-                [clip, title_clip_shadow, title_clip, author_clip], size=res
             )
-            clips.append(clip)
+        return manifest
 
-            # Update manifest.
-            manifest.add_entry(v, timestamp)
-            timestamp += clip.duration
-            videos_used += 1
+    def _render_segments(self, res, output_path, audio_level, bg_color):
+        """
+        Renders each video to its own segment in parallel processes, then joins the segments
+        without re-encoding them.
+
+        Args:
+            res (int, int): Width and height of video.
+            output_path (str): Path to write video to.
+            audio_level (float): Audio level to normalize all videos around, (0, 1].
+            bg_color (int, int, int): Color of background as RGB, [0, 255].
+
+        Returns:
+            Manifest: Timestamps of all videos used in the compilation.
+
+        Raises:
+            NotEnoughVideos: If fewer than two videos are successfully downloaded or editted.
+            RenderException: If FFmpeg fails to join the segments.
+        """
+        segment_dir = os.path.join(_DOWNLOAD_DIR, "segments")
+        os.makedirs(segment_dir, exist_ok=True)
+        pool_kwargs = {"max_workers": multiprocessing.cpu_count()}
+        if sys.version_info >= (3, 7):
+            # Workers start while download threads are running, and forking a process with
+            # running threads can deadlock the children.
+            pool_kwargs["mp_context"] = multiprocessing.get_context("spawn")
+        pool = ProcessPoolExecutor(**pool_kwargs)
+
+        def prepare(v, path):
+            title, author = self._get_captions(v)
+            stats = self._get_loudness(v, path)
+            segment_path = "{}.segment.mp4".format(
+                os.path.join(segment_dir, os.path.basename(path))
+            )
+            future = pool.submit(
+                moviepyrender.render_segment,
+                path,
+                title,
+                author,
+                stats,
+                res,
+                audio_level,
+                bg_color,
+                segment_path,
+            )
+            return segment_path, future
+
+        timestamp = 0
+        manifest = Manifest()
+        segment_paths = []
+        try:
+            for v, (segment_path, future) in self._pipeline(prepare):
+                try:
+                    duration = future.result()
+                except Exception as e:
+                    print('WARNING: Failed to render "{}": {}'.format(v.title, e))
+                    continue
+                segment_paths.append(segment_path)
+                manifest.add_entry(v, timestamp)
+                timestamp += duration
+        finally:
+            pool.shutdown()
 
         # Videos might have been skipped due to recoverable errors.
-        if videos_used < 2:
+        if len(segment_paths) < 2:
             raise NotEnoughVideos(
                 "Only {} videos successfully editted, need at least 2".format(
-                    videos_used
+                    len(segment_paths)
                 )
             )
-        final = concatenate_videoclips(clips)
-        thread_cnt = multiprocessing.cpu_count()
-        final.write_videofile(output_path, threads=thread_cnt)
+        cmd = ffmpegrender.concat_segments(segment_paths, output_path)
+        try:
+            cmd.run(quiet=True, overwrite_output=True)
+        except ffmpeg.Error as e:
+            raise RenderException(
+                "FFmpeg failed to join segments: {}".format(
+                    e.stderr.decode(errors="replace").strip()
+                )
+            )
+        return manifest
 
-        # Delete all downloaded videos.
-        rmtree(_DOWNLOAD_DIR)
+    def render_video(self, res, output_path, audio_level=0.7, bg_color=(0, 0, 0)):
+        """
+        Renders all added videos into a complete compilation. Each video is editted as soon as
+        it is downloaded, while the remaining videos continue downloading.
+
+        Args:
+            res (int, int): Width and height of video.
+            output_path (str): Path to write video to.
+            audio_level (float): Audio level to normalize all videos around, (0, 1].
+            bg_color (int, int, int): Color of background as RGB, [0, 255].
+
+        Returns:
+            Manifest: Timestamps of all videos used in the compilation.
+
+        Raises:
+            NotEnoughVideos: There are fewer than two video provided, or fewer than two videos are
+                successfully downloaded.
+            RenderException: If the backend fails to render the compilation.
+        """
+        if self.video_count < 2:
+            raise NotEnoughVideos("Need at least 2 videos for a compilation")
+
+        if self._backend == "ffmpeg":
+            render = self._render_ffmpeg
+        elif self._backend == "segments":
+            render = self._render_segments
+        else:
+            render = self._render_moviepy
+        try:
+            manifest = render(res, output_path, audio_level, bg_color)
+        finally:
+            # Delete all downloaded videos.
+            if os.path.exists(_DOWNLOAD_DIR):
+                rmtree(_DOWNLOAD_DIR)
 
         return manifest
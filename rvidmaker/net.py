@@ -0,0 +1,55 @@
+"""Provides a shared HTTP session that pools connections across requests"""
+
+import requests
+from requests.adapters import HTTPAdapter
+import threading
+
+# Maximum number of connections kept open to each host.
+POOL_SIZE = 16
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def make_session(pool_size=POOL_SIZE):
+    """
+    Creates an HTTP session whose connections are reused between requests.
+
+    Args:
+        pool_size (int): Maximum number of connections kept open to each host.
+
+    Returns:
+        requests.Session: The session.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """
+    Gets the session shared by the whole process, creating it on first use. The session is
+    safe to use from multiple threads for simple requests.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+
+def set_session(session):
+    """
+    Replaces the session shared by the whole process.
+
+    Args:
+        session (requests.Session): Session to share. None to create a new session on next use.
+    """
+    global _session
+    with _session_lock:
+        _session = session
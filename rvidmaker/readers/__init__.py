@@ -5,4 +5,10 @@ class reddit:
         RedditConfigNotFound,
         RedditVideoNotFound,
         RedditComment,
+        SubredditResult,
+        VideoResult,
     )
+    from .batch import ArticleBatch
+    from .cache import ListingCache
+    from .ratelimit import TokenBucket
+    from .token import TokenCache
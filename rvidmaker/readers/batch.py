@@ -0,0 +1,305 @@
+"""Provides a compact, columnar collection of Reddit articles"""
+
+import numpy as np
+import time
+
+
+def _video_fields(media):
+    """
+    Args:
+        media (dict): Media of an article. None if the article has no media.
+
+    Returns:
+        (float, str): Duration and URL of the article's Reddit-hosted video, or `(nan, None)` if
+            it has no such video or the video is a GIF.
+    """
+    if media is None or "reddit_video" not in media:
+        return np.nan, None
+    reddit_video = media["reddit_video"]
+    if reddit_video.get("is_gif"):
+        return np.nan, None
+    return float(reddit_video["duration"]), reddit_video.get("fallback_url")
+
+
+class ArticleBatch:
+    """
+    Holds the fields of many articles needed to filter and rank them, one typed array per field.
+    Filtering, sorting and top-k selection work on whole columns at once, and ages are measured
+    against a single timestamp captured when the batch is created.
+
+    Attributes:
+        now (float): UNIX timestamp that ages are measured from.
+        index (numpy.ndarray): Position of each article in the list the batch was built from.
+        ids (numpy.ndarray): Reddit IDs of the articles.
+        scores (numpy.ndarray): Scores of the articles.
+        created_utc (numpy.ndarray): UNIX timestamps of when the articles were posted.
+        nsfw (numpy.ndarray): Whether each article is labeled as not safe for work.
+        durations (numpy.ndarray): Durations of the articles' Reddit-hosted videos in seconds.
+            NaN for articles without one.
+        video_urls (numpy.ndarray): URLs of the articles' Reddit-hosted videos. None for
+            articles without one.
+        ages (numpy.ndarray): Hours since each article was posted.
+    """
+
+    __slots__ = (
+        "_now",
+        "_index",
+        "_ids",
+        "_scores",
+        "_created",
+        "_nsfw",
+        "_durations",
+        "_video_urls",
+    )
+
+    def __init__(
+        self,
+        ids,
+        scores,
+        created_utc,
+        nsfw,
+        durations,
+        video_urls,
+        now=None,
+        index=None,
+    ):
+        """
+        Args:
+            ids (list): Reddit IDs of the articles.
+            scores (list): Scores of the articles.
+            created_utc (list): UNIX timestamps of when the articles were posted.
+            nsfw (list): Whether each article is labeled as not safe for work.
+            durations (list): Durations of the articles' Reddit-hosted videos in seconds. NaN
+                for articles without one.
+            video_urls (list): URLs of the articles' Reddit-hosted videos. None for articles
+                without one.
+            now (float): UNIX timestamp to measure ages from. None for the current time.
+            index (list): Position of each article in the list the batch was built from. None
+                for `0..n-1`.
+        """
+        self._now = time.time() if now is None else now
+        self._ids = np.asarray(ids, dtype=object)
+        self._scores = np.asarray(scores, dtype=np.int64)
+        self._created = np.asarray(created_utc, dtype=np.float64)
+        self._nsfw = np.asarray(nsfw, dtype=bool)
+        self._durations = np.asarray(durations, dtype=np.float32)
+        self._video_urls = np.asarray(video_urls, dtype=object)
+        if index is None:
+            self._index = np.arange(len(self._ids), dtype=np.int64)
+        else:
+            self._index = np.asarray(index, dtype=np.int64)
+
+    @staticmethod
+    def from_articles(articles, now=None):
+        """
+        Args:
+            articles (list): `RedditArticle`s to build the batch from.
+            now (float): UNIX timestamp to measure ages from. None for the current time.
+
+        Returns:
+            ArticleBatch: The batch.
+        """
+        return ArticleBatch.from_dicts((art.to_dict() for art in articles), now=now)
+
+    @staticmethod
+    def from_dicts(dicts, now=None):
+        """
+        Builds a batch from stored article fields, such as those in a `ListingCache`, without
+        creating a `RedditArticle` for each one.
+
+        Args:
+            dicts (iterable): Article fields from `RedditArticle.to_dict`.
+            now (float): UNIX timestamp to measure ages from. None for the current time.
+
+        Returns:
+            ArticleBatch: The batch.
+        """
+        ids = []
+        scores = []
+        created = []
+        nsfw = []
+        durations = []
+        video_urls = []
+        for d in dicts:
+            ids.append(d["id"])
+            scores.append(d["score"])
+            created.append(d["created_utc"])
+            nsfw.append(d["over_18"])
+            duration, video_url = _video_fields(d["media"])
+            durations.append(duration)
+            video_urls.append(video_url)
+        return ArticleBatch(ids, scores, created, nsfw, durations, video_urls, now=now)
+
+    @staticmethod
+    def concat(batches, now=None):
+        """
+        Joins batches, such as those of several listings, into one. Indices are renumbered so
+        they refer to the articles of all batches in order.
+
+        Args:
+            batches (list): `ArticleBatch`es to join.
+            now (float): UNIX timestamp to measure ages from. None to use that of the first
+                batch, or the current time if there are no batches.
+
+        Returns:
+            ArticleBatch: The joined batch.
+        """
+        batches = list(batches)
+        if now is None and batches:
+            now = batches[0].now
+        if not batches:
+            return ArticleBatch([], [], [], [], [], [], now=now)
+        return ArticleBatch(
+            np.concatenate([b._ids for b in batches]),
+            np.concatenate([b._scores for b in batches]),
+            np.concatenate([b._created for b in batches]),
+            np.concatenate([b._nsfw for b in batches]),
+            np.concatenate([b._durations for b in batches]),
+            np.concatenate([b._video_urls for b in batches]),
+            now=now,
+        )
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def now(self):
+        return self._now
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def ids(self):
+        return self._ids
+
+    @property
+    def scores(self):
+        return self._scores
+
+    @property
+    def created_utc(self):
+        return self._created
+
+    @property
+    def nsfw(self):
+        return self._nsfw
+
+    @property
+    def durations(self):
+        return self._durations
+
+    @property
+    def video_urls(self):
+        return self._video_urls
+
+    @property
+    def ages(self):
+        return (self._now - self._created) / (60 * 60)
+
+    def take(self, indices):
+        """
+        Args:
+            indices (numpy.ndarray): Positions of articles within this batch, or a boolean mask
+                over it.
+
+        Returns:
+            ArticleBatch: Batch of the selected articles, in the order given.
+        """
+        return ArticleBatch(
+            self._ids[indices],
+            self._scores[indices],
+            self._created[indices],
+            self._nsfw[indices],
+            self._durations[indices],
+            self._video_urls[indices],
+            now=self._now,
+            index=self._index[indices],
+        )
+
+    def mask(
+        self,
+        min_score=None,
+        min_age=None,
+        include_nsfw=True,
+        video_only=False,
+        min_duration=None,
+        max_duration=None,
+    ):
+        """
+        Checks which articles pass the filters.
+
+        Args:
+            min_score (int): Minimum score of articles to include. None for no minimum.
+            min_age (float): Minimum age in hours of articles to include. None for no minimum.
+            include_nsfw (bool): Whether to include articles labeled as not safe for work.
+            video_only (bool): Whether to only include articles with a Reddit-hosted video.
+            min_duration (float): Minimum duration of videos in seconds when `video_only` is
+                set. None for no minimum.
+            max_duration (float): Maximum duration of videos in seconds when `video_only` is
+                set. None for no maximum.
+
+        Returns:
+            numpy.ndarray: Boolean mask of the articles that pass.
+        """
+        keep = np.ones(len(self), dtype=bool)
+        if min_score is not None:
+            keep &= self._scores >= min_score
+        if min_age is not None:
+            keep &= self.ages >= min_age
+        if not include_nsfw:
+            keep &= ~self._nsfw
+        if video_only:
+            # Comparisons with NaN are false, so articles without a video are dropped.
+            keep &= ~np.isnan(self._durations)
+            if min_duration is not None:
+                keep &= self._durations >= min_duration
+            if max_duration is not None:
+                keep &= self._durations <= max_duration
+        return keep
+
+    def filter(self, **kwargs):
+        """
+        Args:
+            **kwargs: Filters as taken by `mask`.
+
+        Returns:
+            ArticleBatch: Batch of the articles that pass the filters, in the same order.
+        """
+        return self.take(self.mask(**kwargs))
+
+    def sort(self, descending=True):
+        """
+        Sorts articles by score. Articles with equal scores keep their order.
+
+        Args:
+            descending (bool): Whether the highest scores come first.
+
+        Returns:
+            ArticleBatch: The sorted batch.
+        """
+        keys = -self._scores if descending else self._scores
+        return self.take(np.argsort(keys, kind="stable"))
+
+    def top(self, k):
+        """
+        Selects the highest scoring articles without sorting the whole batch.
+
+        Args:
+            k (int): Number of articles to select.
+
+        Returns:
+            ArticleBatch: The `k` highest scoring articles in descending order of score.
+        """
+        k = max(0, min(k, len(self)))
+        if k == 0:
+            return self.take(np.arange(0))
+        if k < len(self):
+            part = np.argpartition(-self._scores, k - 1)[:k]
+            # Keep listing order among equal scores, as `sort` does.
+            part.sort()
+        else:
+            part = np.arange(len(self))
+        order = part[np.argsort(-self._scores[part], kind="stable")]
+        return self.take(order)
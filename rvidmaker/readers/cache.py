@@ -0,0 +1,277 @@
+"""Provides a persistent cache of subreddit listings"""
+
+from contextlib import closing
+import json
+import os
+import sqlite3
+import time
+
+# Seconds a cached listing stays fresh, by listing and optionally time filter. Listings that
+# change slowly are kept for longer.
+DEFAULT_TTLS = {
+    "hot": 15 * 60,
+    "top/hour": 5 * 60,
+    "top/day": 30 * 60,
+    "top/week": 2 * 60 * 60,
+    "top/month": 6 * 60 * 60,
+    "top/year": 24 * 60 * 60,
+    "top/all": 24 * 60 * 60,
+}
+# Seconds a listing not in the TTL table stays fresh.
+DEFAULT_TTL = 15 * 60
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS listings (
+        subreddit TEXT NOT NULL,
+        listing TEXT NOT NULL,
+        time_filter TEXT NOT NULL,
+        fetched_at REAL NOT NULL,
+        requested INTEGER,
+        articles TEXT NOT NULL,
+        PRIMARY KEY (subreddit, listing, time_filter)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS cursors (
+        subreddit TEXT NOT NULL,
+        listing TEXT NOT NULL,
+        fullname TEXT NOT NULL,
+        created_utc REAL NOT NULL,
+        PRIMARY KEY (subreddit, listing)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS candidates (
+        subreddit TEXT NOT NULL,
+        id TEXT NOT NULL,
+        created_utc REAL NOT NULL,
+        article TEXT NOT NULL,
+        PRIMARY KEY (subreddit, id)
+    )
+    """,
+)
+
+
+class ListingCache:
+    """
+    Caches the articles of subreddit listings in an SQLite database, so that repeated requests
+    for the same listing within its TTL don't go through the Reddit API. Articles are stored as
+    dictionaries from `RedditArticle.to_dict`. The database can be shared between processes.
+
+    The cache also keeps a pool of candidate articles for each subreddit, along with a cursor
+    marking the newest article read from a listing, so that later runs only need to read the
+    articles posted since.
+    """
+
+    def __init__(self, path, ttls=None):
+        """
+        Args:
+            path (str): Path to the SQLite database. Created if it does not exist.
+            ttls (dict): Seconds each listing stays fresh, keyed by listing (e.g. "hot") or by
+                listing and time filter (e.g. "top/week"). Overrides `DEFAULT_TTLS`.
+        """
+        self._path = path
+        self._ttls = dict(DEFAULT_TTLS)
+        if ttls is not None:
+            self._ttls.update(ttls)
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        with self._connect() as conn, conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self):
+        """
+        Returns:
+            contextlib.closing: Connection to the database that is closed when the context exits.
+        """
+        conn = sqlite3.connect(self._path, timeout=30)
+        return closing(conn)
+
+    @property
+    def path(self):
+        return self._path
+
+    def ttl(self, listing, time_filter=None):
+        """
+        Args:
+            listing (str): Name of the listing, such as "hot" or "top".
+            time_filter (str): Time filter of the listing. None if the listing has none.
+
+        Returns:
+            float: Seconds the listing stays fresh.
+        """
+        key = "{}/{}".format(listing, time_filter)
+        if key in self._ttls:
+            return self._ttls[key]
+        return self._ttls.get(listing, DEFAULT_TTL)
+
+    def get(self, subreddit, listing, time_filter=None, limit=None):
+        """
+        Gets the cached articles of a listing.
+
+        Args:
+            subreddit (str): Name of the subreddit.
+            listing (str): Name of the listing, such as "hot" or "top".
+            time_filter (str): Time filter of the listing. None if the listing has none.
+            limit (int): Number of articles needed. None for as many as possible.
+
+        Returns:
+            list/None: Article dictionaries in listing order, or `None` if the listing is not
+                cached, is stale, or holds fewer articles than needed.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT fetched_at, requested, articles FROM listings "
+                "WHERE subreddit = ? AND listing = ? AND time_filter = ?",
+                (subreddit.lower(), listing, time_filter or ""),
+            ).fetchone()
+        if row is None:
+            return None
+        fetched_at, requested, articles = row
+        if time.time() - fetched_at > self.ttl(listing, time_filter):
+            return None
+        articles = json.loads(articles)
+        # A cached listing covers the request if it was fetched with a limit at least as large,
+        # or if the listing ran out of articles before reaching its limit.
+        exhausted = requested is not None and len(articles) < requested
+        if requested is not None and not exhausted:
+            if limit is None or limit > requested:
+                return None
+        return articles[:limit]
+
+    def put(self, subreddit, listing, articles, time_filter=None, limit=None):
+        """
+        Caches the articles of a listing, replacing any previously cached articles.
+
+        Args:
+            subreddit (str): Name of the subreddit.
+            listing (str): Name of the listing, such as "hot" or "top".
+            articles (list): Article dictionaries in listing order.
+            time_filter (str): Time filter of the listing. None if the listing has none.
+            limit (int): Number of articles that were requested. None if as many as possible
+                were requested.
+        """
+        with self._connect() as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    subreddit.lower(),
+                    listing,
+                    time_filter or "",
+                    time.time(),
+                    limit,
+                    json.dumps(articles),
+                ),
+            )
+
+    def cursor(self, subreddit, listing):
+        """
+        Args:
+            subreddit (str): Name of the subreddit.
+            listing (str): Name of the listing, such as "new".
+
+        Returns:
+            (str, float)/None: Fullname and creation time of the newest article read from the
+                listing, or None if the listing has not been read.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT fullname, created_utc FROM cursors "
+                "WHERE subreddit = ? AND listing = ?",
+                (subreddit.lower(), listing),
+            ).fetchone()
+        return tuple(row) if row is not None else None
+
+    def extend_pool(self, subreddit, listing, articles):
+        """
+        Adds articles to a subreddit's candidate pool, replacing older copies of the same
+        articles, and moves the listing's cursor to the newest article. Both happen in a single
+        transaction.
+
+        Args:
+            subreddit (str): Name of the subreddit.
+            listing (str): Name of the listing the articles were read from.
+            articles (list): Article dictionaries from `RedditArticle.to_dict`.
+        """
+        if not articles:
+            return
+        subreddit = subreddit.lower()
+        newest = max(articles, key=lambda d: d["created_utc"])
+        with self._connect() as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO candidates VALUES (?, ?, ?, ?)",
+                [
+                    (subreddit, d["id"], d["created_utc"], json.dumps(d))
+                    for d in articles
+                ],
+            )
+            # Never move the cursor backwards.
+            conn.execute(
+                "INSERT INTO cursors VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (subreddit, listing) DO UPDATE SET "
+                "fullname = excluded.fullname, created_utc = excluded.created_utc "
+                "WHERE excluded.created_utc >= cursors.created_utc",
+                (
+                    subreddit,
+                    listing,
+                    "t3_{}".format(newest["id"]),
+                    newest["created_utc"],
+                ),
+            )
+
+    def pool(self, subreddit, min_created_utc=None):
+        """
+        Args:
+            subreddit (str): Name of the subreddit.
+            min_created_utc (float): Only include articles posted at or after this UNIX
+                timestamp. None to include every article.
+
+        Returns:
+            list: Article dictionaries in the subreddit's candidate pool, newest first.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT article FROM candidates WHERE subreddit = ? AND created_utc >= ? "
+                "ORDER BY created_utc DESC",
+                (subreddit.lower(), min_created_utc or 0),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def prune_pool(self, subreddit, min_created_utc):
+        """
+        Removes articles posted before a time from a subreddit's candidate pool.
+
+        Args:
+            subreddit (str): Name of the subreddit.
+            min_created_utc (float): UNIX timestamp of the oldest article to keep.
+        """
+        with self._connect() as conn, conn:
+            conn.execute(
+                "DELETE FROM candidates WHERE subreddit = ? AND created_utc < ?",
+                (subreddit.lower(), min_created_utc),
+            )
+
+    def refresh_pool(self, subreddit, articles, removed_ids=()):
+        """
+        Replaces articles already in a subreddit's candidate pool with fresh copies, and
+        removes articles that are no longer available, in a single transaction. Articles that
+        are not in the pool are not added.
+
+        Args:
+            subreddit (str): Name of the subreddit.
+            articles (list): Fresh article dictionaries from `RedditArticle.to_dict`.
+            removed_ids (list): IDs of articles to remove from the pool.
+        """
+        subreddit = subreddit.lower()
+        with self._connect() as conn, conn:
+            conn.executemany(
+                "UPDATE candidates SET article = ? WHERE subreddit = ? AND id = ?",
+                [(json.dumps(d), subreddit, d["id"]) for d in articles],
+            )
+            conn.executemany(
+                "DELETE FROM candidates WHERE subreddit = ? AND id = ?",
+                [(subreddit, post_id) for post_id in removed_ids],
+            )
@@ -0,0 +1,188 @@
+"""Parses the DASH manifests of Reddit-hosted videos"""
+
+from urllib.parse import urljoin
+from xml.etree import ElementTree
+
+_NS = "{urn:mpeg:dash:schema:mpd:2011}"
+
+
+class DashException(Exception):
+    """Raised if a DASH manifest cannot be parsed"""
+
+
+class Representation:
+    """
+    A single rendition of a video or audio track.
+
+    Attributes:
+        url (str): HTTP/S URL of the rendition.
+        content_type (str): Either "video" or "audio".
+        bandwidth (int): Bits per second of the rendition. 0 if not known.
+        width (int): Width of a video rendition in pixels. None for audio.
+        height (int): Height of a video rendition in pixels. None for audio.
+    """
+
+    def __init__(self, url, content_type, bandwidth=0, width=None, height=None):
+        self._url = url
+        self._content_type = content_type
+        self._bandwidth = bandwidth
+        self._width = width
+        self._height = height
+
+    @property
+    def url(self):
+        return self._url
+
+    @property
+    def content_type(self):
+        return self._content_type
+
+    @property
+    def bandwidth(self):
+        return self._bandwidth
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+
+def _int_attr(elements, name):
+    """
+    Args:
+        elements (list): Elements to look for the attribute on, innermost first.
+        name (str): Name of the attribute.
+
+    Returns:
+        int: Value of the attribute on the innermost element that has it. None if no element
+            has it.
+    """
+    for el in elements:
+        value = el.get(name)
+        if value is not None:
+            return int(value)
+    return None
+
+
+def _base_url(url, element):
+    """
+    Args:
+        url (str): URL that relative URLs are resolved against.
+        element (xml.etree.ElementTree.Element): Element that may have a `BaseURL` child.
+
+    Returns:
+        str: URL of the element's `BaseURL` resolved against `url`, or `url` if it has none.
+    """
+    base = element.find(_NS + "BaseURL")
+    if base is None or not base.text:
+        return url
+    return urljoin(url, base.text.strip())
+
+
+def _content_type(adaptation_set, representation):
+    """
+    Returns:
+        str: "video", "audio" or None if the content type can't be determined.
+    """
+    content_type = adaptation_set.get("contentType")
+    if content_type:
+        return content_type
+    mime_type = representation.get("mimeType") or adaptation_set.get("mimeType") or ""
+    return mime_type.split("/")[0] or None
+
+
+def parse_manifest(text, manifest_url):
+    """
+    Lists the renditions in a DASH manifest.
+
+    Args:
+        text (str): XML of the manifest.
+        manifest_url (str): URL the manifest was fetched from. Relative URLs in the manifest are
+            resolved against it.
+
+    Returns:
+        list: `Representation`s in the manifest, in the order they appear.
+
+    Raises:
+        DashException: If the manifest is not valid.
+    """
+    try:
+        root = ElementTree.fromstring(text)
+    except ElementTree.ParseError as e:
+        raise DashException("Invalid DASH manifest: {}".format(e))
+    if root.tag != _NS + "MPD":
+        raise DashException("Invalid DASH manifest: root element is not MPD")
+
+    representations = []
+    root_url = _base_url(manifest_url, root)
+    try:
+        for period in root.iter(_NS + "Period"):
+            period_url = _base_url(root_url, period)
+            for adaptation_set in period.iter(_NS + "AdaptationSet"):
+                set_url = _base_url(period_url, adaptation_set)
+                for rep in adaptation_set.iter(_NS + "Representation"):
+                    content_type = _content_type(adaptation_set, rep)
+                    if content_type not in ("video", "audio"):
+                        continue
+                    scope = (rep, adaptation_set)
+                    representations.append(
+                        Representation(
+                            _base_url(set_url, rep),
+                            content_type,
+                            bandwidth=_int_attr(scope, "bandwidth") or 0,
+                            width=_int_attr(scope, "width"),
+                            height=_int_attr(scope, "height"),
+                        )
+                    )
+    except ValueError as e:
+        raise DashException("Invalid DASH manifest: {}".format(e))
+    return representations
+
+
+def select_video(representations, res=None):
+    """
+    Chooses the smallest video rendition that still fills a resolution once scaled to fit it.
+
+    Args:
+        representations (list): `Representation`s to choose from.
+        res (int, int): Width and height the video will be shown at. None for the largest
+            rendition.
+
+    Returns:
+        Representation: The chosen rendition. The largest rendition if none fill `res`, and
+            None if there are no video renditions.
+    """
+    videos = [
+        r
+        for r in representations
+        if r.content_type == "video" and r.width is not None and r.height is not None
+    ]
+    if not videos:
+        return None
+    videos.sort(key=lambda r: (r.width * r.height, r.bandwidth))
+    if res is not None:
+        w, h = res
+        for rep in videos:
+            # The video is scaled to fit within the resolution, so it fills it once either
+            # side reaches the resolution.
+            if rep.width >= w or rep.height >= h:
+                return rep
+    return videos[-1]
+
+
+def select_audio(representations):
+    """
+    Args:
+        representations (list): `Representation`s to choose from.
+
+    Returns:
+        Representation: The audio rendition with the highest bandwidth. None if there are no
+            audio renditions.
+    """
+    audio = [r for r in representations if r.content_type == "audio"]
+    if not audio:
+        return None
+    return max(audio, key=lambda r: r.bandwidth)
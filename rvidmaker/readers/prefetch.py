@@ -0,0 +1,87 @@
+"""Reads ahead of a slow iterator on a background thread"""
+
+import queue
+import threading
+
+# Seconds between checks for whether the consumer has stopped while the queue is full.
+_POLL_INTERVAL = 0.1
+
+_DONE = object()
+
+
+class _Failure:
+    """Carries an exception raised by the producer to the consumer"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def prefetch(iterable, depth):
+    """
+    Iterates over an iterable on a background thread, staying up to `depth` items ahead of the
+    consumer. Useful for iterators that block, such as listings fetched page by page. Exceptions
+    raised by the iterable are raised to the consumer. Closing the generator stops the
+    background thread and waits for it to finish the item it is on, so the iterable is no
+    longer in use once the generator is closed. The iterable is closed if it has a `close`
+    method.
+
+    Args:
+        iterable (iterable): Items to iterate over. Must not be used by any other thread while
+            the generator is running.
+        depth (int): Maximum number of items read ahead. 0 or less to iterate without a
+            background thread.
+
+    Yields:
+        The items of `iterable`, in order.
+    """
+    if depth <= 0:
+        yield from iterable
+        return
+
+    items = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+
+    def put(item):
+        # Give up once the consumer stops, rather than blocking on a full queue forever.
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            # Check before every item, so that nothing more is fetched once the consumer stops.
+            while not stopped.is_set():
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    put(_DONE)
+                    return
+                if not put(item):
+                    return
+        except BaseException as e:
+            # Pass on every exception, so that the consumer is never left waiting.
+            put(_Failure(e))
+        finally:
+            # Generators can only be closed by the thread that runs them.
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stopped.set()
+        thread.join()
@@ -0,0 +1,134 @@
+"""Provides rate limiting of Reddit API requests shared across threads"""
+
+import prawcore
+import threading
+import time
+
+# Requests Reddit allows per rate limit window.
+DEFAULT_CAPACITY = 600
+# Seconds in a rate limit window.
+DEFAULT_PERIOD = 600
+
+
+class TokenBucket:
+    """
+    Limits the rate of requests made by many threads. Each request takes a token, and the bucket
+    is refilled when the rate limit window resets. The bucket follows the rate limit Reddit
+    reports in its `X-Ratelimit-Remaining` and `X-Ratelimit-Reset` response headers, so threads
+    wait for the window to reset instead of running into 429 responses.
+
+    Attributes:
+        capacity (int): Tokens in a full bucket.
+        tokens (float): Tokens left in the current window.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, period=DEFAULT_PERIOD):
+        """
+        Args:
+            capacity (int): Tokens in a full bucket.
+            period (float): Seconds between refills, until Reddit reports when its window
+                resets.
+        """
+        self._capacity = capacity
+        self._period = period
+        self._tokens = float(capacity)
+        self._reset_at = time.time() + period
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def tokens(self):
+        with self._lock:
+            self._refill(time.time())
+            return self._tokens
+
+    def _refill(self, now):
+        """
+        Refills the bucket if its window has reset. Must be called with the lock held.
+
+        Args:
+            now (float): Current time as a UNIX timestamp.
+        """
+        if now >= self._reset_at:
+            self._tokens = float(self._capacity)
+            self._reset_at = now + self._period
+
+    def acquire(self):
+        """Takes a token, waiting for the window to reset if the bucket is empty"""
+        while True:
+            with self._lock:
+                now = time.time()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = self._reset_at - now
+            time.sleep(max(wait, 0.01))
+
+    def update(self, remaining, reset, used=None):
+        """
+        Updates the bucket with the rate limit reported by Reddit.
+
+        Args:
+            remaining (float): Requests left in the current window.
+            reset (float): Seconds until the window resets.
+            used (int): Requests made in the current window. None if not known.
+        """
+        with self._lock:
+            now = time.time()
+            reset_at = now + reset
+            if used is not None:
+                self._capacity = max(self._capacity, int(remaining + used))
+            if reset_at > self._reset_at + 1:
+                # A new window has started since the bucket last heard from Reddit.
+                self._tokens = float(remaining)
+            else:
+                # Requests still in flight may not be counted by Reddit yet.
+                self._tokens = min(self._tokens, float(remaining))
+            self._reset_at = reset_at
+
+    def update_from_headers(self, headers):
+        """
+        Updates the bucket from the headers of a Reddit API response. Responses without rate
+        limit headers are ignored.
+
+        Args:
+            headers (dict): Headers of the response.
+        """
+        try:
+            remaining = float(headers["x-ratelimit-remaining"])
+            reset = float(headers["x-ratelimit-reset"])
+        except (KeyError, ValueError):
+            return
+        try:
+            used = int(headers["x-ratelimit-used"])
+        except (KeyError, ValueError):
+            used = None
+        self.update(remaining, reset, used)
+
+
+class RateLimitedRequestor(prawcore.Requestor):
+    """
+    Requestor for PRAW that takes a token from a shared bucket before every request, and feeds
+    the bucket with the rate limit headers of every response. Passed to `praw.Reddit` as
+    `requestor_class`, with the bucket in `requestor_kwargs`.
+    """
+
+    def __init__(self, *args, bucket=None, **kwargs):
+        """
+        Args:
+            bucket (TokenBucket): Bucket shared by all clients. None for no rate limiting.
+        """
+        super().__init__(*args, **kwargs)
+        self._bucket = bucket
+
+    def request(self, *args, **kwargs):
+        if self._bucket is not None:
+            self._bucket.acquire()
+        response = super().request(*args, **kwargs)
+        if self._bucket is not None:
+            self._bucket.update_from_headers(response.headers)
+        return response
@@ -1,19 +1,73 @@
 """Provides objects for parsing subreddits articles"""
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
 from copy import copy
 from datetime import datetime
+import heapq
 import os
 import praw
+import prawcore
 import requests
+import sys
+import threading
 import toml
 from urllib.parse import urljoin, urlsplit, urlunsplit
 
+from rvidmaker.net import get_session
 from rvidmaker.utils import random_string
 from rvidmaker.videos import RedditVideoRef
+from . import dash
+from .batch import ArticleBatch
+from .listing import ListingClient, ListingException
+from .prefetch import prefetch
+from .ratelimit import RateLimitedRequestor
 
 CONFIG_PATH = "reddit_api_config.toml"
 USER_AGENT = "rvidmaker 0.0.1"
 VALID_TIME_FILTERS = ("all", "day", "hour", "month", "week", "year")
+# Number of articles whose videos are resolved at once by `RedditReader.get_videos`.
+VIDEO_WORKERS = 8
+# Number of subreddits read at once by `RedditReader.iter_subreddits`.
+SUBREDDIT_WORKERS = 4
+# Number of articles whose comments are fetched at once by `RedditReader.get_comments`.
+COMMENT_WORKERS = 8
+# Maximum number of new articles read by `RedditReader.update_pool` when the pool is empty.
+POOL_FETCH_LIMIT = 1000
+# Number of listing pages `RedditReader` fetches ahead of the articles being read.
+PREFETCH_PAGES = 1
+# Number of articles in a page of a listing.
+LISTING_PAGE_SIZE = 100
+# Maximum number of articles Reddit looks up in a single request.
+INFO_BATCH_SIZE = 100
+# Seconds to wait for Reddit to respond when checking for an audio track.
+_PROBE_TIMEOUT = 10
+
+# Parsed API configs by path, with the modification time they were read at.
+_configs = {}
+_configs_lock = threading.Lock()
+# Readers returned by `RedditReader.shared`, by config path and options.
+_shared_readers = {}
+_shared_lock = threading.Lock()
+
+
+def _praw_session(session):
+    """
+    Creates a session for PRAW that pools connections with another session. PRAW sets its own
+    `User-Agent` on the session it is given, so it must not be given one that other requests
+    are sent with.
+
+    Args:
+        session (requests.Session): Session whose headers and transport adapters to use.
+
+    Returns:
+        requests.Session: Session owned by PRAW.
+    """
+    praw_session = requests.Session()
+    praw_session.headers.update(session.headers)
+    for prefix, adapter in session.adapters.items():
+        praw_session.mount(prefix, adapter)
+    return praw_session
 
 
 class RedditConfigNotFound(Exception):
@@ -42,6 +96,8 @@ class RedditComment:
         text (int): Body of the comment.
     """
 
+    __slots__ = ("_author", "_text", "_score", "_child")
+
     def __init__(self, author, text, score):
         """
         Args:
@@ -71,7 +127,7 @@ class RedditComment:
 
     @property
     def child(self):
-        return copy(self._child)
+        return self._child
 
     @child.setter
     def child(self, child):
@@ -85,6 +141,18 @@ class RedditComment:
     def text(self):
         return self._text
 
+    def chain(self):
+        """
+        Returns:
+            list: This comment followed by its child, its child's child, and so on.
+        """
+        chain = []
+        comment = self
+        while comment is not None:
+            chain.append(comment)
+            comment = comment._child
+        return chain
+
 
 class RedditArticle:
     """
@@ -94,11 +162,15 @@ class RedditArticle:
         age (float): Hours since the article was posted.
         author (str): Username of the article's author. None for no author.
         category (str): Category of the article. None for no category.
+        duration (float): Duration of the article's Reddit-hosted video in seconds. None if the
+            article has no Reddit-hosted video.
         id (str): Unique ID for the article as given by Reddit.
         nsfw (bool): Whether the articles is labeled as not safe for work.
         score (int): Score of the article.
         text (str): Body of the article.
         url (str): HTTP/S URL for the article.
+        video_url (str): HTTP/S URL for the article's Reddit-hosted video. None if the article
+            has no Reddit-hosted video.
     """
 
     def __init__(self, praw_article):
@@ -107,20 +179,97 @@ class RedditArticle:
             praw_article (praw.models.reddit.submission.Submission): The original PRAW generated
                 article.
         """
-        self._article = praw_article
-        self.title = self._article.title
-        if self._article.author is not None:
-            self._author = self._article.author.name
+        # Only keep what is needed to fetch the full article again, so that the listing's
+        # submission can be freed.
+        self._article = None
+        self._reddit = getattr(praw_article, "_reddit", None)
+        if praw_article.author is not None:
+            author = praw_article.author.name
         else:
-            self._author = None
-        self._text = self._article.selftext
-        self._category = self._article.category
-        self._id = self._article.id
-        self._url = self._article.url
-        self._score = self._article.score
-        self._nsfw = self._article.over_18
-        self._time_created = self._article.created_utc
-        self._media = self._article.media
+            author = None
+        self._set_fields(
+            title=praw_article.title,
+            author=author,
+            selftext=praw_article.selftext,
+            category=praw_article.category,
+            id=praw_article.id,
+            url=praw_article.url,
+            score=praw_article.score,
+            over_18=praw_article.over_18,
+            created_utc=praw_article.created_utc,
+            media=praw_article.media,
+        )
+
+    def _set_fields(
+        self,
+        title,
+        author,
+        selftext,
+        category,
+        id,
+        url,
+        score,
+        over_18,
+        created_utc,
+        media,
+    ):
+        self.title = title
+        self._author = author
+        self._text = selftext
+        self._category = category
+        self._id = id
+        self._url = url
+        self._score = score
+        self._nsfw = over_18
+        self._time_created = created_utc
+        self._media = media
+
+    @staticmethod
+    def from_dict(data, reddit=None):
+        """
+        Creates an article from fields previously stored with `to_dict`. The full PRAW article is
+        only fetched if it is needed, such as when getting comments.
+
+        Args:
+            data (dict): Stored fields of the article.
+            reddit (praw.Reddit): Client to fetch the full article with. None if the full
+                article will not be needed.
+
+        Returns:
+            RedditArticle: The article.
+        """
+        article = RedditArticle.__new__(RedditArticle)
+        article._article = None
+        article._reddit = reddit
+        article._set_fields(**data)
+        return article
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: Fields of the article that can be stored as JSON and restored with `from_dict`.
+        """
+        return {
+            "title": self.title,
+            "author": self._author,
+            "selftext": self._text,
+            "category": self._category,
+            "id": self._id,
+            "url": self._url,
+            "score": self._score,
+            "over_18": self._nsfw,
+            "created_utc": self._time_created,
+            "media": self._media,
+        }
+
+    @property
+    def _submission(self):
+        """
+        praw.models.reddit.submission.Submission: The full PRAW article, fetched if needed.
+        """
+        if self._article is None:
+            self._article = self._reddit.submission(id=self._id)
+        return self._article
 
     @property
     def age(self):
@@ -136,10 +285,22 @@ class RedditArticle:
     def category(self):
         return self._category
 
+    @property
+    def duration(self):
+        if self._media is None or "reddit_video" not in self._media:
+            return None
+        return float(self._media["reddit_video"]["duration"])
+
     @property
     def id(self):
         return self._id
 
+    @property
+    def video_url(self):
+        if self._media is None or "reddit_video" not in self._media:
+            return None
+        return self._media["reddit_video"].get("fallback_url")
+
     @property
     def nsfw(self):
         return self._nsfw
@@ -156,60 +317,79 @@ class RedditArticle:
     def url(self):
         return self._url
 
-    def _expand_comment(self, comment, praw_comment, max_depth, percent_thres):
-        if max_depth <= 0:
-            return
+    @staticmethod
+    def _is_comment(praw_comment):
+        """
+        Args:
+            praw_comment: Item from a PRAW comment forest.
 
-        # Get highest-scored reply
-        best_reply = None
-        for reply in praw_comment.replies:
-            if not isinstance(reply, praw.models.reddit.comment.Comment):
-                continue
-            if best_reply is None:
-                best_reply = reply
-            elif reply.score > best_reply.score:
-                best_reply = reply
+        Returns:
+            bool: Whether the item is a comment that was not deleted.
+        """
+        return (
+            isinstance(praw_comment, praw.models.reddit.comment.Comment)
+            and praw_comment.author is not None
+            and praw_comment.body != "[deleted]"
+        )
 
-        if not best_reply is None:
-            if best_reply.score > comment.score * percent_thres:
-                child = RedditComment.from_praw(best_reply)
-                comment.child = child
-                self._expand_comment(child, best_reply, max_depth - 1, percent_thres)
+    def _expand_comment(self, comment, praw_comment, max_depth, percent_thres):
+        """
+        Follows the highest-scored reply of each comment down the thread.
 
-    def get_comments(self, max_comments=10, max_depth=2, percent_thres=0.5):
+        Args:
+            comment (RedditComment): Comment to add the chain of replies to.
+            praw_comment (praw.models.reddit.comment.Comment): PRAW comment `comment` is from.
+            max_depth (int): Maximum number of replies to add.
+            percent_thres (float): What proportion of a parent comment's score a reply must
+                have to be added.
+        """
+        for _ in range(max_depth):
+            replies = [r for r in praw_comment.replies if self._is_comment(r)]
+            if not replies:
+                return
+            best_reply = max(replies, key=lambda r: r.score)
+            if best_reply.score <= comment.score * percent_thres:
+                return
+            comment.child = RedditComment.from_praw(best_reply)
+            comment = comment.child
+            praw_comment = best_reply
+
+    def get_comments(
+        self, max_comments=10, max_depth=2, percent_thres=0.5, more_budget=0
+    ):
         """
-        Gets the best comments.
+        Gets the best comments. Top-level comments are picked in a single pass over the thread
+        without sorting it, so large threads stay cheap.
 
         Args:
             max_comments (int): Maximum number of comments to return.
             max_depth (int): Maximum depth of comments to expand to.
             percent_thres (float): What proportion of a parent comment's score a child comment must
                 have to be included.
+            more_budget (int): Maximum number of "load more comments" links to expand, each of
+                which costs a request to Reddit. 0 to only use the comments that came with the
+                article.
 
         Returns:
-            list: List of `RedditComment`s.
+            list: List of `RedditComment`s in descending order by score.
         """
         max_comments = max(1, max_comments)
         max_depth = max(0, max_depth)
         percent_thres = max(0, percent_thres)
 
-        # Sort comments by score (descending order)
-        praw_comments = []
-        for comment in self._article.comments:
-            if not isinstance(comment, praw.models.reddit.comment.Comment):
-                continue
-            praw_comments.append(comment)
-            praw_comments.sort(key=lambda x: x.score, reverse=True)
+        forest = self._submission.comments
+        forest.replace_more(limit=max(0, more_budget))
+        best = heapq.nlargest(
+            max_comments,
+            (c for c in forest if self._is_comment(c)),
+            key=lambda c: c.score,
+        )
 
-        cnt = 0
         comments = []
-        for praw_comment in praw_comments[:max_comments]:
+        for praw_comment in best:
             comment = RedditComment.from_praw(praw_comment)
-            if comment.author is None or comment.text == "[deleted]":
-                continue
             self._expand_comment(comment, praw_comment, max_depth, percent_thres)
             comments.append(comment)
-
         return comments
 
     def has_video(self, min_duration=None, max_duration=None, include_youtube=True):
@@ -250,13 +430,89 @@ class RedditArticle:
             if not os.path.exists(path):
                 return path
 
-    def get_video(self):
+    @staticmethod
+    def _urls_from_manifest(dash_url, session, res):
+        """
+        Chooses the video and audio renditions of a Reddit-hosted video from its DASH manifest.
+
+        Args:
+            dash_url (str): URL of the DASH manifest.
+            session (requests.Session): Session to fetch the manifest with.
+            res (int, int): Width and height the video will be shown at. None for the largest
+                rendition.
+
+        Returns:
+            (str, str)/None: URLs of the video and audio. The audio URL is None if the video has
+                no audio. None if the manifest can't be fetched or used.
+        """
+        try:
+            req = session.get(dash_url, timeout=_PROBE_TIMEOUT)
+            if req.status_code != 200:
+                return None
+            representations = dash.parse_manifest(req.text, req.url or dash_url)
+        except (requests.exceptions.RequestException, dash.DashException):
+            # The fallback URL may still work.
+            return None
+        video = dash.select_video(representations, res)
+        if video is None:
+            return None
+        audio = dash.select_audio(representations)
+        return video.url, audio.url if audio is not None else None
+
+    @staticmethod
+    def _urls_from_fallback(video_url, session):
+        """
+        Guesses the audio URL of a Reddit-hosted video from its fallback URL, and checks that
+        the audio exists.
+
+        Args:
+            video_url (str): Fallback URL of the video.
+            session (requests.Session): Session to check for an audio track with.
+
+        Raises:
+            requests.exceptions.RequestException: If checking for an audio track fails.
+
+        Returns:
+            (str, str): URLs of the video and audio. The audio URL is None if the video has no
+                audio.
+        """
+        audio_url = list(urlsplit(video_url))
+        audio_url_path = audio_url[2]
+        audio_ext = os.path.splitext(audio_url_path)[1]
+        if audio_ext == ".mp4":
+            audio_basename = "DASH_audio.mp4"
+        else:
+            audio_basename = "audio"
+        audio_url[2] = urljoin(audio_url_path, audio_basename)
+        audio_url[3] = ""
+        audio_url[4] = ""
+        audio_url = urlunsplit(audio_url)
+
+        # Check if audio exists.
+        req = session.head(audio_url, timeout=_PROBE_TIMEOUT)
+        if req.status_code != 200:
+            audio_url = None
+        return video_url, audio_url
+
+    def get_video(self, session=None, res=None):
         """
         Gets a video reference from an article. Assumes the article has a video.
         Use 'has_video' to check that the articles has a video that can be scraped.
 
+        The renditions of a Reddit-hosted video are chosen from its DASH manifest, picking the
+        smallest video that fills `res` and the best audio. Videos without a usable manifest
+        fall back to their fallback URL.
+
+        Args:
+            session (requests.Session): Session to make requests with. None to use the shared
+                session from `rvidmaker.net`.
+            res (int, int): Width and height the video will be shown at. None for the largest
+                rendition.
+
         Raises:
             RedditVideoNotFound: If no video is found for the article.
+            requests.exceptions.RequestException: If the manifest can't be used and checking
+                for an audio track fails.
 
         Returns:
             VideoRef: Reference to the video.
@@ -268,70 +524,769 @@ class RedditArticle:
             # Scrape a video hosted by Reddit
             reddit_video = self._media["reddit_video"]
             duration = float(reddit_video["duration"])
+            if session is None:
+                session = get_session()
 
             # Get video and audio URLs
-            video_url = reddit_video["fallback_url"]
-            audio_url = list(urlsplit(video_url))
-            audio_url_path = audio_url[2]
-            audio_ext = os.path.splitext(audio_url_path)[1]
-            if audio_ext == ".mp4":
-                audio_basename = "DASH_audio.mp4"
-            else:
-                audio_basename = "audio"
-            audio_url[2] = urljoin(audio_url_path, audio_basename)
-            audio_url[3] = ""
-            audio_url[4] = ""
-            audio_url = urlunsplit(audio_url)
-
-            # Check if audio exists.
-            req = requests.head(audio_url)
-            if req.status_code != 200:
-                audio_url = None
+            urls = None
+            if reddit_video.get("dash_url"):
+                urls = self._urls_from_manifest(reddit_video["dash_url"], session, res)
+            if urls is None:
+                urls = self._urls_from_fallback(reddit_video["fallback_url"], session)
+            video_url, audio_url = urls
 
             return RedditVideoRef(
-                self.title, self.author, video_url, audio_url, duration
+                self.title, self.author, video_url, audio_url, duration, self.id
             )
         else:
             # Scrape a YouTube video
             raise NotImplementedError
 
 
+class VideoResult:
+    """
+    Result of resolving the video of an article with `RedditReader.get_videos`.
+
+    Attributes:
+        article (RedditArticle): The article.
+        video (VideoRef): Reference to the article's video. None if resolving it failed.
+        error (Exception): Why resolving the video failed. None if it succeeded.
+    """
+
+    def __init__(self, article, video=None, error=None):
+        """
+        Args:
+            article (RedditArticle): The article.
+            video (VideoRef): Reference to the article's video. None if resolving it failed.
+            error (Exception): Why resolving the video failed. None if it succeeded.
+        """
+        self._article = article
+        self._video = video
+        self._error = error
+
+    @property
+    def article(self):
+        return self._article
+
+    @property
+    def video(self):
+        return self._video
+
+    @property
+    def error(self):
+        return self._error
+
+
+class SubredditResult:
+    """
+    Result of reading a subreddit with `RedditReader.iter_subreddits`.
+
+    Attributes:
+        subreddit (str): Name of the subreddit.
+        articles (list): `RedditArticle`s that passed the filters, in listing order. None if
+            reading the subreddit failed.
+        error (Exception): Why reading the subreddit failed. None if it succeeded.
+    """
+
+    def __init__(self, subreddit, articles=None, error=None):
+        """
+        Args:
+            subreddit (str): Name of the subreddit.
+            articles (list): `RedditArticle`s that passed the filters. None if reading the
+                subreddit failed.
+            error (Exception): Why reading the subreddit failed. None if it succeeded.
+        """
+        self._subreddit = subreddit
+        self._articles = articles
+        self._error = error
+
+    @property
+    def subreddit(self):
+        return self._subreddit
+
+    @property
+    def articles(self):
+        return self._articles
+
+    @property
+    def error(self):
+        return self._error
+
+
+def _load_config():
+    """
+    Reads the API config in the working directory. The parsed config is kept until the file
+    changes.
+
+    Raises:
+        RedditConfigNotFound: If no config file is found.
+
+    Returns:
+        dict: The parsed config.
+    """
+    path = os.path.abspath(CONFIG_PATH)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        raise RedditConfigNotFound
+    with _configs_lock:
+        cached = _configs.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    with open(path) as f:
+        config = toml.load(f)
+    with _configs_lock:
+        _configs[path] = (mtime, config)
+    return config
+
+
 class RedditReader:
     """Reads popular articles from a subreddit"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        listing_cache=None,
+        rate_limiter=None,
+        session=None,
+        prefetch_pages=PREFETCH_PAGES,
+        token_cache=None,
+        fast_listings=False,
+    ):
         """
+        Args:
+            listing_cache (rvidmaker.readers.cache.ListingCache): Cache to read listings from
+                and store fetched listings in. None to always fetch listings.
+            rate_limiter (rvidmaker.readers.ratelimit.TokenBucket): Bucket that every request
+                to the Reddit API takes a token from. None to only use PRAW's own rate
+                limiting.
+            session (requests.Session): Session to send requests to the Reddit API with, such
+                as one from `rvidmaker.replay`. None to use the shared session from
+                `rvidmaker.net`.
+            prefetch_pages (int): Number of listing pages to fetch in the background ahead of
+                the articles being read. 0 to only fetch a page once it is needed.
+            token_cache (rvidmaker.readers.token.TokenCache): Cache of OAuth tokens to reuse
+                between runs. None to request a new token for every client.
+            fast_listings (bool): Whether to read listings straight from Reddit's JSON API
+                instead of through PRAW, which is much faster for long listings. Articles are
+                the same either way.
+
         Raises:
             RedditConfigNotFound: If no config file is found.
             RedditApiException: If calls to the Reddit API fail.
         """
 
-        if not os.path.exists(CONFIG_PATH):
-            raise RedditConfigNotFound
+        self._config = _load_config()
+        self._listing_cache = listing_cache
+        self._rate_limiter = rate_limiter
+        self._session = session
+        self._prefetch_pages = prefetch_pages
+        self._token_cache = token_cache
+        self._local = threading.local()
+        self.reddit = self._connect()
+        if fast_listings:
+            self._listing_client = ListingClient(
+                self._config["client_id"],
+                self._config["client_secret"],
+                USER_AGENT,
+                session=session,
+                rate_limiter=rate_limiter,
+                token_cache=token_cache,
+            )
+        else:
+            self._listing_client = None
+
+    @staticmethod
+    def shared(
+        listing_cache=None,
+        rate_limiter=None,
+        session=None,
+        prefetch_pages=PREFETCH_PAGES,
+        token_cache=None,
+        fast_listings=False,
+    ):
+        """
+        Gets a reader that is shared by the whole process, creating it the first time. Readers
+        are shared between callers that pass the same options and run in the same working
+        directory, so that they reuse one Reddit API client and its OAuth token. Listing and
+        token caches count as the same option if they use the same file, and the shared reader
+        keeps the caches it was first created with. A new reader is created once the API
+        config changes.
+
+        Args:
+            Same as `RedditReader`.
+
+        Raises:
+            RedditConfigNotFound: If no config file is found.
+            RedditApiException: If calls to the Reddit API fail.
+
+        Returns:
+            RedditReader: The shared reader.
+        """
+        config = _load_config()
+        key = (
+            os.path.abspath(CONFIG_PATH),
+            listing_cache and os.path.abspath(listing_cache.path),
+            rate_limiter,
+            session,
+            prefetch_pages,
+            token_cache and os.path.abspath(token_cache.path),
+            fast_listings,
+        )
+        with _shared_lock:
+            reader = _shared_readers.get(key)
+            if reader is not None and reader._config is config:
+                return reader
+            reader = RedditReader(
+                listing_cache=listing_cache,
+                rate_limiter=rate_limiter,
+                session=session,
+                prefetch_pages=prefetch_pages,
+                token_cache=token_cache,
+                fast_listings=fast_listings,
+            )
+            _shared_readers[key] = reader
+            return reader
 
-        with open(CONFIG_PATH) as f:
-            config = toml.load(f)
+    def _connect(self):
+        """
+        Creates a new Reddit API client.
 
+        Raises:
+            RedditApiException: If creating the client fails.
+
+        Returns:
+            praw.Reddit: The client.
+        """
+        session = self._session
+        if session is None:
+            session = get_session()
+        kwargs = {"requestor_kwargs": {"session": _praw_session(session)}}
+        if self._rate_limiter is not None:
+            kwargs["requestor_class"] = RateLimitedRequestor
+            kwargs["requestor_kwargs"]["bucket"] = self._rate_limiter
         try:
-            self.reddit = praw.Reddit(
-                client_id=config["client_id"],
-                client_secret=config["client_secret"],
+            reddit = praw.Reddit(
+                client_id=self._config["client_id"],
+                client_secret=self._config["client_secret"],
                 user_agent=USER_AGENT,
+                **kwargs,
             )
         except praw.exceptions.PRAWException as e:
             raise RedditApiException(str(e))
+        if self._token_cache is not None:
+            self._token_cache.install(reddit, self._config["client_id"])
+        return reddit
+
+    def _worker_reader(self):
+        """
+        Gets a reader for the current thread. PRAW clients are not thread safe, so each worker
+        thread reads through its own client while sharing the listing cache and rate limiter.
+
+        Returns:
+            RedditReader: Reader owned by the current thread.
+        """
+        reader = getattr(self._local, "reader", None)
+        if reader is None:
+            reader = copy(self)
+            reader.reddit = self._connect()
+            self._local.reader = reader
+        return reader
+
+    def _fetch_listing(self, subreddit, listing, limit, time_filter=None):
+        """
+        Streams the articles of a subreddit listing from Reddit.
+
+        Args:
+            subreddit (str): Name of subreddit.
+            listing (str): One of "hot", "new" or "top".
+            limit (int): Maximum number of articles to read. None for as many as possible.
+            time_filter (str): Time filter for the "top" listing.
+
+        Raises:
+            RedditApiException: If calls to the Reddit API fail.
+
+        Yields:
+            dict: Fields of each article for `RedditArticle.from_dict`, in listing order.
+        """
+        try:
+            if self._listing_client is not None:
+                yield from self._listing_client.iter_listing(
+                    subreddit, listing, limit, time_filter
+                )
+                return
+            sub = self.reddit.subreddit(subreddit)
+            if listing == "top":
+                raw_articles = sub.top(time_filter=time_filter, limit=limit)
+            elif listing == "new":
+                raw_articles = sub.new(limit=limit)
+            else:
+                raw_articles = sub.hot(limit=limit)
+            for raw_article in raw_articles:
+                yield RedditArticle(raw_article).to_dict()
+        except (
+            praw.exceptions.PRAWException,
+            prawcore.exceptions.PrawcoreException,
+            ListingException,
+        ) as e:
+            raise RedditApiException(str(e))
+
+    def _get_listing(self, subreddit, listing, limit, time_filter=None):
+        """
+        Gets the articles of a subreddit listing, from the listing cache if possible.
+
+        Args:
+            subreddit (str): Name of subreddit.
+            listing (str): Either "hot" or "top".
+            limit (int): Maximum number of articles to read. None for as many as possible.
+            time_filter (str): Time filter for the "top" listing.
+
+        Raises:
+            RedditApiException: If calls to the Reddit API fail.
+
+        Returns:
+            list: List of `RedditArticle`s in listing order.
+        """
+        return list(self._iter_listing(subreddit, listing, limit, time_filter))
+
+    @staticmethod
+    def _resolve_video(article, session, res):
+        """
+        Args:
+            article (RedditArticle): Article to get the video of.
+            session (requests.Session): Session to make requests with.
+            res (int, int): Width and height the video will be shown at. None for the largest
+                rendition.
+
+        Returns:
+            VideoResult: The video, or why it could not be resolved.
+        """
+        try:
+            return VideoResult(article, video=article.get_video(session, res))
+        except (
+            RedditVideoNotFound,
+            NotImplementedError,
+            requests.exceptions.RequestException,
+            # Raised by malformed media, which should only fail its own article.
+            KeyError,
+            TypeError,
+            ValueError,
+        ) as e:
+            return VideoResult(article, error=e)
+
+    def get_videos(self, articles, max_workers=VIDEO_WORKERS, session=None, res=None):
+        """
+        Gets video references for many articles at once. Articles are resolved concurrently
+        over a session that reuses connections, so each request does not pay for a new
+        connection.
+
+        Args:
+            articles (list): `RedditArticle`s to get videos for.
+            max_workers (int): Maximum number of articles resolved at once.
+            session (requests.Session): Session to make requests with. None to use the shared
+                session from `rvidmaker.net`.
+            res (int, int): Width and height the videos will be shown at, which picks the
+                rendition of each video. None for the largest renditions.
+
+        Returns:
+            list: A `VideoResult` for each article, in the same order as `articles`. Articles
+                whose video could not be resolved have a result with an error instead of a
+                video.
+        """
+        articles = list(articles)
+        if not articles:
+            return []
+        if session is None:
+            session = get_session()
+        max_workers = max(1, min(max_workers, len(articles)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(
+                executor.map(
+                    lambda art: self._resolve_video(art, session, res), articles
+                )
+            )
+
+    def _iter_listing(self, subreddit, listing, limit, time_filter=None):
+        """
+        Streams the articles of a subreddit listing, from the listing cache if possible. Pages
+        of the listing are requested from Reddit in the background, at most `prefetch_pages`
+        ahead of the articles being read, so closing the generator early saves the remaining
+        requests. The articles that were streamed are added to the listing cache once the
+        generator finishes or is closed.
+
+        Args:
+            subreddit (str): Name of subreddit.
+            listing (str): Either "hot" or "top".
+            limit (int): Maximum number of articles to read. None for as many as possible.
+            time_filter (str): Time filter for the "top" listing.
+
+        Raises:
+            RedditApiException: If calls to the Reddit API fail.
+
+        Yields:
+            RedditArticle: Articles in listing order.
+        """
+        if self._listing_cache is not None:
+            cached = self._listing_cache.get(subreddit, listing, time_filter, limit)
+            if cached is not None:
+                for d in cached:
+                    yield RedditArticle.from_dict(d, self.reddit)
+                return
+
+        fetched = []
+        finished = False
+        try:
+            raw_articles = self._fetch_listing(subreddit, listing, limit, time_filter)
+            # The next page is fetched only once the current one is used up, so read ahead
+            # while the caller works through the current page.
+            depth = self._prefetch_pages * LISTING_PAGE_SIZE
+            with closing(prefetch(raw_articles, depth)) as raw_articles:
+                for data in raw_articles:
+                    fetched.append(data)
+                    yield RedditArticle.from_dict(data, self.reddit)
+            finished = True
+        finally:
+            if self._listing_cache is not None and (finished or fetched):
+                # A listing that was cut short only covers the articles that were streamed.
+                self._listing_cache.put(
+                    subreddit,
+                    listing,
+                    fetched,
+                    time_filter=time_filter,
+                    limit=limit if finished else len(fetched),
+                )
+
+    def iter_articles(
+        self,
+        subreddit,
+        listing="top",
+        time_filter="all",
+        limit=None,
+        min_score=None,
+        min_age=None,
+        include_nsfw=True,
+        video_only=False,
+        min_duration=None,
+        max_duration=None,
+    ):
+        """
+        Lazily streams the articles of a subreddit that pass the filters. Articles are fetched
+        page by page as the generator is consumed, so stopping once enough articles are found
+        avoids requesting the rest of the listing.
+
+        Args:
+            subreddit (str): Name of subreddit.
+            listing (str): Either "hot" or "top".
+            time_filter (str): One of "all", "day", "hour", "month", "week", "year". Only used
+                by the "top" listing.
+            limit (int): Maximum number of articles to read from the listing, including ones
+                that are filtered out. None to read as many articles as possible.
+            min_score (int): Minimum score of articles to include. None for no minimum.
+            min_age (int): Minimum age in hours of articles to include. None for no minimum.
+            include_nsfw (bool): Whether to include articles labeled as not safe for work.
+            video_only (bool): Whether to only include articles with a Reddit-hosted video.
+            min_duration (int): Minimum duration of videos in seconds when `video_only` is set.
+                None for no minimum.
+            max_duration (int): Maximum duration of videos in seconds when `video_only` is set.
+                None for no maximum.
+
+        Raises:
+            RedditApiException: If calls to the Reddit API fail or the listing is not valid.
+
+        Yields:
+            RedditArticle: Articles that pass the filters, in listing order.
+        """
+        if listing not in ("hot", "top"):
+            raise RedditApiException('listing must be one of ("hot", "top")')
+        if listing == "top":
+            if time_filter not in VALID_TIME_FILTERS:
+                raise RedditApiException(
+                    "time_filter must be one of {}".format(VALID_TIME_FILTERS)
+                )
+        else:
+            time_filter = None
+        limit = limit and max(1, limit) or None
+
+        for art in self._iter_listing(subreddit, listing, limit, time_filter):
+            if min_score is not None and art.score < min_score:
+                continue
+            if min_age is not None and art.age < min_age:
+                continue
+            if not include_nsfw and art.nsfw:
+                continue
+            if video_only and not art.has_video(
+                min_duration=min_duration,
+                max_duration=max_duration,
+                include_youtube=False,
+            ):
+                continue
+            yield art
+
+    def update_pool(self, subreddit, max_age=None, limit=POOL_FETCH_LIMIT):
+        """
+        Adds the articles posted to a subreddit since the last update to its candidate pool in
+        the listing cache. The "new" listing is read from the newest article until the article
+        the pool's cursor points to, so a pool kept up to date costs only a request or two.
+        Requires a listing cache.
+
+        Args:
+            subreddit (str): Name of subreddit.
+            max_age (float): Age in hours after which articles are removed from the pool. None
+                to keep articles forever.
+            limit (int): Maximum number of new articles to read. None for as many as possible.
+
+        Raises:
+            RedditApiException: If calls to the Reddit API fail or there is no listing cache.
+
+        Returns:
+            int: Number of articles added to the pool.
+        """
+        if self._listing_cache is None:
+            raise RedditApiException(
+                "Updating a candidate pool requires a listing cache"
+            )
+        cursor = self._listing_cache.cursor(subreddit, "new")
+
+        fetched = []
+        with closing(self._fetch_listing(subreddit, "new", limit)) as raw_articles:
+            for data in raw_articles:
+                if cursor is not None:
+                    fullname, created_utc = cursor
+                    # The listing is sorted newest first. The creation time also stops the
+                    # read if the article the cursor points to was deleted.
+                    if "t3_" + data["id"] == fullname:
+                        break
+                    if data["created_utc"] < created_utc:
+                        break
+                fetched.append(data)
+
+        self._listing_cache.extend_pool(subreddit, "new", fetched)
+        if max_age is not None:
+            now = datetime.now().timestamp()
+            self._listing_cache.prune_pool(subreddit, now - max_age * 60 * 60)
+        return len(fetched)
+
+    def refresh_articles(self, ids):
+        """
+        Looks up the current state of articles, such as their score and media, in batches of
+        `INFO_BATCH_SIZE` articles per request.
+
+        Args:
+            ids (list): IDs of the articles.
+
+        Raises:
+            RedditApiException: If calls to the Reddit API fail.
+
+        Returns:
+            dict: Maps each ID to a fresh `RedditArticle`, or to None if the article was removed
+                or deleted.
+        """
+        ids = list(ids)
+        refreshed = dict.fromkeys(ids)
+        try:
+            for start in range(0, len(ids), INFO_BATCH_SIZE):
+                batch = ids[start : start + INFO_BATCH_SIZE]
+                fullnames = ["t3_{}".format(post_id) for post_id in batch]
+                for submission in self.reddit.info(fullnames=fullnames):
+                    removed = (
+                        getattr(submission, "removed_by_category", None) is not None
+                        or submission.author is None
+                    )
+                    if not removed:
+                        refreshed[submission.id] = RedditArticle(submission)
+        except (
+            praw.exceptions.PRAWException,
+            prawcore.exceptions.PrawcoreException,
+        ) as e:
+            raise RedditApiException(str(e))
+        return refreshed
+
+    def refresh_pool(self, subreddit, max_age=None):
+        """
+        Refreshes the articles in a subreddit's candidate pool with `refresh_articles`. Articles
+        that were removed or deleted are taken out of the pool. Requires a listing cache.
+
+        Args:
+            subreddit (str): Name of subreddit.
+            max_age (float): Only refresh articles up to this age in hours. None to refresh
+                every article.
+
+        Raises:
+            RedditApiException: If calls to the Reddit API fail or there is no listing cache.
+        """
+        if self._listing_cache is None:
+            raise RedditApiException(
+                "Refreshing a candidate pool requires a listing cache"
+            )
+        min_created_utc = None
+        if max_age is not None:
+            min_created_utc = datetime.now().timestamp() - max_age * 60 * 60
+        ids = [d["id"] for d in self._listing_cache.pool(subreddit, min_created_utc)]
+        refreshed = self.refresh_articles(ids)
+        self._listing_cache.refresh_pool(
+            subreddit,
+            [art.to_dict() for art in refreshed.values() if art is not None],
+            removed_ids=[i for i, art in refreshed.items() if art is None],
+        )
+
+    def get_pool_articles(
+        self, subreddit, max_age=None, min_score=None, min_age=None, refresh=False
+    ):
+        """
+        Gets the articles in a subreddit's candidate pool. Unless the pool is refreshed first,
+        scores are as they were when each article was added to the pool. Requires a listing
+        cache.
+
+        Args:
+            subreddit (str): Name of subreddit.
+            max_age (float): Maximum age in hours of articles to include. None for no maximum.
+            min_score (int): Minimum score of articles to include. None for no minimum.
+            min_age (int): Minimum age in hours of articles to include. None for no minimum.
+            refresh (bool): Whether to refresh the pool with `refresh_pool` first, so that
+                scores are current and removed articles are left out.
+
+        Raises:
+            RedditApiException: If calls to the Reddit API fail or there is no listing cache.
+
+        Returns:
+            list: List of `RedditArticle`s sorted in descending order by score.
+        """
+        if self._listing_cache is None:
+            raise RedditApiException(
+                "Reading a candidate pool requires a listing cache"
+            )
+        if refresh:
+            self.refresh_pool(subreddit, max_age=max_age)
+        min_created_utc = None
+        if max_age is not None:
+            min_created_utc = datetime.now().timestamp() - max_age * 60 * 60
+        articles = [
+            RedditArticle.from_dict(d, self.reddit)
+            for d in self._listing_cache.pool(subreddit, min_created_utc)
+        ]
+        return self._filter_articles(articles, min_score=min_score, min_age=min_age)
+
+    def _harvest_comments(self, article, kwargs):
+        """
+        Gets the comments of an article on a worker thread.
+
+        Args:
+            article (RedditArticle): Article to get the comments of.
+            kwargs (dict): Keyword arguments for `RedditArticle.get_comments`.
+
+        Returns:
+            list: `RedditComment`s of the article. None if getting them failed.
+        """
+        try:
+            reader = self._worker_reader()
+            # Fetch the article with the thread's own client.
+            local = RedditArticle.from_dict(article.to_dict(), reader.reddit)
+            return local.get_comments(**kwargs)
+        except (
+            RedditApiException,
+            praw.exceptions.PRAWException,
+            prawcore.exceptions.PrawcoreException,
+        ) as e:
+            print(
+                'WARNING: Failed to get comments for "{}": {}'.format(article.title, e)
+            )
+            return None
+
+    def get_comments(self, articles, max_workers=COMMENT_WORKERS, **kwargs):
+        """
+        Gets the best comments of many articles at once. Each worker thread fetches articles
+        with its own Reddit API client, and every request shares the reader's rate limiter.
+
+        Args:
+            articles (list): `RedditArticle`s to get comments for.
+            max_workers (int): Maximum number of articles fetched at once.
+            **kwargs: Arguments for `RedditArticle.get_comments`, such as `max_comments`, used
+                for every article.
+
+        Returns:
+            dict: Maps the ID of each article to its list of `RedditComment`s, whose chains of
+                replies can be followed with `RedditComment.child`. Articles whose comments
+                could not be fetched map to None.
+        """
+        articles = list(articles)
+        if not articles:
+            return {}
+        max_workers = max(1, min(max_workers, len(articles)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(
+                lambda art: self._harvest_comments(art, kwargs), articles
+            )
+            return {art.id: comments for art, comments in zip(articles, results)}
+
+    def _read_subreddit(self, subreddit, kwargs):
+        """
+        Reads the articles of a subreddit on a worker thread.
+
+        Args:
+            subreddit (str): Name of subreddit.
+            kwargs (dict): Keyword arguments for `iter_articles`.
+
+        Returns:
+            SubredditResult: The articles, or why reading them failed.
+        """
+        try:
+            reader = self._worker_reader()
+            articles = list(reader.iter_articles(subreddit, **kwargs))
+        except RedditApiException as e:
+            return SubredditResult(subreddit, error=e)
+        return SubredditResult(subreddit, articles=articles)
+
+    def iter_subreddits(self, subreddits, max_workers=SUBREDDIT_WORKERS, **kwargs):
+        """
+        Reads the articles of many subreddits concurrently. Each worker thread has its own
+        Reddit API client, and all of them share the reader's listing cache and rate limiter.
+        Use a `TokenBucket` as the rate limiter so that the workers together stay within
+        Reddit's rate limit.
+
+        Args:
+            subreddits (list): Names of the subreddits.
+            max_workers (int): Maximum number of subreddits read at once.
+            **kwargs: Arguments for `iter_articles`, such as the listing, limit and filters,
+                used for every subreddit.
+
+        Yields:
+            SubredditResult: Result for each subreddit, in the order the subreddits finish.
+        """
+        subreddits = list(subreddits)
+        if not subreddits:
+            return
+        max_workers = max(1, min(max_workers, len(subreddits)))
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        futures = []
+        try:
+            futures = [
+                executor.submit(self._read_subreddit, sub, kwargs) for sub in subreddits
+            ]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            if sys.version_info >= (3, 9):
+                executor.shutdown(cancel_futures=True)
+            else:
+                for future in futures:
+                    future.cancel()
+                executor.shutdown()
 
     def _filter_articles(self, articles, min_score=None, min_age=None):
-        filtered = []
-        for art in articles:
-            if not min_score is None:
-                if art.score < min_score:
-                    continue
-            if not min_age is None:
-                if art.age < min_age:
-                    continue
-            filtered.append(art)
-        return filtered
+        """
+        Filters articles and sorts them in descending order by score. Ages are all measured
+        against the same moment.
+
+        Args:
+            articles (list): `RedditArticle`s to filter.
+            min_score (int): Minimum score of articles to include. None for no minimum.
+            min_age (int): Minimum age in hours of articles to include. None for no minimum.
+
+        Returns:
+            list: `RedditArticle`s that pass the filters.
+        """
+        batch = ArticleBatch.from_articles(articles)
+        kept = batch.filter(min_score=min_score, min_age=min_age).sort()
+        return [articles[i] for i in kept.index]
 
     def get_hot_articles(self, subreddit, limit=10, min_score=None, min_age=None):
         """
@@ -351,18 +1306,8 @@ class RedditReader:
             list: List of `RedditArticle`s sorted in descending order by score.
         """
         limit = limit and max(1, limit) or None
-        try:
-            sub = self.reddit.subreddit(subreddit)
-            raw_articles = sub.hot(limit=limit)
-        except praw.exceptions.PRAWException as e:
-            raise RedditApiException(str(e))
-
-        unfiltered = [RedditArticle(art) for art in raw_articles]
-        filtered = self._filter_articles(
-            unfiltered, min_score=min_score, min_age=min_age
-        )
-        filtered.sort(key=lambda x: x.score, reverse=True)
-        return filtered
+        unfiltered = self._get_listing(subreddit, "hot", limit)
+        return self._filter_articles(unfiltered, min_score=min_score, min_age=min_age)
 
     def get_top_articles(
         self, subreddit, time_filter="all", limit=10, min_score=None, min_age=None
@@ -389,15 +1334,6 @@ class RedditReader:
                 "time_filter must be one of {}".format(VALID_TIME_FILTERS)
             )
         limit = limit and max(1, limit) or None
-        try:
-            sub = self.reddit.subreddit(subreddit)
-            raw_articles = sub.top(time_filter=time_filter, limit=limit)
-            unfiltered = [RedditArticle(art) for art in raw_articles]
-        except praw.exceptions.PRAWException as e:
-            raise RedditApiException(str(e))
+        unfiltered = self._get_listing(subreddit, "top", limit, time_filter)
 
-        filtered = self._filter_articles(
-            unfiltered, min_score=min_score, min_age=min_age
-        )
-        filtered.sort(key=lambda x: x.score, reverse=True)
-        return filtered
+        return self._filter_articles(unfiltered, min_score=min_score, min_age=min_age)
@@ -0,0 +1,197 @@
+"""Keeps Reddit's app-only OAuth tokens on disk between runs"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from rvidmaker.utils import random_string
+
+# Seconds before a token expires that it stops being used.
+EXPIRY_MARGIN = 60
+
+
+class TokenCache:
+    """
+    Stores the app-only OAuth tokens PRAW obtains in a JSON file, so that later processes can
+    reuse a token until it expires instead of requesting a new one. Tokens are stored per
+    client ID, and the file is only readable by its owner.
+
+    PRAW has no public way to set a token, so the cache works with the private state of
+    prawcore's `ReadOnlyAuthorizer`. If that state is not as expected, the cache does nothing
+    and PRAW requests tokens as usual.
+
+    Attributes:
+        path (str): Path to the JSON file.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Path to the JSON file. Created when the first token is stored.
+        """
+        self._path = path
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return self._path
+
+    @staticmethod
+    def _key(client_id):
+        return hashlib.sha256(client_id.encode()).hexdigest()
+
+    def _read(self):
+        """
+        Returns:
+            dict: Stored tokens by key. Empty if the file is missing or not valid.
+        """
+        try:
+            with open(self._path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def load(self, client_id):
+        """
+        Args:
+            client_id (str): Client ID of the Reddit app.
+
+        Returns:
+            (str, list, float)/None: Access token, its scopes and the UNIX timestamp it expires
+                at. None if no token is stored or it is about to expire.
+        """
+        with self._lock:
+            entry = self._read().get(self._key(client_id))
+        if entry is None:
+            return None
+        try:
+            token, scopes, expires_at = (
+                entry["access_token"],
+                entry["scopes"],
+                float(entry["expires_at"]),
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+        if expires_at - EXPIRY_MARGIN <= time.time():
+            return None
+        return token, scopes, expires_at
+
+    def save(self, client_id, token, scopes, expires_at):
+        """
+        Stores a token, replacing any token stored for the same app. The file is written
+        atomically.
+
+        Args:
+            client_id (str): Client ID of the Reddit app.
+            token (str): Access token.
+            scopes (list): Scopes of the token.
+            expires_at (float): UNIX timestamp the token expires at.
+        """
+        parent = os.path.dirname(self._path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        with self._lock:
+            data = self._read()
+            data[self._key(client_id)] = {
+                "access_token": token,
+                "scopes": sorted(scopes),
+                "expires_at": expires_at,
+            }
+            temp_path = "{}.{}.tmp".format(self._path, random_string(10))
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(temp_path, self._path)
+
+    @staticmethod
+    def _authorizer(reddit):
+        """
+        Args:
+            reddit (praw.Reddit): Client to get the authorizer of.
+
+        Returns:
+            prawcore.auth.ReadOnlyAuthorizer: Authorizer of the client's read-only requests.
+                None if it can't be found.
+        """
+        try:
+            return reddit._read_only_core._authorizer
+        except AttributeError:
+            return None
+
+    @staticmethod
+    def _get_expiry(authorizer):
+        """
+        Returns:
+            float: UNIX timestamp the authorizer's token expires at.
+        """
+        if hasattr(authorizer, "_expiration_timestamp_ns"):
+            # Newer prawcore measures expiry on the monotonic clock.
+            remaining = (
+                authorizer._expiration_timestamp_ns - time.monotonic_ns()
+            ) / 1e9
+            return time.time() + remaining
+        return authorizer._expiration_timestamp
+
+    @staticmethod
+    def _set_expiry(authorizer, expires_at):
+        """
+        Args:
+            authorizer (prawcore.auth.ReadOnlyAuthorizer): Authorizer to set the expiry of.
+            expires_at (float): UNIX timestamp the token expires at.
+        """
+        if hasattr(authorizer, "_expiration_timestamp"):
+            authorizer._expiration_timestamp = expires_at
+        else:
+            remaining = expires_at - time.time()
+            authorizer._expiration_timestamp_ns = time.monotonic_ns() + int(
+                remaining * 1e9
+            )
+
+    def install(self, reddit, client_id):
+        """
+        Makes a client use the stored token if there is a valid one, and store the tokens it
+        obtains from now on.
+
+        Args:
+            reddit (praw.Reddit): Client to install the cache in.
+            client_id (str): Client ID of the Reddit app.
+
+        Returns:
+            bool: True if the cache was installed, and False if the client's authorizer is not
+                as expected.
+        """
+        authorizer = self._authorizer(reddit)
+        if authorizer is None or not hasattr(authorizer, "refresh"):
+            return False
+
+        try:
+            cached = self.load(client_id)
+            if cached is not None:
+                token, scopes, expires_at = cached
+                self._set_expiry(authorizer, expires_at)
+                authorizer.access_token = token
+                authorizer.scopes = set(scopes)
+        except AttributeError:
+            return False
+
+        refresh = authorizer.refresh
+
+        def refresh_and_save():
+            refresh()
+            try:
+                expires_at = self._get_expiry(authorizer)
+                token = authorizer.access_token
+                scopes = authorizer.scopes or []
+            except AttributeError:
+                return
+            if token is not None and expires_at is not None:
+                try:
+                    self.save(client_id, token, scopes, expires_at)
+                except OSError as e:
+                    print("WARNING: Failed to cache Reddit token: {}".format(e))
+
+        authorizer.refresh = refresh_and_save
+        return True
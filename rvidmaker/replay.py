@@ -0,0 +1,426 @@
+"""
+Records HTTP traffic to a fixture archive and replays it without network access.
+
+Install a recording or replaying session with `rvidmaker.net.set_session`, and pass the same
+session to `RedditReader`, so that Reddit API requests, audio probes and video downloads all go
+through it.
+"""
+
+from email.utils import formatdate
+import hashlib
+import io
+import json
+import os
+import re
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from rvidmaker.net import POOL_SIZE
+from rvidmaker.utils import random_string
+
+# Name of the file listing every recorded response in an archive.
+INDEX_NAME = "index.json"
+# Directory within an archive that response bodies are stored in.
+BODIES_DIR = "bodies"
+# Version of the archive format.
+_VERSION = 1
+# Response headers that describe how the body was sent, and no longer apply once it is stored.
+_TRANSPORT_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+# Path of the endpoint Reddit hands out OAuth tokens from.
+_TOKEN_PATH = "/api/v1/access_token"
+# Number of bytes read at a time while replaying a body.
+_CHUNK_SIZE = 1 << 16
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+class ReplayException(Exception):
+    """Raised if a fixture archive cannot be read"""
+
+
+def _request_key(method, url):
+    """
+    Args:
+        method (str): HTTP method of a request.
+        url (str): URL of the request.
+
+    Returns:
+        str: Key that identifies the request regardless of the order of its query parameters.
+    """
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    url = urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, query, ""))
+    return "{} {}".format(method.upper(), url)
+
+
+class FixtureArchive:
+    """
+    Directory of recorded HTTP responses. `index.json` maps each request to the status and
+    headers of its response, and bodies are stored in files named by their SHA-256 digest, so
+    identical bodies are only stored once.
+
+    Attributes:
+        root (str): Directory of the archive.
+    """
+
+    def __init__(self, root):
+        """
+        Args:
+            root (str): Directory of the archive. Created if it does not exist.
+
+        Raises:
+            ReplayException: If the archive's index cannot be read.
+        """
+        self._root = root
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, BODIES_DIR), exist_ok=True)
+        index_path = os.path.join(root, INDEX_NAME)
+        if os.path.exists(index_path):
+            try:
+                with open(index_path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                raise ReplayException('Failed to read "{}": {}'.format(index_path, e))
+            if data.get("version") != _VERSION:
+                raise ReplayException(
+                    'Unsupported archive version in "{}"'.format(index_path)
+                )
+            self._entries = data["entries"]
+        else:
+            self._entries = {}
+
+    @property
+    def root(self):
+        return self._root
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _body_path(self, digest):
+        return os.path.join(self._root, BODIES_DIR, digest)
+
+    def _save_index(self):
+        """Writes the index atomically. Must be called with the lock held."""
+        index_path = os.path.join(self._root, INDEX_NAME)
+        temp_path = "{}.{}.tmp".format(index_path, random_string(10))
+        with open(temp_path, "w") as f:
+            json.dump(
+                {"version": _VERSION, "entries": self._entries},
+                f,
+                indent=1,
+                sort_keys=True,
+            )
+        os.replace(temp_path, index_path)
+
+    def add(self, method, url, status, headers, body):
+        """
+        Records a response, replacing any response previously recorded for the same request.
+
+        Args:
+            method (str): HTTP method of the request.
+            url (str): URL of the request.
+            status (int): Status code of the response.
+            headers (dict): Headers of the response.
+            body (bytes): Decoded body of the response.
+        """
+        digest = hashlib.sha256(body).hexdigest()
+        body_path = self._body_path(digest)
+        if not os.path.exists(body_path):
+            temp_path = "{}.{}.tmp".format(body_path, random_string(10))
+            with open(temp_path, "wb") as f:
+                f.write(body)
+            os.replace(temp_path, body_path)
+        headers = {
+            k.lower(): v
+            for k, v in headers.items()
+            if k.lower() not in _TRANSPORT_HEADERS
+        }
+        with self._lock:
+            self._entries[_request_key(method, url)] = {
+                "status": status,
+                "headers": headers,
+                "body": digest,
+                "size": len(body),
+            }
+            self._save_index()
+
+    def get(self, method, url):
+        """
+        Args:
+            method (str): HTTP method of the request.
+            url (str): URL of the request.
+
+        Returns:
+            (int, dict, str)/None: Status, headers and path of the body of the recorded
+                response, or None if the request was not recorded. A HEAD request is answered
+                with the response recorded for the matching GET request if it has none of its
+                own.
+        """
+        with self._lock:
+            entry = self._entries.get(_request_key(method, url))
+            if entry is None and method.upper() == "HEAD":
+                entry = self._entries.get(_request_key("GET", url))
+        if entry is None:
+            return None
+        return entry["status"], dict(entry["headers"]), self._body_path(entry["body"])
+
+
+class RecordingAdapter(HTTPAdapter):
+    """
+    Transport adapter that sends requests over the network and records every response in a
+    fixture archive. OAuth tokens are replaced before they are recorded.
+
+    Range requests are keyed by URL like any other request, so rather than the partial
+    responses, the whole file is fetched once and recorded for `ReplayAdapter` to slice.
+    """
+
+    def __init__(self, archive, **kwargs):
+        """
+        Args:
+            archive (FixtureArchive): Archive to record responses in.
+            **kwargs: Arguments for `requests.adapters.HTTPAdapter`.
+        """
+        super().__init__(**kwargs)
+        self._archive = archive
+        self._whole_lock = threading.Lock()
+        self._whole_urls = set()
+
+    def _record_whole(self, request, **kwargs):
+        """
+        Fetches and records the whole file that a range request asked for part of, unless it
+        has already been recorded.
+
+        Args:
+            request (requests.PreparedRequest): Range request.
+            **kwargs: Arguments the range request was sent with.
+        """
+        key = _request_key(request.method, request.url)
+        with self._whole_lock:
+            if key in self._whole_urls:
+                return
+            self._whole_urls.add(key)
+        whole = request.copy()
+        del whole.headers["Range"]
+        try:
+            response = super().send(whole, **kwargs)
+            body = response.content
+        except requests.exceptions.RequestException:
+            # Let a later range request try again.
+            with self._whole_lock:
+                self._whole_urls.discard(key)
+            raise
+        self._archive.add(
+            whole.method, whole.url, response.status_code, response.headers, body
+        )
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        if "Range" in request.headers and response.status_code == 206:
+            # Read the part first, so its connection is back in the pool for the next request.
+            response.content
+            self._record_whole(request, **kwargs)
+            return response
+        # Reading the content also means streamed responses are read in full while recording.
+        body = response.content
+        if urlsplit(request.url).path == _TOKEN_PATH and response.status_code == 200:
+            token = response.json()
+            token["access_token"] = "replay"
+            body = json.dumps(token).encode()
+        self._archive.add(
+            request.method, request.url, response.status_code, response.headers, body
+        )
+        return response
+
+
+class _ThrottledReader(io.RawIOBase):
+    """Reads part of a file no faster than a given bandwidth"""
+
+    def __init__(self, f, length, bandwidth):
+        """
+        Args:
+            f: Binary file, positioned at the first byte to read.
+            length (int): Number of bytes to read.
+            bandwidth (float): Maximum bytes read per second. None for no limit.
+        """
+        self._f = f
+        self._remaining = length
+        self._bandwidth = bandwidth
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._remaining
+        size = min(size, self._remaining, _CHUNK_SIZE)
+        if size <= 0:
+            return b""
+        data = self._f.read(size)
+        self._remaining -= len(data)
+        if self._bandwidth:
+            time.sleep(len(data) / self._bandwidth)
+        return data
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[: len(data)] = data
+        return len(data)
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Transport adapter that answers requests with responses from a fixture archive, without
+    touching the network. Requests that were not recorded are answered with a 404 response.
+    Byte ranges are honored, and latency and bandwidth can be simulated to make benchmarks
+    realistic yet reproducible.
+    """
+
+    def __init__(self, archive, latency=0.0, bandwidth=None):
+        """
+        Args:
+            archive (FixtureArchive): Archive to replay responses from.
+            latency (float): Seconds to wait before each response.
+            bandwidth (float): Maximum bytes per second each response body is read at. None for
+                no limit.
+        """
+        super().__init__()
+        self._archive = archive
+        self._latency = latency
+        self._bandwidth = bandwidth
+
+    @staticmethod
+    def _parse_range(header, size):
+        """
+        Args:
+            header (str): Value of a `Range` header. None if there is none.
+            size (int): Size of the body in bytes.
+
+        Returns:
+            (int, int)/None: First and last byte of the range, or None for the whole body.
+
+        Raises:
+            ValueError: If the range cannot be satisfied.
+        """
+        if header is None:
+            return None
+        match = _RANGE_RE.match(header.strip())
+        if match is None:
+            # Multiple or malformed ranges, which servers may ignore.
+            return None
+        first, last = match.groups()
+        if first == "":
+            if last == "":
+                raise ValueError
+            first, last = max(0, size - int(last)), size - 1
+        else:
+            first = int(first)
+            last = size - 1 if last == "" else min(int(last), size - 1)
+        if first >= size or first > last:
+            raise ValueError
+        return first, last
+
+    def send(self, request, stream=False, timeout=None, **kwargs):
+        if self._latency:
+            time.sleep(self._latency)
+
+        recorded = self._archive.get(request.method, request.url)
+        if recorded is None:
+            status, headers, body_path = 404, {}, None
+            size = 0
+        else:
+            status, headers, body_path = recorded
+            size = os.path.getsize(body_path)
+
+        headers = CaseInsensitiveDict(headers)
+        headers.setdefault("date", formatdate(usegmt=True))
+        first, length = 0, size
+        if status == 200:
+            try:
+                byte_range = self._parse_range(request.headers.get("Range"), size)
+            except ValueError:
+                byte_range = None
+                status, body_path, length = 416, None, 0
+                headers["content-range"] = "bytes */{}".format(size)
+            if byte_range is not None:
+                first, last = byte_range
+                length = last - first + 1
+                status = 206
+                headers["content-range"] = "bytes {}-{}/{}".format(first, last, size)
+            headers["accept-ranges"] = "bytes"
+        if request.method.upper() == "HEAD":
+            headers["content-length"] = str(length)
+            length = 0
+        else:
+            headers["content-length"] = str(length)
+
+        if body_path is not None and length > 0:
+            f = open(body_path, "rb")
+            f.seek(first)
+            raw = _ThrottledReader(f, length, self._bandwidth)
+        else:
+            raw = _ThrottledReader(io.BytesIO(), 0, None)
+
+        response = requests.Response()
+        response.status_code = status
+        response.headers = headers
+        response.raw = raw
+        response.url = request.url
+        response.request = request
+        response.reason = "Replayed" if recorded is not None else "Not Recorded"
+        response.encoding = requests.utils.get_encoding_from_headers(headers)
+        return response
+
+    def close(self):
+        pass
+
+
+def record_session(root, pool_size=POOL_SIZE):
+    """
+    Creates a session that records every response it receives.
+
+    Args:
+        root (str): Directory of the fixture archive to record into.
+        pool_size (int): Maximum number of connections kept open to each host.
+
+    Returns:
+        requests.Session: The session.
+    """
+    archive = FixtureArchive(root)
+    session = requests.Session()
+    adapter = RecordingAdapter(
+        archive, pool_connections=pool_size, pool_maxsize=pool_size
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def replay_session(root, latency=0.0, bandwidth=None):
+    """
+    Creates a session that answers every request from a fixture archive.
+
+    Args:
+        root (str): Directory of the fixture archive to replay.
+        latency (float): Seconds to wait before each response.
+        bandwidth (float): Maximum bytes per second each response body is read at. None for no
+            limit.
+
+    Returns:
+        requests.Session: The session.
+
+    Raises:
+        ReplayException: If the archive cannot be read.
+    """
+    archive = FixtureArchive(root)
+    session = requests.Session()
+    adapter = ReplayAdapter(archive, latency=latency, bandwidth=bandwidth)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
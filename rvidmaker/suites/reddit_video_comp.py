@@ -1,14 +1,23 @@
 """Provides a suite for generating compilations of videos from subreddits"""
 
+from contextlib import closing
 from datetime import timedelta
+from itertools import islice
 import os
+import sqlite3
 import toml
 from toml import TomlDecodeError
 
 from rvidmaker.editor import VideoCompiler
+from rvidmaker.editor.planner import plan_clips
+from rvidmaker.editor.videocomp import RenderException, VALID_BACKENDS
+from rvidmaker.readers.cache import ListingCache
+from rvidmaker.readers.token import TokenCache
 from rvidmaker.readers.reddit import RedditReader
 from rvidmaker.thumbnails import create_split_thumbnail
 from rvidmaker.uploaders import Payload
+from rvidmaker.videos import ClipCache, UsedClipIndex
+from rvidmaker.videos.history import media_key
 from rvidmaker.utils import (
     extract_tags,
     get_random_path,
@@ -31,8 +40,19 @@ MAX_TITLE_LEN = 50
 MAX_THUMB_TITLE_LEN = 20
 # Directory to temporarily download videos from a subreddit to.
 TEMP_DIR = "/tmp/rvidmaker/reddit-video-comp/"
+# Default byte budget of the clip cache in megabytes.
+DEFAULT_CLIP_CACHE_SIZE = 10240
 # Valid time frames in the TOML profile file.
 VALID_TIME_FRAMES = ("all", "day", "hour", "month", "week", "year")
+# Hours covered by each time frame. None for no limit.
+TIME_FRAME_HOURS = {
+    "all": None,
+    "day": 24,
+    "hour": 1,
+    "month": 31 * 24,
+    "week": 7 * 24,
+    "year": 366 * 24,
+}
 
 if not os.path.exists(TEMP_DIR):
     os.makedirs(TEMP_DIR)
@@ -77,6 +97,10 @@ class RedditVideoCompSuite(Suite):
             self._clip_limit = toml_get_and_check(
                 profile, "clip_limit", int, default=50
             )
+            self._target_dur = toml_get_and_check(profile, "target_duration", int)
+            self._standby_clips = toml_get_and_check(
+                profile, "standby_clips", int, default=3
+            )
             self._res = toml_get_and_check(
                 profile, "resolution", list, int, default=[1920, 1080]
             )
@@ -89,6 +113,25 @@ class RedditVideoCompSuite(Suite):
             self._default_tags = toml_get_and_check(
                 profile, "default_tags", list, str, default=list()
             )
+            self._render_backend = toml_get_and_check(
+                profile, "render_backend", str, default="moviepy"
+            )
+            listing_cache_path = toml_get_and_check(profile, "listing_cache", str)
+            token_cache_path = toml_get_and_check(profile, "token_cache", str)
+            self._fast_listings = toml_get_and_check(
+                profile, "fast_listings", bool, default=False
+            )
+            self._candidate_pool = toml_get_and_check(
+                profile, "candidate_pool", bool, default=False
+            )
+            clip_cache_dir = toml_get_and_check(profile, "clip_cache_dir", str)
+            used_clip_index_path = toml_get_and_check(profile, "used_clip_index", str)
+            self._channel = toml_get_and_check(
+                profile, "channel", str, default=self._subreddit
+            )
+            clip_cache_size = toml_get_and_check(
+                profile, "clip_cache_size", int, default=DEFAULT_CLIP_CACHE_SIZE
+            )
         except TomlGetCheckException as e:
             raise SuiteConfigException("Invalid TOML profile: {}".format(str(e)))
 
@@ -98,6 +141,61 @@ class RedditVideoCompSuite(Suite):
                     VALID_TIME_FRAMES
                 )
             )
+        if self._render_backend not in VALID_BACKENDS:
+            raise SuiteConfigException(
+                "Invalid TOML profile: render_backend must be one of {}".format(
+                    VALID_BACKENDS
+                )
+            )
+
+        if self._candidate_pool and not listing_cache_path:
+            raise SuiteConfigException(
+                "Invalid TOML profile: candidate_pool requires a listing_cache"
+            )
+        if listing_cache_path:
+            try:
+                self._listing_cache = ListingCache(
+                    os.path.expanduser(listing_cache_path)
+                )
+            except (OSError, sqlite3.Error) as e:
+                raise SuiteConfigException(
+                    'Failed to open listing cache "{}": {}'.format(
+                        listing_cache_path, e
+                    )
+                )
+        else:
+            self._listing_cache = None
+
+        if token_cache_path:
+            self._token_cache = TokenCache(os.path.expanduser(token_cache_path))
+        else:
+            self._token_cache = None
+
+        if clip_cache_dir:
+            try:
+                self._clip_cache = ClipCache(
+                    os.path.expanduser(clip_cache_dir), clip_cache_size * 1024 * 1024
+                )
+            except OSError as e:
+                raise SuiteConfigException(
+                    'Failed to create clip cache "{}": {}'.format(clip_cache_dir, e)
+                )
+        else:
+            self._clip_cache = None
+
+        if used_clip_index_path:
+            try:
+                self._used_clips = UsedClipIndex(
+                    os.path.expanduser(used_clip_index_path), self._channel
+                )
+            except (OSError, sqlite3.Error) as e:
+                raise SuiteConfigException(
+                    'Failed to open used clip index "{}": {}'.format(
+                        used_clip_index_path, e
+                    )
+                )
+        else:
+            self._used_clips = None
 
         if self._censor_video and censor is None:
             raise SuiteConfigException("Profile requires a censor for the video")
@@ -111,31 +209,136 @@ class RedditVideoCompSuite(Suite):
 
         self.configured = True
 
+    def _get_reader(self):
+        """
+        Returns:
+            RedditReader: Reader shared with every other suite in the process that uses the
+                same options and caches.
+        """
+        return RedditReader.shared(
+            listing_cache=self._listing_cache,
+            token_cache=self._token_cache,
+            fast_listings=self._fast_listings,
+        )
+
     def _get_videos_from_reddit(self):
         """
-        Gets videos from a subreddit.
+        Gets videos from a subreddit. If the profile has a target duration, clips are chosen to
+        fill it using the durations Reddit reports, before any video is downloaded.
 
         Returns:
-            list: List of `rvidmaker.videos.VideoRef` in ascending order of score.
+            (list, list): Lists of `rvidmaker.videos.VideoRef` to use in the compilation, in
+                descending order of score, and to use in place of videos that fail to
+                download.
         """
-        reader = RedditReader()
-        articles = reader.get_top_articles(
+        reader = self._get_reader()
+        if self._candidate_pool:
+            articles = self._iter_pool(reader)
+        else:
+            articles = reader.iter_articles(
+                self._subreddit,
+                time_filter=self._time_frame,
+                limit=ARTICLE_LIMIT,
+                min_score=self._min_score,
+                include_nsfw=False,
+                video_only=True,
+                min_duration=self._min_clip_dur,
+                max_duration=self._max_clip_dur,
+            )
+        if self._used_clips is not None:
+            # Skip clips the channel already published before doing any more work on them.
+            articles = self._skip_used(articles)
+        with closing(articles):
+            if self._target_dur is None and self._clip_limit is not None:
+                # Stop reading the listing once there are enough clips.
+                candidates = list(islice(articles, self._clip_limit))
+            else:
+                candidates = list(articles)
+        candidates.sort(key=lambda art: art.score, reverse=True)
+
+        if self._target_dur is None:
+            return (
+                self._successful_videos(reader.get_videos(candidates, res=self._res)),
+                [],
+            )
+        plan = plan_clips(
+            candidates, self._target_dur, standby_count=self._standby_clips
+        )
+        print(
+            "Planned {} clips totalling {}s, with {} on standby".format(
+                len(plan.clips), int(plan.duration), len(plan.standby)
+            )
+        )
+        # Resolve the clips and standby clips in a single batch.
+        results = reader.get_videos(plan.clips + plan.standby, res=self._res)
+        videos = self._successful_videos(results[: len(plan.clips)])
+        standby = self._successful_videos(results[len(plan.clips) :])
+        return videos, standby
+
+    def _iter_pool(self, reader):
+        """
+        Brings the subreddit's candidate pool up to date, and refreshes the scores of the
+        articles in it, which costs far fewer requests than reading the whole listing.
+
+        Args:
+            reader (rvidmaker.readers.reddit.RedditReader): Reader to read the pool with.
+
+        Yields:
+            RedditArticle: Articles in the pool that pass the profile's filters, in descending
+                order of score.
+        """
+        max_age = TIME_FRAME_HOURS[self._time_frame]
+        reader.update_pool(self._subreddit, max_age=max_age)
+        articles = reader.get_pool_articles(
             self._subreddit,
-            time_filter=self._time_frame,
-            limit=ARTICLE_LIMIT,
+            max_age=max_age,
             min_score=self._min_score,
+            refresh=True,
         )
-        videos = []
         for art in articles:
             if not art.nsfw and art.has_video(
                 min_duration=self._min_clip_dur,
                 max_duration=self._max_clip_dur,
                 include_youtube=False,
             ):
-                videos.append(art.get_video())
-                if self._clip_limit is not None:
-                    if len(videos) >= self._clip_limit:
-                        break
+                yield art
+
+    def _skip_used(self, articles):
+        """
+        Args:
+            articles (iterable): `RedditArticle`s to check.
+
+        Yields:
+            RedditArticle: Articles the channel has not used in an earlier compilation.
+        """
+        with closing(iter(articles)) as articles:
+            for art in articles:
+                if self._used_clips.is_used(art.id, media_key(art.video_url)):
+                    continue
+                yield art
+
+    @staticmethod
+    def _successful_videos(results):
+        """
+        Gets the videos that were resolved, warning about articles whose video was not.
+
+        Args:
+            results (list): `rvidmaker.readers.reddit.VideoResult`s from
+                `RedditReader.get_videos`.
+
+        Returns:
+            list: `rvidmaker.videos.VideoRef`s in the same order as `results`.
+        """
+        videos = []
+        for result in results:
+            if result.error is not None:
+                print(
+                    'WARNING: Failed to get video for "{}": {}'.format(
+                        result.article.title, result.error
+                    )
+                )
+                continue
+            videos.append(result.video)
         return videos
 
     def _make_thumbnail(self, vid, title, output_path):
@@ -148,10 +351,17 @@ class RedditVideoCompSuite(Suite):
             output_path (str): Path to write the thumbnail to.
         """
         short_title = shorten_title(title, MAX_THUMB_TITLE_LEN)
-        temp_vid_dl = vid.download(get_random_path(TEMP_DIR))
-        thumb = create_split_thumbnail(temp_vid_dl, short_title)
-        thumb.save(output_path)
-        os.remove(temp_vid_dl)
+        temp_path = get_random_path(TEMP_DIR)
+        if self._clip_cache is not None:
+            # Only the video is needed, so leave its sidecar files in the cache.
+            temp_vid_dl = self._clip_cache.download(vid, temp_path, sidecars=False)
+        else:
+            temp_vid_dl = vid.download(temp_path)
+        try:
+            thumb = create_split_thumbnail(temp_vid_dl, short_title)
+            thumb.save(output_path)
+        finally:
+            os.remove(temp_vid_dl)
 
     def _make_description(self, message, manifest):
         """
@@ -216,7 +426,7 @@ class RedditVideoCompSuite(Suite):
         payload.thumb = "thumbnail.png"
 
         print("Scaping subreddit r/{} for videos...".format(self._subreddit))
-        videos = self._get_videos_from_reddit()
+        videos, standby = self._get_videos_from_reddit()
         if len(videos) < 2:
             print("Not enough videos gathered for a compilation")
             return
@@ -224,10 +434,17 @@ class RedditVideoCompSuite(Suite):
         print("Rendering compilation of {} videos...".format(len(videos)))
         video_path = os.path.join(output_dir, payload.video)
         censor = self._censor_video and self._censor or None
-        compiler = VideoCompiler(censor=censor)
+        compiler = VideoCompiler(
+            censor=censor, backend=self._render_backend, cache=self._clip_cache
+        )
         for v in videos:
             compiler.add_video(v)
-        manifest = compiler.render_video(self._res, video_path)
+        for v in standby:
+            compiler.add_standby(v)
+        try:
+            manifest = compiler.render_video(self._res, video_path)
+        except RenderException as e:
+            raise SuiteGenerateException("Failed to render video: {}".format(e))
         used_videos = [entry.video for entry in manifest]
 
         print("Creating title...")
@@ -269,3 +486,8 @@ class RedditVideoCompSuite(Suite):
 
         payload_path = os.path.join(output_dir, "payload.toml")
         payload.dump(payload_path)
+
+        if self._used_clips is not None:
+            self._used_clips.mark_used(
+                [(v.post_id, media_key(v.video_url)) for v in used_videos]
+            )
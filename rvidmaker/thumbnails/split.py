@@ -1,14 +1,10 @@
 """Implements function for creating a split thumbnail of a single video"""
 
 import math
-from moviepy.editor import (
-    afx,
-    CompositeVideoClip,
-    concatenate_videoclips,
-    TextClip,
-    VideoFileClip,
-)
-from PIL import Image, ImageDraw, ImageFont
+from moviepy.editor import VideoFileClip
+from PIL import Image, ImageDraw
+
+from rvidmaker.utils import load_font
 
 
 def _make_pane(img, size):
@@ -83,8 +79,8 @@ def create_split_thumbnail(
         font_size = int(max_font_size / div)
         if font_size < 20:
             break
-        font = ImageFont.truetype("Impact", size=font_size)
-        txt_w, txt_h = font.getsize(title)
+        font = load_font("Impact", font_size)
+        _, _, txt_w, txt_h = font.getbbox(title)
         # Get approximate width of rotated text.
         rot_w = txt_w * abs(math.cos(math.degrees(text_rotate)))
         if rot_w <= w:
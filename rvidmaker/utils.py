@@ -1,5 +1,7 @@
 from bisect import insort
+from functools import lru_cache
 import os
+from PIL import ImageFont
 from rake_nltk import Rake
 import random
 import re
@@ -50,6 +52,31 @@ def get_random_path(root, ext=None):
             return path
 
 
+@lru_cache(maxsize=32)
+def load_font(name, size):
+    """
+    Loads a TrueType font. Fonts are cached, so each font is only loaded once per process.
+
+    Args:
+        name (str): File name of the font, with or without the extension. Searched for in the
+            system's font directories if it is not a path.
+        size (int): Size of the font in points.
+
+    Returns:
+        PIL.ImageFont.FreeTypeFont: The loaded font, or Pillow's default font at the same size
+            if the font can't be found.
+    """
+    try:
+        return ImageFont.truetype(name, size=size)
+    except OSError:
+        print('WARNING: Font "{}" not found, using the default font'.format(name))
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow versions before 10.1 only have a fixed-size default font.
+        return ImageFont.load_default()
+
+
 def shorten_title(title, max_title_len, alpha_only=True):
     """
     Shortens a title using important phrases and keywords in the title.
@@ -1,2 +1,4 @@
 from .interface import DownloadException, VideoRef
+from .cache import ClipCache
+from .history import UsedClipIndex
 from .reddit import RedditVideoRef
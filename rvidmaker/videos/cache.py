@@ -0,0 +1,241 @@
+"""Provides a persistent, size-limited cache of downloaded videos"""
+
+from contextlib import contextmanager
+import fcntl
+from glob import escape as glob_escape, glob
+import hashlib
+import os
+import shutil
+
+from rvidmaker.utils import random_string
+
+# Name of the file used to lock the cache across threads and processes.
+_LOCK_NAME = ".lock"
+# Extension of cached videos.
+_EXT = "mp4"
+# Fraction of the byte budget the cache is trimmed to once it goes over the budget, so that a
+# full cache is not scanned again on every put.
+_TRIM_FRACTION = 0.9
+
+
+def _link_or_copy(src, dst):
+    """
+    Hard links a file, or copies it if linking is not possible.
+
+    Args:
+        src (str): Path of the existing file.
+        dst (str): Path to create. Must not already exist.
+    """
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class ClipCache:
+    """
+    Caches downloaded videos on disk between runs. Videos are stored by their `VideoRef.cache_key`
+    and the least recently used videos are evicted once the cache grows past its byte budget.
+    Writes are atomic and the cache can be shared by multiple threads and processes.
+
+    The cache directory is only scanned on the first put and once the running total of cached
+    bytes goes over the budget, so videos put by other processes are counted at the next scan.
+
+    Sidecar files, such as measurements of a video, can be stored alongside a cached video. They
+    are named by appending a suffix to the video's path, and are copied out and evicted with it.
+
+    Attributes:
+        root (str): Directory videos are cached in.
+        max_bytes (int): Maximum total size of cached videos in bytes.
+    """
+
+    def __init__(self, root, max_bytes):
+        """
+        Args:
+            root (str): Directory to cache videos in. Created if it does not exist.
+            max_bytes (int): Maximum total size of cached videos in bytes.
+        """
+        self._root = root
+        self._max_bytes = max_bytes
+        # Total size of cached videos as of the last scan, plus the videos put since. None
+        # until the cache is first scanned.
+        self._known_size = None
+        os.makedirs(root, exist_ok=True)
+
+    @property
+    def root(self):
+        return self._root
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes
+
+    @contextmanager
+    def _lock(self):
+        """Exclusively locks the cache for the duration of the context"""
+        with open(os.path.join(self._root, _LOCK_NAME), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _entry_path(self, key):
+        """
+        Args:
+            key (str): Cache key of a video.
+
+        Returns:
+            str: Path the video is cached at.
+        """
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self._root, digest[:2], "{}.{}".format(digest, _EXT))
+
+    def _entries(self):
+        """
+        Yields:
+            (str, os.stat_result): Path and status of every cached video.
+        """
+        for dirpath, _, filenames in os.walk(self._root):
+            for name in filenames:
+                if not name.endswith("." + _EXT):
+                    # Sidecar or temporary file.
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    yield path, os.stat(path)
+                except FileNotFoundError:
+                    # Removed by another process.
+                    continue
+
+    @staticmethod
+    def _sidecars(entry_path):
+        """
+        Args:
+            entry_path (str): Path of a cached video.
+
+        Returns:
+            list: Paths of the video's sidecar files.
+        """
+        return [
+            p for p in glob(glob_escape(entry_path) + ".*") if not p.endswith(".tmp")
+        ]
+
+    def _evict(self):
+        """
+        Scans the cache, and if it is over its byte budget, removes the least recently used
+        videos until it is trimmed to `_TRIM_FRACTION` of the budget. Must be called with the
+        lock held.
+        """
+        entries = sorted(self._entries(), key=lambda e: e[1].st_mtime)
+        total = sum(st.st_size for _, st in entries)
+        if total > self._max_bytes:
+            target = self._max_bytes * _TRIM_FRACTION
+            for path, st in entries:
+                if total <= target:
+                    break
+                for sidecar in self._sidecars(path):
+                    os.remove(sidecar)
+                os.remove(path)
+                total -= st.st_size
+        self._known_size = total
+
+    @property
+    def size(self):
+        """
+        int: Total size of cached videos in bytes.
+        """
+        return sum(st.st_size for _, st in self._entries())
+
+    def get(self, key, output_path, sidecars=True):
+        """
+        Copies a cached video and its sidecar files out of the cache.
+
+        Args:
+            key (str): Cache key of the video.
+            output_path (str): Path to write the video to. The extension may be changed.
+            sidecars (bool): Whether to also copy the video's sidecar files.
+
+        Returns:
+            str/None: Path the video is written to, or `None` if the video is not cached.
+        """
+        output_path = "{}.{}".format(os.path.splitext(output_path)[0], _EXT)
+        path = self._entry_path(key)
+        with self._lock():
+            if not os.path.exists(path):
+                return None
+            # Mark the video as recently used.
+            os.utime(path)
+            _link_or_copy(path, output_path)
+            for sidecar in self._sidecars(path) if sidecars else ():
+                suffix = sidecar[len(path) :]
+                if not os.path.exists(output_path + suffix):
+                    _link_or_copy(sidecar, output_path + suffix)
+        return output_path
+
+    def put(self, key, path):
+        """
+        Adds a video to the cache, evicting older videos if the cache is full.
+
+        Args:
+            key (str): Cache key of the video.
+            path (str): Path of the video to add. The file is left in place.
+        """
+        entry_path = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        temp_path = "{}.{}.tmp".format(entry_path, random_string(10))
+        _link_or_copy(path, temp_path)
+        size = os.path.getsize(temp_path)
+        with self._lock():
+            try:
+                replaced = os.path.getsize(entry_path)
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(temp_path, entry_path)
+            os.utime(entry_path)
+            if self._known_size is not None:
+                self._known_size += size - replaced
+            if self._known_size is None or self._known_size > self._max_bytes:
+                self._evict()
+
+    def put_sidecar(self, key, path, suffix):
+        """
+        Stores a sidecar file alongside a cached video. Does nothing if the video is not cached.
+
+        Args:
+            key (str): Cache key of the video.
+            path (str): Path of the sidecar file to add. The file is left in place.
+            suffix (str): Appended to the cached video's path to name the sidecar file.
+        """
+        entry_path = self._entry_path(key)
+        temp_path = "{}{}.{}.tmp".format(entry_path, suffix, random_string(10))
+        with self._lock():
+            if not os.path.exists(entry_path):
+                return
+            shutil.copyfile(path, temp_path)
+            os.replace(temp_path, entry_path + suffix)
+
+    def download(self, video, output_path, sidecars=True):
+        """
+        Downloads a video, using the cached copy if there is one.
+
+        Args:
+            video (VideoRef): Video to download.
+            output_path (str): Path to write the video to. The extension may be changed.
+            sidecars (bool): Whether to also copy the cached video's sidecar files.
+
+        Returns:
+            str: Path the video is written to.
+
+        Raises:
+            DownloadException: If the video is not cached and downloading it fails.
+        """
+        key = video.cache_key
+        if key is None:
+            return video.download(output_path)
+        cached_path = self.get(key, output_path, sidecars=sidecars)
+        if cached_path is not None:
+            return cached_path
+        actual_path = video.download(output_path)
+        self.put(key, actual_path)
+        return actual_path
@@ -0,0 +1,301 @@
+"""Remembers which clips earlier compilations used"""
+
+from contextlib import closing
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+from urllib.parse import urlsplit
+
+# Number of clips a channel's Bloom filter is sized for. Channels with more clips still work,
+# but more lookups fall through to the database.
+DEFAULT_CAPACITY = 100000
+# Rate of false positives the Bloom filter is sized for.
+DEFAULT_ERROR_RATE = 0.01
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS used_clips (
+        channel TEXT NOT NULL,
+        key TEXT NOT NULL,
+        PRIMARY KEY (channel, key)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS bloom_filters (
+        channel TEXT PRIMARY KEY,
+        num_hashes INTEGER NOT NULL,
+        bits BLOB NOT NULL
+    )
+    """,
+)
+
+
+def media_key(video_url):
+    """
+    Identifies the media behind a Reddit video URL, so that crossposts of the same video are
+    recognized even though they have different post IDs.
+
+    Args:
+        video_url (str): URL of a Reddit-hosted video, such as
+            "https://v.redd.it/abc123/DASH_720.mp4?source=fallback".
+
+    Returns:
+        str: Host and media ID of the video, such as "v.redd.it/abc123". None if `video_url` is
+            None.
+    """
+    if video_url is None:
+        return None
+    parts = urlsplit(video_url)
+    media_id = parts.path.strip("/").split("/")[0]
+    return "{}/{}".format(parts.netloc.lower(), media_id)
+
+
+class BloomFilter:
+    """
+    Compact set that can tell for certain that a key was never added, but may wrongly report
+    that a key was added.
+
+    Attributes:
+        num_bits (int): Number of bits in the filter.
+        num_hashes (int): Number of bits set for each key.
+    """
+
+    def __init__(self, num_bits, num_hashes, bits=None):
+        """
+        Args:
+            num_bits (int): Number of bits in the filter.
+            num_hashes (int): Number of bits set for each key.
+            bits (bytes): Bits of a previously saved filter. None for an empty filter.
+        """
+        self._num_bits = num_bits
+        self._num_hashes = num_hashes
+        if bits is None:
+            self._bits = bytearray((num_bits + 7) // 8)
+        else:
+            self._bits = bytearray(bits)
+
+    @staticmethod
+    def for_capacity(capacity, error_rate):
+        """
+        Args:
+            capacity (int): Number of keys the filter should hold.
+            error_rate (float): Rate of false positives once the filter holds `capacity` keys.
+
+        Returns:
+            BloomFilter: Empty filter of the optimal size.
+        """
+        num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        # Saved filters are whole bytes, so use every bit of the last byte.
+        num_bits = (num_bits + 7) // 8 * 8
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        return BloomFilter(num_bits, num_hashes)
+
+    @property
+    def num_bits(self):
+        return self._num_bits
+
+    @property
+    def num_hashes(self):
+        return self._num_hashes
+
+    def to_bytes(self):
+        """
+        Returns:
+            bytes: Bits of the filter.
+        """
+        return bytes(self._bits)
+
+    def _positions(self, key):
+        """
+        Args:
+            key (str): A key.
+
+        Yields:
+            int: Bits the key sets.
+        """
+        digest = hashlib.sha256(key.encode()).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        for i in range(self._num_hashes):
+            yield (h1 + i * h2) % self._num_bits
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(
+            self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key)
+        )
+
+
+class UsedClipIndex:
+    """
+    Persistent record of the clips a channel has published, stored in an SQLite database. Clips
+    are identified by their post ID and by the media they contain. A Bloom filter saved
+    alongside the records answers most lookups for unused clips without querying the database.
+    The database can be shared between channels and processes. The filter is loaded again
+    whenever another connection has changed the database, so clips marked by other processes
+    are seen.
+
+    Attributes:
+        channel (str): Channel the index records clips for.
+    """
+
+    def __init__(
+        self,
+        path,
+        channel,
+        capacity=DEFAULT_CAPACITY,
+        error_rate=DEFAULT_ERROR_RATE,
+    ):
+        """
+        Args:
+            path (str): Path to the SQLite database. Created if it does not exist.
+            channel (str): Channel to record clips for.
+            capacity (int): Number of clips the channel's Bloom filter is sized for, if the
+                channel has no filter yet.
+            error_rate (float): Rate of false positives the Bloom filter is sized for, if the
+                channel has no filter yet.
+        """
+        self._path = path
+        self._channel = channel
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        # `PRAGMA data_version` only reports changes made by other connections since the same
+        # connection last asked, so one connection is kept open to watch for changes.
+        self._watch = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._watch_lock = threading.Lock()
+        self._data_version = self._read_data_version()
+        with self._connect() as conn, conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            self._bloom = self._load_bloom(conn)
+            if self._bloom is None:
+                self._bloom = BloomFilter.for_capacity(capacity, error_rate)
+                self._save_bloom(conn, self._bloom)
+
+    @property
+    def channel(self):
+        return self._channel
+
+    def _connect(self):
+        """
+        Returns:
+            contextlib.closing: Connection to the database that is closed when the context exits.
+        """
+        conn = sqlite3.connect(self._path, timeout=30)
+        return closing(conn)
+
+    def _read_data_version(self):
+        """
+        Returns:
+            int: Number that changes whenever another connection changes the database.
+        """
+        with self._watch_lock:
+            return self._watch.execute("PRAGMA data_version").fetchone()[0]
+
+    def _refresh_bloom(self):
+        """Loads the channel's filter again if another connection changed the database"""
+        data_version = self._read_data_version()
+        if data_version == self._data_version:
+            return
+        # Record the version first, so that changes made while loading are loaded next time.
+        self._data_version = data_version
+        with self._connect() as conn:
+            bloom = self._load_bloom(conn)
+        if bloom is not None:
+            self._bloom = bloom
+
+    def _load_bloom(self, conn):
+        """
+        Args:
+            conn (sqlite3.Connection): Connection to the database.
+
+        Returns:
+            BloomFilter: The channel's saved filter. None if it has none.
+        """
+        row = conn.execute(
+            "SELECT num_hashes, bits FROM bloom_filters WHERE channel = ?",
+            (self._channel,),
+        ).fetchone()
+        if row is None:
+            return None
+        num_hashes, bits = row
+        return BloomFilter(len(bits) * 8, num_hashes, bits)
+
+    def _save_bloom(self, conn, bloom):
+        """
+        Args:
+            conn (sqlite3.Connection): Connection to the database.
+            bloom (BloomFilter): Filter to save for the channel.
+        """
+        conn.execute(
+            "INSERT OR REPLACE INTO bloom_filters VALUES (?, ?, ?)",
+            (self._channel, bloom.num_hashes, bloom.to_bytes()),
+        )
+
+    @staticmethod
+    def _keys(post_id, media):
+        """
+        Args:
+            post_id (str): ID of a clip's Reddit post. None if not known.
+            media (str): Media key of the clip from `media_key`. None if not known.
+
+        Returns:
+            list: Keys the clip is recorded under.
+        """
+        keys = []
+        if post_id is not None:
+            keys.append("post:{}".format(post_id))
+        if media is not None:
+            keys.append("media:{}".format(media))
+        return keys
+
+    def is_used(self, post_id, media=None):
+        """
+        Checks whether the channel has already used a clip.
+
+        Args:
+            post_id (str): ID of the clip's Reddit post. None if not known.
+            media (str): Media key of the clip from `media_key`. None if not known.
+
+        Returns:
+            bool: True if either the post or the media was used before.
+        """
+        self._refresh_bloom()
+        keys = [k for k in self._keys(post_id, media) if k in self._bloom]
+        if not keys:
+            return False
+        with self._connect() as conn:
+            query = "SELECT 1 FROM used_clips WHERE channel = ? AND key IN ({})".format(
+                ", ".join("?" * len(keys))
+            )
+            return conn.execute(query, [self._channel] + keys).fetchone() is not None
+
+    def mark_used(self, clips):
+        """
+        Records that the channel used clips. All clips are recorded in a single transaction, so
+        either all or none of them are recorded.
+
+        Args:
+            clips (list): `(post_id, media)` tuples of the clips, where `media` is the clip's
+                media key from `media_key`. Either may be None if not known.
+        """
+        keys = [k for post_id, media in clips for k in self._keys(post_id, media)]
+        with self._connect() as conn, conn:
+            # Take the write lock before reading the filter, so that filters updated by other
+            # processes are not overwritten.
+            conn.execute("BEGIN IMMEDIATE")
+            bloom = self._load_bloom(conn) or self._bloom
+            for key in keys:
+                bloom.add(key)
+            conn.executemany(
+                "INSERT OR IGNORE INTO used_clips VALUES (?, ?)",
+                [(self._channel, key) for key in keys],
+            )
+            self._save_bloom(conn, bloom)
+        self._bloom = bloom
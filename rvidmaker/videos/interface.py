@@ -13,6 +13,8 @@ class VideoRef:
         title (str): Title of the video.
         author (str): Author of the video.
         duration (float): Duration of a video in seconds. None if the duration is not known.
+        cache_key (str): Uniquely identifies the downloaded video for caching. None if the
+            video should not be cached.
     """
 
     def download(self, output_path):
@@ -43,3 +45,7 @@ class VideoRef:
     @property
     def duration(self):
         return None
+
+    @property
+    def cache_key(self):
+        return None
@@ -1,13 +1,18 @@
 """Implements a reference for videos hosted on Reddit"""
 
+from concurrent.futures import ThreadPoolExecutor
 import ffmpeg
 import os
-import requests
-import shutil
-import tempfile
 
-from rvidmaker.utils import get_random_path
 from .interface import DownloadException, VideoRef
+from .segmented import download_file, remove_progress
+
+# FFmpeg codec arguments to try, in order, when combining video and audio.
+_MUX_CODEC_ARGS = (
+    {"c": "copy"},
+    {"vcodec": "copy", "acodec": "aac"},
+    {},
+)
 
 
 class RedditVideoRef(VideoRef):
@@ -18,9 +23,15 @@ class RedditVideoRef(VideoRef):
         title (str): Title of the video.
         author (str): Author of the video.
         duration (float): Duration of the video. None if not known.
+        post_id (str): ID of the Reddit post the video is from. None if not known.
+        video_url (str): Remote URL for video.
+        cache_key (str): Key built from the post ID and video URL. None if the post ID is not
+            known.
     """
 
-    def __init__(self, title, author, video_url, audio_url=None, duration=None):
+    def __init__(
+        self, title, author, video_url, audio_url=None, duration=None, post_id=None
+    ):
         """
         Args:
             title (str): Title of the video.
@@ -28,76 +39,88 @@ class RedditVideoRef(VideoRef):
             video_url (str): Remote URL for video.
             audio_url (str): Remote URL for audio. None if there is no audio.
             duration (float): Duration of the video if known, and None otherwise.
+            post_id (str): ID of the Reddit post the video is from. None if not known.
         """
         self._title = title
         self._author = author
         self._video_url = video_url
         self._audio_url = audio_url
         self._duration = duration
+        self._post_id = post_id
 
-    def _download_to_file(self, f, url):
+    @staticmethod
+    def _mux(video_path, audio_path, output_path):
         """
-        Downloads a web resource.
+        Combines a video-only and an audio-only file into one file. Streams are copied as they
+        are, and only transcoded if the codecs can't be stored in the output container.
 
         Args:
-            f: File-like object to write binary data to.
-            url (str): HTTP/S URL to download from.
+            video_path (str): Path to the video-only file.
+            audio_path (str): Path to the audio-only file.
+            output_path (str): Path to write the combined file to.
 
         Raises:
-            DownloadException: If the download fails.
+            DownloadException: If the streams can neither be copied nor transcoded.
         """
-        try:
-            req = requests.get(url)
-        except requests.exceptions.RequestException as e:
-            raise DownloadException(
-                "Failed to download video from {}: {}".format(url, e)
-            )
-        if req.status_code != 200:
-            raise DownloadException(
-                "Failed to download video from {}: {} response".format(
-                    url, req.status_code
+        video = ffmpeg.input(video_path).video
+        audio = ffmpeg.input(audio_path).audio
+        # Try copying both streams first, then transcoding only the audio, and finally
+        # transcoding everything.
+        for codec_args in _MUX_CODEC_ARGS:
+            try:
+                ffmpeg.output(video, audio, output_path, **codec_args).run(
+                    quiet=True, overwrite_output=True
                 )
-            )
-        f.write(req.content)
+                return
+            except ffmpeg.Error:
+                pass
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise DownloadException("Failed to combine video and audio with FFmpeg")
 
     def download(self, output_path):
         """
-        Downloads the video to disk.
+        Downloads the video to disk. Large tracks are downloaded as parallel range requests.
+        If the download fails, the downloaded tracks are kept next to `output_path`, so
+        downloading to the same path again resumes where it stopped and skips finished tracks.
 
         Args:
             output_path (str): Path to write video to. The extension may be changed.
 
         Returns:
             str: Path the video is written to. Extension may differ from `output_path`.
+
+        Raises:
+            DownloadException: If the download fails.
         """
         # Check video extension
         base, ext = os.path.splitext(output_path)
         if ext != "mp4":
             output_path = "{}.mp4".format(base)
 
-        # Download video and audio to temporary files.
-        # TODO: Download video and audio asynchronously
-        temp_video_file = tempfile.NamedTemporaryFile(suffix=".mp4")
-        self._download_to_file(temp_video_file, self._video_url)
+        # Download video and audio at the same time, to paths that stay the same between
+        # attempts so that they can be resumed.
+        video_path = "{}.video.mp4".format(base)
+        downloads = [(self._video_url, video_path)]
         if self._audio_url is not None:
-            temp_audio_file = tempfile.NamedTemporaryFile(suffix=".mp4")
-            self._download_to_file(temp_audio_file, self._audio_url)
+            audio_path = "{}.audio.mp4".format(base)
+            downloads.append((self._audio_url, audio_path))
+        with ThreadPoolExecutor(max_workers=len(downloads)) as pool:
+            futures = [pool.submit(download_file, *dl) for dl in downloads]
+            for future in futures:
+                # Raises any exception from the download.
+                future.result()
 
-            # Combine video and audio
-            video = ffmpeg.input(temp_video_file.name)
-            audio = ffmpeg.input(temp_audio_file.name)
+        if self._audio_url is not None:
             try:
-                ffmpeg.concat(video, audio, v=1, a=1).output(output_path).run(
-                    quiet=True, overwrite_output=True
-                )
-            except ffmpeg.Error:
-                if os.path.exists(output_path):
-                    os.remove(output_path)
-                raise DownloadException("Failed to combine video and audio with FFmpeg")
+                self._mux(video_path, audio_path, output_path)
+            finally:
+                for path in (video_path, audio_path):
+                    os.remove(path)
+                    remove_progress(path)
         else:
-            # Copy instead of move since `temp_video_file` should be automatically removed,
-            # and moving it will cause an error when it attempts to remove itself.
-            shutil.copyfile(temp_video_file.name, output_path)
+            os.replace(video_path, output_path)
+            remove_progress(video_path)
 
         return output_path
 
@@ -112,3 +135,17 @@ class RedditVideoRef(VideoRef):
     @property
     def duration(self):
         return self._duration
+
+    @property
+    def post_id(self):
+        return self._post_id
+
+    @property
+    def video_url(self):
+        return self._video_url
+
+    @property
+    def cache_key(self):
+        if self._post_id is None:
+            return None
+        return "reddit/{}/{}".format(self._post_id, self._video_url)
@@ -0,0 +1,364 @@
+"""Downloads large files as parallel HTTP range requests that can be resumed"""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import re
+import requests
+import threading
+
+from rvidmaker.net import POOL_SIZE, get_session
+from rvidmaker.utils import random_string
+from .interface import DownloadException
+
+# Number of bytes requested by each range request.
+SEGMENT_SIZE = 1 << 22
+# Number of range requests sent at once for a single file.
+CONNECTIONS = 4
+# Maximum number of requests sent at once across every download in the process, so that
+# parallel downloads of many tracks don't open more connections than the session pools.
+MAX_CONNECTIONS = POOL_SIZE
+# Extension of the file that records which segments of a download are finished.
+PROGRESS_EXT = ".part"
+# Number of bytes to read into memory at a time while downloading.
+_CHUNK_SIZE = 1 << 16
+# Seconds to wait for the server to respond before giving up on a request.
+_TIMEOUT = 30
+
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+# Held for the whole of each request, including reading its body.
+_connections = threading.BoundedSemaphore(MAX_CONNECTIONS)
+
+
+class _Progress:
+    """
+    Records which segments of a download are finished in a sidecar file next to the download,
+    so that a later attempt only fetches the missing segments.
+    """
+
+    def __init__(self, path, url, size, segment_size, done=()):
+        """
+        Args:
+            path (str): Path of the file being downloaded.
+            url (str): HTTP/S URL being downloaded.
+            size (int): Size of the file in bytes.
+            segment_size (int): Number of bytes in each segment.
+            done (iterable): Indices of the finished segments.
+        """
+        self._path = path
+        self._url = url
+        self._size = size
+        self._segment_size = segment_size
+        self._done = set(done)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def load(path, url, segment_size):
+        """
+        Args:
+            path (str): Path of the file being downloaded.
+            url (str): HTTP/S URL being downloaded.
+            segment_size (int): Number of bytes in each segment.
+
+        Returns:
+            _Progress: Progress of an earlier attempt to download the same URL to the same
+                path. None if there was no attempt, or its progress can't be trusted.
+        """
+        try:
+            with open(path + PROGRESS_EXT) as f:
+                data = json.load(f)
+            progress = _Progress(
+                path, data["url"], int(data["size"]), int(data["segment_size"])
+            )
+            progress._done = set(int(i) for i in data["done"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if progress._url != url or progress._segment_size != segment_size:
+            return None
+        try:
+            if os.path.getsize(path) != progress._size:
+                return None
+        except OSError:
+            return None
+        return progress
+
+    @property
+    def size(self):
+        return self._size
+
+    def segments(self):
+        """
+        Returns:
+            list: `(index, start, end)` of every segment, where `end` is the last byte.
+        """
+        return [
+            (i, start, min(start + self._segment_size, self._size) - 1)
+            for i, start in enumerate(range(0, self._size, self._segment_size))
+        ]
+
+    def missing(self):
+        """
+        Returns:
+            list: `(index, start, end)` of the segments that are not finished.
+        """
+        return [s for s in self.segments() if s[0] not in self._done]
+
+    def mark_done(self, index):
+        """
+        Records that a segment is finished, and saves the progress.
+
+        Args:
+            index (int): Index of the segment.
+        """
+        with self._lock:
+            self._done.add(index)
+            self._save()
+
+    def _save(self):
+        """Writes the progress to the sidecar file atomically. Must be called with the lock held"""
+        progress_path = self._path + PROGRESS_EXT
+        temp_path = "{}.{}.tmp".format(progress_path, random_string(10))
+        with open(temp_path, "w") as f:
+            json.dump(
+                {
+                    "url": self._url,
+                    "size": self._size,
+                    "segment_size": self._segment_size,
+                    "done": sorted(self._done),
+                },
+                f,
+            )
+        os.replace(temp_path, progress_path)
+
+    def start(self):
+        """Preallocates the file and saves the empty progress"""
+        with open(self._path, "wb") as f:
+            try:
+                os.posix_fallocate(f.fileno(), 0, self._size)
+            except (AttributeError, OSError):
+                # Not supported on every platform and file system. A sparse file still lets
+                # segments be written at any offset.
+                f.truncate(self._size)
+        with self._lock:
+            self._save()
+
+    def mark_complete(self):
+        """Records that every segment is finished, and saves the progress"""
+        with self._lock:
+            self._done = set(s[0] for s in self.segments())
+            self._save()
+
+
+def remove_progress(path):
+    """
+    Removes the sidecar file that records the progress of a download, once the downloaded
+    file has been used and a later attempt no longer needs to skip it.
+
+    Args:
+        path (str): Path of the downloaded file.
+    """
+    try:
+        os.remove(path + PROGRESS_EXT)
+    except FileNotFoundError:
+        pass
+
+
+def _error(url, reason):
+    return DownloadException("Failed to download video from {}: {}".format(url, reason))
+
+
+def _parse_content_range(header):
+    """
+    Args:
+        header (str): Value of a `Content-Range` header. None if there is none.
+
+    Returns:
+        (int, int, int): First byte, last byte and total size. The size is None if the server
+            did not give it. None if the header is missing or not valid.
+    """
+    match = _CONTENT_RANGE.fullmatch((header or "").strip())
+    if match is None:
+        return None
+    start, end, size = match.groups()
+    return int(start), int(end), None if size == "*" else int(size)
+
+
+def _write_body(response, f, url, length=None):
+    """
+    Streams the body of a response into a file at its current position.
+
+    Args:
+        response (requests.Response): Streamed response.
+        f: Binary file to write to.
+        url (str): URL of the response, for error messages.
+        length (int): Number of bytes the body should have. None if not known.
+
+    Raises:
+        DownloadException: If reading the body fails or it has the wrong length.
+    """
+    written = 0
+    try:
+        for chunk in response.iter_content(chunk_size=_CHUNK_SIZE):
+            f.write(chunk)
+            written += len(chunk)
+    except requests.exceptions.RequestException as e:
+        raise _error(url, e)
+    if length is not None and written != length:
+        raise _error(url, "expected {} bytes, got {}".format(length, written))
+
+
+def _request(session, url, start, end):
+    """
+    Sends a GET request for a range of bytes.
+
+    Raises:
+        DownloadException: If the request fails.
+
+    Returns:
+        requests.Response: Streamed response.
+    """
+    try:
+        return session.get(
+            url,
+            headers={"Range": "bytes={}-{}".format(start, end)},
+            stream=True,
+            timeout=_TIMEOUT,
+        )
+    except requests.exceptions.RequestException as e:
+        raise _error(url, e)
+
+
+def _fetch_segment(session, url, path, progress, segment):
+    """
+    Downloads a single segment into its place in the preallocated file, and records that it
+    is finished.
+
+    Args:
+        session (requests.Session): Session to send the request with.
+        url (str): HTTP/S URL to download from.
+        path (str): Path of the preallocated file.
+        progress (_Progress): Progress of the download.
+        segment (int, int, int): Index, first byte and last byte of the segment.
+
+    Raises:
+        DownloadException: If the download fails or the server does not honor the range.
+    """
+    index, start, end = segment
+    with _connections, _request(session, url, start, end) as response:
+        content_range = _parse_content_range(response.headers.get("Content-Range"))
+        if response.status_code != 206 or content_range is None:
+            raise _error(
+                url, "{} response to a range request".format(response.status_code)
+            )
+        if content_range[:2] != (start, end):
+            raise _error(url, "server sent the wrong range")
+        with open(path, "r+b") as f:
+            f.seek(start)
+            _write_body(response, f, url, end - start + 1)
+    progress.mark_done(index)
+
+
+def _download_whole(response, url, path, segment_size):
+    """
+    Downloads a file in a single request, for servers that ignore `Range`, and records that it
+    is complete.
+
+    Args:
+        response (requests.Response): Streamed 200 response with the whole file.
+        url (str): HTTP/S URL of the response.
+        path (str): Path to write the file to.
+        segment_size (int): Number of bytes in each segment of the recorded progress.
+
+    Raises:
+        DownloadException: If the download fails.
+    """
+    length = response.headers.get("Content-Length")
+    if length is not None and "Content-Encoding" not in response.headers:
+        length = int(length)
+    else:
+        # The length of an encoded body says nothing about the decoded file.
+        length = None
+    # Progress of an earlier attempt no longer matches the file once it is overwritten.
+    remove_progress(path)
+    with open(path, "wb") as f:
+        _write_body(response, f, url, length)
+    _Progress(path, url, os.path.getsize(path), segment_size).mark_complete()
+
+
+def download_file(
+    url, path, session=None, connections=CONNECTIONS, segment_size=SEGMENT_SIZE
+):
+    """
+    Downloads a file as parallel range requests into a preallocated file. Finished segments
+    are recorded in a sidecar file next to `path`, so if the download fails, calling this
+    again with the same arguments only fetches the missing segments. The sidecar is kept once
+    the download is complete, so calling this again does not fetch the file at all; remove it
+    with `remove_progress` once the file has been used.
+
+    The first request doubles as a probe: files that fit in one segment take a single request,
+    and if the server ignores `Range`, the file is downloaded in a single request instead.
+    No more than `MAX_CONNECTIONS` requests are sent at once across all downloads.
+
+    Args:
+        url (str): HTTP/S URL to download from.
+        path (str): Path to write the file to.
+        session (requests.Session): Session to send requests with. None to use the shared
+            session from `rvidmaker.net`.
+        connections (int): Maximum number of range requests sent at once.
+        segment_size (int): Number of bytes requested by each range request.
+
+    Raises:
+        DownloadException: If the download fails.
+    """
+    if session is None:
+        session = get_session()
+    progress = _Progress.load(path, url, segment_size)
+    if progress is not None:
+        missing = progress.missing()
+        if not missing:
+            return
+        first = missing[0]
+    else:
+        first = (0, 0, segment_size - 1)
+
+    with _connections, _request(session, url, first[1], first[2]) as response:
+        if response.status_code == 200:
+            _download_whole(response, url, path, segment_size)
+            return
+        content_range = _parse_content_range(response.headers.get("Content-Range"))
+        if response.status_code != 206 or content_range is None:
+            raise _error(url, "{} response".format(response.status_code))
+        start, end, size = content_range
+        if size is None:
+            raise _error(url, "server did not give the size of the file")
+        if progress is not None and progress.size != size:
+            # The file changed since the earlier attempt, so its segments are stale.
+            progress = None
+        if progress is None:
+            progress = _Progress(path, url, size, segment_size)
+            progress.start()
+        segments = {(s[1], s[2]): s for s in progress.segments()}
+        if (start, end) not in segments:
+            raise _error(url, "server sent the wrong range")
+        with open(path, "r+b") as f:
+            f.seek(start)
+            _write_body(response, f, url, end - start + 1)
+        progress.mark_done(segments[(start, end)][0])
+
+    missing = progress.missing()
+    if missing:
+        with ThreadPoolExecutor(max_workers=max(1, connections)) as pool:
+            futures = [
+                pool.submit(_fetch_segment, session, url, path, progress, segment)
+                for segment in missing
+            ]
+            # Wait for every segment, so that all finished segments are recorded before
+            # giving up.
+            errors = []
+            for future in futures:
+                try:
+                    future.result()
+                except DownloadException as e:
+                    errors.append(e)
+        if errors:
+            raise errors[0]
@@ -23,8 +23,9 @@ setup(
         "httplib2==0.18.1",
         "moviepy>=1.0.3",
         "nltk>=3.5",
+        "numpy>=1.17.0",
         "oauth2client==4.1.3",
-        "Pillow>=7.2.0",
+        "Pillow>=8.0.0",
         "praw>=7.0.0",
         "rake-nltk>=1.0.4",
         "toml>=0.10.2",
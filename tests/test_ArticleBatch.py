@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from rvidmaker.readers.batch import ArticleBatch
+
+NOW = 1600000000.0
+
+
+def make_dict(post_id, score, hours_old=1.0, over_18=False, duration=20, is_gif=False):
+    media = None
+    if duration is not None:
+        media = {
+            "reddit_video": {
+                "is_gif": is_gif,
+                "duration": duration,
+                "fallback_url": "https://v.redd.it/{}/DASH_720.mp4".format(post_id),
+            }
+        }
+    return {
+        "title": "Post {}".format(post_id),
+        "author": "someone",
+        "selftext": "",
+        "category": None,
+        "id": post_id,
+        "url": "https://v.redd.it/{}".format(post_id),
+        "score": score,
+        "over_18": over_18,
+        "created_utc": NOW - hours_old * 60 * 60,
+        "media": media,
+    }
+
+
+@pytest.fixture
+def batch():
+    return ArticleBatch.from_dicts(
+        [
+            make_dict("a", 50, hours_old=2),
+            make_dict("b", 300, over_18=True),
+            make_dict("c", 100, duration=None),
+            make_dict("d", 300, hours_old=10, duration=90),
+            make_dict("e", 10, is_gif=True),
+        ],
+        now=NOW,
+    )
+
+
+def test_columns(batch):
+    assert len(batch) == 5
+    assert list(batch.ids) == ["a", "b", "c", "d", "e"]
+    assert batch.ages[0] == pytest.approx(2)
+    assert np.isnan(batch.durations[2]) and np.isnan(batch.durations[4])
+    assert batch.video_urls[2] is None
+    assert batch.video_urls[0] == "https://v.redd.it/a/DASH_720.mp4"
+
+
+def test_filter(batch):
+    assert list(batch.filter(min_score=100).ids) == ["b", "c", "d"]
+    assert list(batch.filter(min_age=5).ids) == ["d"]
+    assert list(batch.filter(include_nsfw=False).ids) == ["a", "c", "d", "e"]
+    assert list(batch.filter(video_only=True).ids) == ["a", "b", "d"]
+    kept = batch.filter(video_only=True, max_duration=60, include_nsfw=False)
+    assert list(kept.ids) == ["a"]
+    assert list(kept.index) == [0]
+
+
+def test_sort_and_top(batch):
+    assert list(batch.sort().ids) == ["b", "d", "c", "a", "e"]
+    assert list(batch.sort(descending=False).ids) == ["e", "a", "c", "b", "d"]
+    assert list(batch.top(3).ids) == ["b", "d", "c"]
+    assert list(batch.top(3).index) == [1, 3, 2]
+    assert list(batch.top(10).ids) == list(batch.sort().ids)
+    assert len(batch.top(0)) == 0
+
+
+def test_concat(batch):
+    joined = ArticleBatch.concat([batch, batch.filter(min_score=300)])
+    assert len(joined) == 7
+    assert list(joined.index) == list(range(7))
+    assert joined.now == NOW
+    assert len(ArticleBatch.concat([])) == 0
+
+
+if __name__ == "__main__":
+    pytest.main()
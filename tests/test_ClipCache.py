@@ -0,0 +1,124 @@
+import os
+import pytest
+
+from rvidmaker.videos import ClipCache, DownloadException, VideoRef
+
+
+class FakeVideoRef(VideoRef):
+    def __init__(self, key, data):
+        self.key = key
+        self.data = data
+        self.downloads = 0
+
+    def download(self, output_path):
+        self.downloads += 1
+        if self.data is None:
+            raise DownloadException("Failed")
+        output_path = "{}.mp4".format(os.path.splitext(output_path)[0])
+        with open(output_path, "wb") as f:
+            f.write(self.data)
+        return output_path
+
+    @property
+    def cache_key(self):
+        return self.key
+
+
+def test_download_hit(tmp_path):
+    cache = ClipCache(str(tmp_path / "cache"), 1024)
+    video = FakeVideoRef("abc", b"video")
+    path1 = cache.download(video, str(tmp_path / "first"))
+    path2 = cache.download(video, str(tmp_path / "second"))
+    assert video.downloads == 1
+    assert path2.endswith(".mp4")
+    with open(path1, "rb") as f1, open(path2, "rb") as f2:
+        assert f1.read() == f2.read() == b"video"
+
+
+def test_no_key(tmp_path):
+    cache = ClipCache(str(tmp_path / "cache"), 1024)
+    video = FakeVideoRef(None, b"video")
+    cache.download(video, str(tmp_path / "first"))
+    cache.download(video, str(tmp_path / "second"))
+    assert video.downloads == 2
+    assert cache.size == 0
+
+
+def test_failed_download(tmp_path):
+    cache = ClipCache(str(tmp_path / "cache"), 1024)
+    with pytest.raises(DownloadException):
+        cache.download(FakeVideoRef("abc", None), str(tmp_path / "first"))
+    assert cache.get("abc", str(tmp_path / "second")) is None
+
+
+def test_lru_eviction(tmp_path):
+    cache = ClipCache(str(tmp_path / "cache"), 25)
+    for key in ("a", "b"):
+        path = str(tmp_path / "{}.mp4".format(key))
+        with open(path, "wb") as f:
+            f.write(b"x" * 10)
+        cache.put(key, path)
+    # Use "a" so that "b" becomes the least recently used video.
+    os.utime(cache._entry_path("b"), (0, 0))
+    assert cache.get("a", str(tmp_path / "out")) is not None
+
+    path = str(tmp_path / "c.mp4")
+    with open(path, "wb") as f:
+        f.write(b"x" * 10)
+    cache.put("c", path)
+    assert cache.size == 20
+    assert cache.get("b", str(tmp_path / "out-b")) is None
+    assert cache.get("a", str(tmp_path / "out-a")) is not None
+    assert cache.get("c", str(tmp_path / "out-c")) is not None
+
+
+def test_put_scans_only_when_full(tmp_path, monkeypatch):
+    cache = ClipCache(str(tmp_path / "cache"), 100)
+    scans = []
+    entries = cache._entries
+
+    def counted_entries():
+        scans.append(1)
+        return entries()
+
+    monkeypatch.setattr(cache, "_entries", counted_entries)
+    for i in range(10):
+        path = str(tmp_path / "{}.mp4".format(i))
+        with open(path, "wb") as f:
+            f.write(b"x" * 10)
+        cache.put(str(i), path)
+    # Only the first put scans, until the running total goes over the budget.
+    assert len(scans) == 1
+
+    path = str(tmp_path / "10.mp4")
+    with open(path, "wb") as f:
+        f.write(b"x" * 10)
+    cache.put("10", path)
+    assert len(scans) == 2
+    # The cache is trimmed below the budget, so replacing a video doesn't scan again.
+    cache.put("10", path)
+    assert len(scans) == 2
+    assert cache.size <= 90
+
+
+def test_sidecar(tmp_path):
+    cache = ClipCache(str(tmp_path / "cache"), 1024)
+    video = FakeVideoRef("abc", b"video")
+    path = cache.download(video, str(tmp_path / "first"))
+    with open(path + ".stats", "w") as f:
+        f.write("stats")
+    cache.put_sidecar("abc", path + ".stats", ".stats")
+
+    path = cache.get("abc", str(tmp_path / "second"))
+    with open(path + ".stats") as f:
+        assert f.read() == "stats"
+    # Sidecars are not counted as cached videos.
+    assert cache.size == len(b"video")
+
+    path = cache.download(video, str(tmp_path / "third"), sidecars=False)
+    assert os.path.exists(path)
+    assert not os.path.exists(path + ".stats")
+
+
+if __name__ == "__main__":
+    pytest.main()
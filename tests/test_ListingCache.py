@@ -0,0 +1,63 @@
+import pytest
+import time
+
+from rvidmaker.readers.cache import ListingCache
+
+ARTICLES = [{"id": "a", "score": 10}, {"id": "b", "score": 5}]
+
+
+def test_round_trip(tmp_path):
+    cache = ListingCache(str(tmp_path / "listings.sqlite"))
+    assert cache.get("videos", "top", "week", 2) is None
+    cache.put("videos", "top", ARTICLES, time_filter="week", limit=2)
+    assert cache.get("Videos", "top", "week", 2) == ARTICLES
+    assert cache.get("videos", "top", "week", 1) == ARTICLES[:1]
+    assert cache.get("videos", "top", "day", 2) is None
+    assert cache.get("videos", "hot", None, 2) is None
+
+
+def test_limit(tmp_path):
+    cache = ListingCache(str(tmp_path / "listings.sqlite"))
+    cache.put("videos", "hot", ARTICLES, limit=2)
+    # More articles were requested than were cached.
+    assert cache.get("videos", "hot", limit=3) is None
+    assert cache.get("videos", "hot", limit=None) is None
+
+    # The listing ran out of articles, so it is complete.
+    cache.put("videos", "hot", ARTICLES, limit=100)
+    assert cache.get("videos", "hot", limit=None) == ARTICLES
+    cache.put("videos", "hot", ARTICLES, limit=None)
+    assert cache.get("videos", "hot", limit=1000) == ARTICLES
+
+
+def test_ttl(tmp_path, monkeypatch):
+    cache = ListingCache(str(tmp_path / "listings.sqlite"), ttls={"top/week": 60})
+    assert cache.ttl("top", "week") == 60
+    assert cache.ttl("hot") == cache.ttl("hot", None)
+    cache.put("videos", "top", ARTICLES, time_filter="week", limit=2)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.get("videos", "top", "week", 2) is None
+
+
+def test_pool(tmp_path):
+    cache = ListingCache(str(tmp_path / "listings.sqlite"))
+    assert cache.cursor("videos", "new") is None
+    old = {"id": "old", "score": 1, "created_utc": 100.0}
+    new = {"id": "new", "score": 2, "created_utc": 200.0}
+    cache.extend_pool("videos", "new", [new, old])
+    assert cache.cursor("Videos", "new") == ("t3_new", 200.0)
+    assert cache.pool("videos") == [new, old]
+    assert cache.pool("videos", min_created_utc=150) == [new]
+
+    # Updated copies replace older ones, and the cursor never moves backwards.
+    cache.extend_pool("videos", "new", [dict(old, score=10)])
+    assert cache.pool("videos")[1]["score"] == 10
+    assert cache.cursor("videos", "new") == ("t3_new", 200.0)
+
+    cache.prune_pool("videos", 150)
+    assert cache.pool("videos") == [new]
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,102 @@
+import json
+
+import praw
+import pytest
+
+from rvidmaker.readers.listing import (
+    API_URL,
+    TOKEN_URL,
+    ListingClient,
+    ListingException,
+    article_fields,
+)
+from rvidmaker.readers.reddit import RedditArticle
+from rvidmaker.readers.token import TokenCache
+from rvidmaker.replay import FixtureArchive, replay_session
+
+
+def make_data(i):
+    return {
+        "title": "Post {}".format(i),
+        "author": "[deleted]" if i == 0 else "user{}".format(i),
+        "selftext": "",
+        "category": None,
+        "id": "id{}".format(i),
+        "url": "https://v.redd.it/vid{}".format(i),
+        "score": 100 - i,
+        "over_18": False,
+        "created_utc": 1600000000.0 - i,
+        "media": {"reddit_video": {"duration": 10, "fallback_url": "x"}},
+        "num_comments": 5,
+    }
+
+
+def add_page(archive, query, items, after):
+    page = {
+        "kind": "Listing",
+        "data": {
+            "after": after,
+            "children": [{"kind": "t3", "data": make_data(i)} for i in items],
+        },
+    }
+    archive.add(
+        "GET",
+        "{}/r/videos/top?{}&raw_json=1".format(API_URL, query),
+        200,
+        {"Content-Type": "application/json"},
+        json.dumps(page).encode(),
+    )
+
+
+@pytest.fixture
+def archive_dir(tmp_path):
+    root = str(tmp_path / "archive")
+    archive = FixtureArchive(root)
+    token = {"access_token": "replay", "expires_in": 3600, "scope": "*"}
+    archive.add("POST", TOKEN_URL, 200, {}, json.dumps(token).encode())
+    add_page(archive, "limit=1024&t=week", range(0, 3), "t3_id2")
+    add_page(archive, "limit=1024&t=week&after=t3_id2", range(3, 5), None)
+    add_page(archive, "limit=4&t=week", range(0, 3), "t3_id2")
+    add_page(archive, "limit=4&t=week&after=t3_id2", range(3, 6), "t3_id5")
+    return root
+
+
+def make_client(root, **kwargs):
+    return ListingClient("id", "secret", "test", session=replay_session(root), **kwargs)
+
+
+def test_pages(archive_dir):
+    client = make_client(archive_dir)
+    articles = list(client.iter_listing("videos", "top", time_filter="week"))
+    assert [a["id"] for a in articles] == ["id0", "id1", "id2", "id3", "id4"]
+    assert articles[0]["author"] is None
+    assert "num_comments" not in articles[0]
+
+    articles = list(client.iter_listing("videos", "top", limit=4, time_filter="week"))
+    assert [a["id"] for a in articles] == ["id0", "id1", "id2", "id3"]
+
+
+def test_same_as_praw():
+    reddit = praw.Reddit(client_id="id", client_secret="secret", user_agent="test")
+    for i in range(2):
+        data = make_data(i)
+        submission = praw.models.Submission(reddit, _data=dict(data))
+        expected = RedditArticle(submission).to_dict()
+        assert RedditArticle.from_dict(article_fields(data)).to_dict() == expected
+
+
+def test_token_cached(archive_dir, tmp_path):
+    cache = TokenCache(str(tmp_path / "token.json"))
+    client = make_client(archive_dir, token_cache=cache)
+    list(client.iter_listing("videos", "top", limit=4, time_filter="week"))
+    assert cache.load("id")[0] == "replay"
+
+
+def test_missing_listing(archive_dir):
+    client = make_client(archive_dir)
+    with pytest.raises(ListingException):
+        list(client.iter_listing("videos", "hot"))
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,66 @@
+import math
+import pytest
+
+from rvidmaker.editor.loudness import LoudnessException, LoudnessStats
+
+SUMMARY = """
+[Parsed_ebur128_0 @ 0x7fb4e8001940] Summary:
+
+  Integrated loudness:
+    I:         -21.8 LUFS
+    Threshold: -31.8 LUFS
+
+  Loudness range:
+    LRA:         4.5 LU
+    Threshold:  -41.0 LUFS
+    LRA low:    -24.0 LUFS
+    LRA high:   -19.5 LUFS
+
+  Sample peak:
+    Peak:       -6.0 dBFS
+
+  True peak:
+    Peak:       -5.8 dBFS
+"""
+
+
+def test_parse():
+    stats = LoudnessStats.parse(SUMMARY)
+    assert stats.integrated == -21.8
+    assert stats.threshold == -31.8
+    assert stats.lra == 4.5
+    assert stats.sample_peak == -6.0
+    assert stats.true_peak == -5.8
+    assert stats.peak == pytest.approx(0.501, abs=1e-3)
+
+
+def test_parse_silence():
+    summary = SUMMARY.replace("-6.0 dBFS", "-inf dBFS").replace("-21.8", "-70.0")
+    stats = LoudnessStats.parse(summary)
+    assert math.isinf(stats.sample_peak)
+    assert stats.peak == 0
+
+
+def test_gain():
+    stats = LoudnessStats.parse(SUMMARY)
+    # Every backend scales the highest sample to the audio level.
+    assert stats.gain(0.7) == pytest.approx(0.7 / stats.peak)
+    assert stats.gain(0.7) * stats.peak == pytest.approx(0.7)
+    silent = LoudnessStats.parse(SUMMARY.replace("-6.0 dBFS", "-inf dBFS"))
+    assert silent.gain(0.7) is None
+
+
+def test_parse_missing():
+    with pytest.raises(LoudnessException):
+        LoudnessStats.parse("no summary here")
+    with pytest.raises(LoudnessException):
+        LoudnessStats.parse(SUMMARY.split("Sample peak")[0])
+
+
+def test_dict_round_trip():
+    stats = LoudnessStats.parse(SUMMARY)
+    assert LoudnessStats.from_dict(stats.to_dict()).to_dict() == stats.to_dict()
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,60 @@
+import pytest
+from types import SimpleNamespace
+
+from rvidmaker.readers.reddit import RedditArticle
+
+
+def make_submission(**kwargs):
+    fields = {
+        "title": "A title",
+        "author": SimpleNamespace(name="someone"),
+        "selftext": "",
+        "category": None,
+        "id": "abc123",
+        "url": "https://v.redd.it/abc123",
+        "score": 1234,
+        "over_18": False,
+        "created_utc": 1600000000.0,
+        "media": {
+            "reddit_video": {
+                "is_gif": False,
+                "duration": 30,
+                "fallback_url": "https://v.redd.it/abc123/DASH_720.mp4",
+            }
+        },
+    }
+    fields.update(kwargs)
+    return SimpleNamespace(**fields)
+
+
+def test_from_praw():
+    art = RedditArticle(make_submission())
+    assert art.author == "someone"
+    assert art.id == "abc123"
+    assert art.score == 1234
+    assert art.duration == 30
+    assert not art.nsfw
+    assert art.has_video(min_duration=10, max_duration=60)
+    assert not art.has_video(max_duration=20)
+
+
+def test_deleted_author():
+    assert RedditArticle(make_submission(author=None)).author is None
+
+
+def test_no_video():
+    art = RedditArticle(make_submission(media=None))
+    assert art.duration is None
+    assert not art.has_video()
+
+
+def test_dict_round_trip():
+    art = RedditArticle(make_submission())
+    restored = RedditArticle.from_dict(art.to_dict())
+    assert restored.to_dict() == art.to_dict()
+    assert restored.title == art.title
+    assert restored.duration == art.duration
+
+
+if __name__ == "__main__":
+    pytest.main()
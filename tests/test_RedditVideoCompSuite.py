@@ -0,0 +1,34 @@
+import pytest
+
+from rvidmaker.suites.reddit_video_comp import RedditVideoCompSuite
+
+PROFILE = """
+[reddit.compilation]
+subreddit = "{}"
+default_title = "Compilation"
+listing_cache = "{}"
+token_cache = "{}"
+"""
+
+
+def test_suites_share_reader(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("reddit_api_config.toml", "w") as f:
+        f.write('client_id = "id"\nclient_secret = "secret"\n')
+
+    listing_cache = str(tmp_path / "listings.sqlite")
+    token_cache = str(tmp_path / "token.json")
+    suites = []
+    for subreddit in ("videos", "funny"):
+        profile_path = str(tmp_path / "{}.toml".format(subreddit))
+        with open(profile_path, "w") as f:
+            f.write(PROFILE.format(subreddit, listing_cache, token_cache))
+        suite = RedditVideoCompSuite()
+        suite.config(profile_path)
+        suites.append(suite)
+
+    assert suites[0]._get_reader() is suites[1]._get_reader()
+
+
+if __name__ == "__main__":
+    pytest.main()
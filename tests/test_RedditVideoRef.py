@@ -0,0 +1,72 @@
+import os
+import shutil
+
+import ffmpeg
+import pytest
+
+from rvidmaker.videos import DownloadException, RedditVideoRef
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None, reason="FFmpeg is not installed"
+)
+
+
+def make_video(path):
+    ffmpeg.input("testsrc=size=64x48:rate=30:d=1", f="lavfi").output(
+        path, vcodec="libx264", pix_fmt="yuv420p"
+    ).run(quiet=True, overwrite_output=True)
+    return path
+
+
+def make_audio(path, codec):
+    ffmpeg.input("sine=d=1", f="lavfi").output(path, acodec=codec).run(
+        quiet=True, overwrite_output=True
+    )
+    return path
+
+
+def audio_codec(path):
+    _, err = (
+        ffmpeg.input(path).output("-", f="null").run(quiet=True, capture_stderr=True)
+    )
+    for line in err.decode(errors="replace").splitlines():
+        if "Audio:" in line:
+            return line.split("Audio:")[1].split()[0].strip(",")
+    return None
+
+
+def test_mux_copy(tmp_path):
+    video_path = make_video(str(tmp_path / "video.mp4"))
+    audio_path = make_audio(str(tmp_path / "audio.m4a"), "aac")
+    output_path = str(tmp_path / "out.mp4")
+    RedditVideoRef._mux(video_path, audio_path, output_path)
+    assert audio_codec(output_path) == "aac"
+
+
+def test_mux_transcodes_audio(tmp_path):
+    # MP4 cannot hold A-law audio, so copying the streams fails.
+    video_path = make_video(str(tmp_path / "video.mp4"))
+    audio_path = make_audio(str(tmp_path / "audio.wav"), "pcm_alaw")
+    output_path = str(tmp_path / "out.mp4")
+    with pytest.raises(ffmpeg.Error):
+        ffmpeg.output(
+            ffmpeg.input(video_path).video,
+            ffmpeg.input(audio_path).audio,
+            str(tmp_path / "copy.mp4"),
+            c="copy",
+        ).run(quiet=True, overwrite_output=True)
+
+    RedditVideoRef._mux(video_path, audio_path, output_path)
+    assert audio_codec(output_path) == "aac"
+
+
+def test_mux_fails(tmp_path):
+    video_path = make_video(str(tmp_path / "video.mp4"))
+    output_path = str(tmp_path / "out.mp4")
+    with pytest.raises(DownloadException):
+        RedditVideoRef._mux(video_path, str(tmp_path / "missing.m4a"), output_path)
+    assert not os.path.exists(output_path)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,48 @@
+import pytest
+import time
+
+from rvidmaker.readers.ratelimit import TokenBucket
+
+
+def test_acquire():
+    bucket = TokenBucket(capacity=3, period=600)
+    for _ in range(3):
+        bucket.acquire()
+    assert bucket.tokens == 0
+
+
+def test_waits_for_reset():
+    bucket = TokenBucket(capacity=10, period=600)
+    bucket.update_from_headers(
+        {
+            "x-ratelimit-remaining": "0.0",
+            "x-ratelimit-reset": "0.2",
+            "x-ratelimit-used": "10",
+        }
+    )
+    start = time.time()
+    bucket.acquire()
+    assert time.time() - start >= 0.15
+
+
+def test_update():
+    bucket = TokenBucket(capacity=600, period=600)
+    # Reddit has seen fewer requests than the bucket allowed.
+    bucket.update(remaining=550.0, reset=300, used=50)
+    assert bucket.tokens == 550
+    bucket.acquire()
+    bucket.update(remaining=560.0, reset=299, used=40)
+    assert bucket.tokens == 549
+    # A new window started.
+    bucket.update(remaining=599.0, reset=599, used=1)
+    assert bucket.tokens == 599
+
+
+def test_ignores_missing_headers():
+    bucket = TokenBucket(capacity=5)
+    bucket.update_from_headers({"content-type": "application/json"})
+    assert bucket.tokens == 5
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,99 @@
+import os
+import time
+
+import praw
+import pytest
+
+from rvidmaker.net import make_session
+from rvidmaker.readers.reddit import RedditReader
+from rvidmaker.readers.token import TokenCache
+
+
+def make_reddit():
+    return praw.Reddit(client_id="id", client_secret="secret", user_agent="test")
+
+
+def test_save_and_load(tmp_path):
+    cache = TokenCache(str(tmp_path / "tokens" / "token.json"))
+    assert cache.load("id") is None
+
+    expires_at = time.time() + 3600
+    cache.save("id", "abc", {"*"}, expires_at)
+    assert cache.load("id") == ("abc", ["*"], expires_at)
+    assert cache.load("other") is None
+    assert os.stat(cache.path).st_mode & 0o777 == 0o600
+
+
+def test_expired_token_not_loaded(tmp_path):
+    cache = TokenCache(str(tmp_path / "token.json"))
+    cache.save("id", "abc", ["*"], time.time() + 5)
+    assert cache.load("id") is None
+
+
+def test_install_uses_cached_token(tmp_path):
+    cache = TokenCache(str(tmp_path / "token.json"))
+    cache.save("id", "abc", ["*"], time.time() + 3600)
+
+    reddit = make_reddit()
+    assert cache.install(reddit, "id")
+    authorizer = reddit._read_only_core._authorizer
+    assert authorizer.is_valid()
+    assert authorizer.access_token == "abc"
+
+
+def test_install_saves_new_token(tmp_path):
+    cache = TokenCache(str(tmp_path / "token.json"))
+    reddit = make_reddit()
+    authorizer = reddit._read_only_core._authorizer
+
+    def refresh():
+        authorizer.access_token = "new"
+        authorizer.scopes = {"*"}
+        TokenCache._set_expiry(authorizer, time.time() + 3600)
+
+    authorizer.refresh = refresh
+    assert cache.install(reddit, "id")
+    assert not authorizer.is_valid()
+
+    authorizer.refresh()
+    token, scopes, expires_at = cache.load("id")
+    assert token == "new"
+    assert scopes == ["*"]
+    assert expires_at == pytest.approx(time.time() + 3600, abs=5)
+
+
+def test_shared_reader(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("reddit_api_config.toml", "w") as f:
+        f.write('client_id = "id"\nclient_secret = "secret"\n')
+
+    reader = RedditReader.shared()
+    assert RedditReader.shared() is reader
+    assert RedditReader.shared(prefetch_pages=0) is not reader
+
+    caches = [TokenCache(str(tmp_path / "token.json")) for _ in range(2)]
+    reader = RedditReader.shared(token_cache=caches[0])
+    assert RedditReader.shared(token_cache=caches[1]) is reader
+    assert RedditReader.shared(token_cache=TokenCache("other.json")) is not reader
+
+
+def test_session_headers_kept(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("reddit_api_config.toml", "w") as f:
+        f.write('client_id = "id"\nclient_secret = "secret"\n')
+
+    session = make_session()
+    user_agent = session.headers["User-Agent"]
+    reader = RedditReader(session=session)
+    # PRAW sets its own User-Agent without changing the one other requests are sent with.
+    assert session.headers["User-Agent"] == user_agent
+    praw_session = (
+        reader.reddit._read_only_core._authorizer._authenticator._requestor._http
+    )
+    assert praw_session is not session
+    assert praw_session.headers["User-Agent"].startswith("rvidmaker")
+    assert praw_session.get_adapter("https://") is session.get_adapter("https://")
+
+
+if __name__ == "__main__":
+    pytest.main()
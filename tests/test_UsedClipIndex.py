@@ -0,0 +1,68 @@
+import pytest
+
+from rvidmaker.videos.history import BloomFilter, UsedClipIndex, media_key
+
+
+def test_media_key():
+    assert (
+        media_key("https://v.redd.it/abc123/DASH_720.mp4?source=fallback")
+        == "v.redd.it/abc123"
+    )
+    assert media_key("https://V.REDD.IT/abc123") == "v.redd.it/abc123"
+    assert media_key(None) is None
+
+
+def test_bloom_filter():
+    bloom = BloomFilter.for_capacity(1000, 0.01)
+    for i in range(1000):
+        bloom.add("key{}".format(i))
+    assert all("key{}".format(i) in bloom for i in range(1000))
+    false_positives = sum("other{}".format(i) in bloom for i in range(10000))
+    assert false_positives < 300
+
+    bits = bloom.to_bytes()
+    assert len(bits) * 8 == bloom.num_bits
+    restored = BloomFilter(len(bits) * 8, bloom.num_hashes, bits)
+    assert all("key{}".format(i) in restored for i in range(1000))
+
+
+def test_used_clips(tmp_path):
+    path = str(tmp_path / "used.sqlite")
+    index = UsedClipIndex(path, "cars", capacity=101)
+    assert not index.is_used("p1", "v.redd.it/m1")
+    index.mark_used([("p1", "v.redd.it/m1"), ("p2", None)])
+
+    assert index.is_used("p1")
+    assert index.is_used("p2", "v.redd.it/m2")
+    # A crosspost of a used video.
+    assert index.is_used("p3", "v.redd.it/m1")
+    assert not index.is_used("p3", "v.redd.it/m3")
+
+    # The index persists, and is kept separately for each channel.
+    assert UsedClipIndex(path, "cars").is_used("p1")
+    assert not UsedClipIndex(path, "pets").is_used("p1")
+
+
+def test_concurrent_writers(tmp_path):
+    path = str(tmp_path / "used.sqlite")
+    first = UsedClipIndex(path, "cars")
+    second = UsedClipIndex(path, "cars")
+    first.mark_used([("p1", None)])
+    second.mark_used([("p2", None)])
+    # The second writer kept the first writer's filter bits.
+    assert UsedClipIndex(path, "cars").is_used("p1")
+
+
+def test_sees_other_writers(tmp_path):
+    path = str(tmp_path / "used.sqlite")
+    reader = UsedClipIndex(path, "cars")
+    assert not reader.is_used("p1")
+    # Another process marks a clip after this one loaded its filter.
+    UsedClipIndex(path, "cars").mark_used([("p1", "v.redd.it/m1")])
+    assert reader.is_used("p1")
+    assert reader.is_used("p2", "v.redd.it/m1")
+    assert not reader.is_used("p2")
+
+
+if __name__ == "__main__":
+    pytest.main()
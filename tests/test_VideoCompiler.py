@@ -0,0 +1,99 @@
+import os
+import pytest
+import time
+
+from rvidmaker.editor import VideoCompiler
+from rvidmaker.editor import videocomp
+from rvidmaker.editor.videocomp import NotEnoughVideos
+from rvidmaker.videos import DownloadException, VideoRef
+
+
+class FakeVideoRef(VideoRef):
+    def __init__(self, title, delay, fail=False):
+        self._title = title
+        self.delay = delay
+        self.fail = fail
+        self.attempts = 0
+
+    def download(self, output_path):
+        time.sleep(self.delay)
+        self.attempts += 1
+        if self.fail is True or self.attempts <= self.fail:
+            raise DownloadException("Failed")
+        return output_path
+
+    @property
+    def title(self):
+        return self._title
+
+    @property
+    def author(self):
+        return "author"
+
+
+@pytest.fixture(autouse=True)
+def work_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(videocomp, "_RETRY_DELAY", 0)
+
+
+def test_invalid_backend():
+    with pytest.raises(ValueError):
+        VideoCompiler(censor=None, backend="foobar")
+
+
+def test_pipeline_order():
+    compiler = VideoCompiler(censor=None)
+    videos = [
+        FakeVideoRef("slow", 0.2),
+        FakeVideoRef("failed", 0, fail=True),
+        FakeVideoRef("fast", 0),
+        FakeVideoRef("skipped", 0),
+    ]
+    for v in videos:
+        compiler.add_video(v)
+    prepared_order = []
+
+    def prepare(v, path):
+        prepared_order.append(v.title)
+        return None if v.title == "skipped" else os.path.basename(path)
+
+    results = list(compiler._pipeline(prepare))
+    # Videos are prepared as they finish downloading, but yielded in order.
+    assert prepared_order[-1] == "slow"
+    assert [(v.title, p) for v, p in results] == [
+        ("slow", "vid0000"),
+        ("fast", "vid0002"),
+    ]
+
+
+def test_pipeline_standby():
+    compiler = VideoCompiler(censor=None)
+    compiler.add_video(FakeVideoRef("first", 0))
+    compiler.add_video(FakeVideoRef("failed", 0, fail=True))
+    compiler.add_video(FakeVideoRef("last", 0.1))
+    compiler.add_standby(FakeVideoRef("standby", 0))
+    results = list(compiler._pipeline(lambda v, path: path))
+    assert [v.title for v, _ in results] == ["first", "standby", "last"]
+
+
+def test_download_retried():
+    flaky = FakeVideoRef("flaky", 0, fail=2)
+    assert VideoCompiler._dl_video(flaky, "vid")[0] is flaky
+    assert flaky.attempts == 3
+
+    failed = FakeVideoRef("failed", 0, fail=True)
+    assert VideoCompiler._dl_video(failed, "vid", attempts=2) is None
+    assert failed.attempts == 2
+
+
+def test_pipeline_not_enough_videos():
+    compiler = VideoCompiler(censor=None)
+    compiler.add_video(FakeVideoRef("ok", 0))
+    compiler.add_video(FakeVideoRef("failed", 0, fail=True))
+    with pytest.raises(NotEnoughVideos):
+        list(compiler._pipeline(lambda v, path: path))
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -17,6 +17,10 @@ def test_get_duration():
     assert VideoRef().duration is None
 
 
+def test_get_cache_key():
+    assert VideoRef().cache_key is None
+
+
 def test_download():
     with pytest.raises(NotImplementedError):
         VideoRef().download("not-used.mp4")
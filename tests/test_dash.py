@@ -0,0 +1,132 @@
+import pytest
+import requests
+from types import SimpleNamespace
+
+from rvidmaker.readers import dash
+from rvidmaker.readers.reddit import RedditArticle
+from rvidmaker.replay import FixtureArchive, replay_session
+
+MANIFEST_URL = "https://v.redd.it/abc123/DASHPlaylist.mpd?a=1"
+MANIFEST = """<?xml version="1.0" encoding="UTF-8"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" mediaPresentationDuration="PT20S">
+  <Period>
+    <AdaptationSet contentType="video" maxWidth="1920" maxHeight="1080">
+      <Representation bandwidth="4800000" width="1920" height="1080" id="1080">
+        <BaseURL>DASH_1080.mp4</BaseURL>
+      </Representation>
+      <Representation bandwidth="1200000" width="854" height="480" id="480">
+        <BaseURL>DASH_480.mp4</BaseURL>
+      </Representation>
+      <Representation bandwidth="2400000" width="1280" height="720" id="720">
+        <BaseURL>DASH_720.mp4</BaseURL>
+      </Representation>
+    </AdaptationSet>
+    <AdaptationSet mimeType="audio/mp4">
+      <Representation bandwidth="64000" id="5"><BaseURL>DASH_AUDIO_64.mp4</BaseURL></Representation>
+      <Representation bandwidth="128000" id="6"><BaseURL>DASH_AUDIO_128.mp4</BaseURL></Representation>
+    </AdaptationSet>
+  </Period>
+</MPD>
+"""
+
+
+def test_parse_manifest():
+    reps = dash.parse_manifest(MANIFEST, MANIFEST_URL)
+    assert len(reps) == 5
+    assert reps[0].url == "https://v.redd.it/abc123/DASH_1080.mp4"
+    assert (reps[0].width, reps[0].height, reps[0].bandwidth) == (1920, 1080, 4800000)
+    assert reps[3].content_type == "audio"
+    assert reps[3].height is None
+
+
+def test_select():
+    reps = dash.parse_manifest(MANIFEST, MANIFEST_URL)
+    assert dash.select_video(reps, (1280, 720)).height == 720
+    assert dash.select_video(reps, (1000, 1000)).height == 720
+    assert dash.select_video(reps, (640, 360)).height == 480
+    assert dash.select_video(reps, (3840, 2160)).height == 1080
+    assert dash.select_video(reps).height == 1080
+    assert dash.select_audio(reps).url.endswith("DASH_AUDIO_128.mp4")
+    assert dash.select_audio(reps[:3]) is None
+
+
+def test_invalid_manifest():
+    with pytest.raises(dash.DashException):
+        dash.parse_manifest("<html></html>", MANIFEST_URL)
+    with pytest.raises(dash.DashException):
+        dash.parse_manifest("not xml", MANIFEST_URL)
+
+
+class FakeSession:
+    def __init__(self, manifest_status=200):
+        self.manifest_status = manifest_status
+        self.heads = []
+
+    def get(self, url, timeout=None):
+        if self.manifest_status is None:
+            raise requests.exceptions.ConnectionError("unreachable")
+        return SimpleNamespace(status_code=self.manifest_status, text=MANIFEST, url=url)
+
+    def head(self, url, timeout=None):
+        self.heads.append(url)
+        return SimpleNamespace(status_code=200)
+
+
+def make_article():
+    return RedditArticle.from_dict(
+        {
+            "title": "A title",
+            "author": "someone",
+            "selftext": "",
+            "category": None,
+            "id": "abc123",
+            "url": "https://v.redd.it/abc123",
+            "score": 100,
+            "over_18": False,
+            "created_utc": 1600000000.0,
+            "media": {
+                "reddit_video": {
+                    "is_gif": False,
+                    "duration": 20,
+                    "dash_url": MANIFEST_URL,
+                    "fallback_url": "https://v.redd.it/abc123/DASH_1080.mp4",
+                }
+            },
+        }
+    )
+
+
+def test_get_video_from_manifest():
+    session = FakeSession()
+    video = make_article().get_video(session, res=(1280, 720))
+    assert video.video_url == "https://v.redd.it/abc123/DASH_720.mp4"
+    assert video._audio_url == "https://v.redd.it/abc123/DASH_AUDIO_128.mp4"
+    assert session.heads == []
+
+
+def test_get_video_without_manifest():
+    session = FakeSession(manifest_status=404)
+    video = make_article().get_video(session, res=(1280, 720))
+    assert video.video_url == "https://v.redd.it/abc123/DASH_1080.mp4"
+    assert session.heads == ["https://v.redd.it/abc123/DASH_audio.mp4"]
+
+
+def test_get_video_manifest_unreachable():
+    session = FakeSession(manifest_status=None)
+    video = make_article().get_video(session, res=(1280, 720))
+    assert video.video_url == "https://v.redd.it/abc123/DASH_1080.mp4"
+    assert session.heads == ["https://v.redd.it/abc123/DASH_audio.mp4"]
+
+
+def test_get_video_manifest_not_recorded(tmp_path):
+    # Only the audio track is recorded, so the manifest is answered with a 404.
+    archive = FixtureArchive(str(tmp_path / "archive"))
+    audio_url = "https://v.redd.it/abc123/DASH_audio.mp4"
+    archive.add("HEAD", audio_url, 200, {}, b"")
+    video = make_article().get_video(replay_session(archive.root), res=(1280, 720))
+    assert video.video_url == "https://v.redd.it/abc123/DASH_1080.mp4"
+    assert video._audio_url == audio_url
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,183 @@
+import http.server
+import json
+import os
+import pytest
+import socketserver
+import threading
+import time
+
+from rvidmaker.videos import DownloadException, RedditVideoRef
+from rvidmaker.videos import segmented
+from rvidmaker.videos.segmented import PROGRESS_EXT, download_file, remove_progress
+
+BODY = bytes(range(256)) * 40
+
+
+class Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    # `http.server.ThreadingHTTPServer` needs Python 3.7.
+    daemon_threads = True
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    honor_range = True
+    fail_after = None
+    requests = []
+    delay = 0
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with Handler.lock:
+            Handler.active += 1
+            Handler.max_active = max(Handler.max_active, Handler.active)
+        try:
+            time.sleep(Handler.delay)
+            self.respond()
+        finally:
+            with Handler.lock:
+                Handler.active -= 1
+
+    def respond(self):
+        Handler.requests.append(self.headers.get("Range"))
+        if (
+            Handler.fail_after is not None
+            and len(Handler.requests) > Handler.fail_after
+        ):
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        range_header = self.headers.get("Range")
+        if range_header and Handler.honor_range:
+            start, end = (int(x) for x in range_header[len("bytes=") :].split("-"))
+            end = min(end, len(BODY) - 1)
+            body = BODY[start : end + 1]
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", "bytes {}-{}/{}".format(start, end, len(BODY))
+            )
+        else:
+            body = BODY
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.honor_range = True
+    Handler.fail_after = None
+    Handler.requests = []
+    Handler.delay = 0
+    Handler.max_active = 0
+    httpd = Server(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}/video".format(httpd.server_address[1])
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def assert_complete(path, segments):
+    with open(path + PROGRESS_EXT) as f:
+        assert json.load(f)["done"] == list(range(segments))
+
+
+def test_segmented(server, tmp_path):
+    path = str(tmp_path / "video.mp4")
+    download_file(server, path, segment_size=1000)
+    assert read(path) == BODY
+    assert_complete(path, 11)
+    assert len(Handler.requests) == 11
+
+
+def test_single_segment(server, tmp_path):
+    path = str(tmp_path / "video.mp4")
+    download_file(server, path, segment_size=len(BODY) * 2)
+    assert read(path) == BODY
+    assert len(Handler.requests) == 1
+
+
+def test_range_ignored(server, tmp_path):
+    Handler.honor_range = False
+    path = str(tmp_path / "video.mp4")
+    download_file(server, path, segment_size=1000)
+    assert read(path) == BODY
+    assert_complete(path, 11)
+    assert len(Handler.requests) == 1
+
+
+def test_resume(server, tmp_path):
+    path = str(tmp_path / "video.mp4")
+    Handler.fail_after = 4
+    with pytest.raises(DownloadException):
+        download_file(server, path, connections=1, segment_size=1000)
+    with open(path + PROGRESS_EXT) as f:
+        assert json.load(f)["done"] == [0, 1, 2, 3]
+
+    Handler.fail_after = None
+    Handler.requests = []
+    download_file(server, path, segment_size=1000)
+    assert read(path) == BODY
+    assert_complete(path, 11)
+    assert len(Handler.requests) == 7
+    assert Handler.requests[0] == "bytes=4000-4999"
+
+
+@pytest.mark.parametrize("honor_range", [True, False])
+def test_complete_not_fetched_again(server, tmp_path, honor_range):
+    Handler.honor_range = honor_range
+    path = str(tmp_path / "video.mp4")
+    download_file(server, path, segment_size=1000)
+    Handler.requests = []
+    download_file(server, path, segment_size=1000)
+    assert read(path) == BODY
+    assert Handler.requests == []
+
+    remove_progress(path)
+    assert not os.path.exists(path + PROGRESS_EXT)
+    download_file(server, path, segment_size=1000)
+    assert len(Handler.requests) > 0
+
+
+def test_video_ref_removes_progress(server, tmp_path):
+    output_path = str(tmp_path / "out.mp4")
+    path = RedditVideoRef("title", "author", server).download(output_path)
+    assert read(path) == BODY
+    assert os.listdir(str(tmp_path)) == ["out.mp4"]
+
+
+def test_connections_shared(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(segmented, "_connections", threading.BoundedSemaphore(3))
+    Handler.delay = 0.05
+    threads = [
+        threading.Thread(
+            target=download_file,
+            args=(server, str(tmp_path / "video{}.mp4".format(i))),
+            kwargs={"connections": 4, "segment_size": 1000},
+        )
+        for i in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(Handler.requests) == 22
+    # Both downloads together stay within the limit, rather than using 4 connections each.
+    assert Handler.max_active == 3
+    for i in range(2):
+        assert read(str(tmp_path / "video{}.mp4".format(i))) == BODY
+
+
+if __name__ == "__main__":
+    pytest.main()
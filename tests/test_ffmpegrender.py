@@ -0,0 +1,83 @@
+import shutil
+
+import ffmpeg
+import pytest
+
+from rvidmaker.editor import ffmpegrender
+from rvidmaker.editor.loudness import LoudnessStats
+
+requires_ffmpeg = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None, reason="FFmpeg is not installed"
+)
+
+
+def make_clip(path, audio=True, duration=1):
+    video = ffmpeg.input(
+        "testsrc=size=64x48:rate=30:d={}".format(duration), f="lavfi"
+    ).video
+    streams = [video]
+    if audio:
+        streams.append(ffmpeg.input("sine=d={}".format(duration), f="lavfi").audio)
+    ffmpeg.output(*streams, path, vcodec="libx264", pix_fmt="yuv420p").run(
+        quiet=True, overwrite_output=True
+    )
+    return path
+
+
+def make_caption(path):
+    ffmpeg.input("color=c=white:size=32x8:d=1", f="lavfi").output(path, vframes=1).run(
+        quiet=True, overwrite_output=True
+    )
+    return path
+
+
+def filter_graph(cmd):
+    args = cmd.get_args()
+    return args[args.index("-filter_complex") + 1]
+
+
+def test_filter_graph():
+    stats = LoudnessStats(-20.0, -30.0, 5.0, -6.0, -5.0)
+    clips = [
+        ("a.mp4", "a.png", 2.0, True, stats),
+        ("b.mp4", "b.png", 3.0, True, None),
+        ("c.mp4", "c.png", 4.0, False, None),
+    ]
+    cmd = ffmpegrender.build_compilation(clips, (1280, 720), "out.mp4", audio_level=0.7)
+    graph = filter_graph(cmd)
+    args = cmd.get_args()
+
+    assert graph.count("scale=1280:720") == 3
+    assert graph.count("overlay") == 3
+    assert "concat=a=1:n=3:v=1" in graph
+    # Known loudness is applied as the same peak gain the Moviepy backends use, and audio
+    # of unknown loudness is left alone.
+    assert stats.gain(0.7) == pytest.approx(0.7 / 10 ** (-6 / 20))
+    assert "volume={:.6f}".format(stats.gain(0.7)) in graph
+    assert graph.count("volume") == 1
+    # The clip without audio is given silence of the same duration.
+    assert "anullsrc=r=44100:cl=stereo" in args
+    silence = args.index("anullsrc=r=44100:cl=stereo")
+    assert args[silence - 3 : silence - 1] == ["-t", "4.0"]
+    assert args[-1] == "out.mp4"
+
+
+@requires_ffmpeg
+def test_render(tmp_path):
+    clips = []
+    for name, audio in (("a", True), ("b", False)):
+        path = make_clip(str(tmp_path / "{}.mp4".format(name)), audio=audio)
+        caption = make_caption(str(tmp_path / "{}.png".format(name)))
+        clips.append((path, caption, 1.0, audio, None))
+
+    output_path = str(tmp_path / "out.mp4")
+    ffmpegrender.build_compilation(clips, (64, 48), output_path).run(
+        quiet=True, overwrite_output=True
+    )
+    # Decoding fails if either stream is missing.
+    output = ffmpeg.input(output_path)
+    ffmpeg.output(output.video, output.audio, "-", f="null").run(quiet=True)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,127 @@
+import praw
+import prawcore
+import pytest
+import random
+import threading
+from types import SimpleNamespace
+
+from rvidmaker.readers.reddit import RedditArticle, RedditReader
+
+
+class FakeComment:
+    def __init__(self, score, replies=(), author="someone", body="text"):
+        self.score = score
+        self.replies = list(replies)
+        self.author = author
+        self.body = body
+
+
+class FakeMore:
+    """Stands in for a "load more comments" link"""
+
+
+class FakeForest(list):
+    def __init__(self, comments):
+        super().__init__(comments)
+        self.replace_more_limit = None
+
+    def replace_more(self, limit=32):
+        self.replace_more_limit = limit
+        self[:] = [c for c in self if not isinstance(c, FakeMore)]
+
+
+@pytest.fixture(autouse=True)
+def fake_comment_class(monkeypatch):
+    monkeypatch.setattr(praw.models.reddit.comment, "Comment", FakeComment)
+
+
+def make_article(comments):
+    article = RedditArticle.__new__(RedditArticle)
+    article._article = type("Submission", (), {"comments": FakeForest(comments)})()
+    return article
+
+
+def test_top_comments():
+    scores = list(range(10000))
+    random.Random(0).shuffle(scores)
+    comments = [FakeComment(s) for s in scores]
+    comments.append(FakeComment(20000, author=None))
+    comments.append(FakeComment(20001, body="[deleted]"))
+    comments.append(FakeMore())
+    article = make_article(comments)
+
+    best = article.get_comments(max_comments=3, max_depth=0)
+    assert [c.score for c in best] == [9999, 9998, 9997]
+    assert article._article.comments.replace_more_limit == 0
+
+
+def test_reply_chain():
+    thread = FakeComment(
+        100,
+        replies=[
+            FakeComment(30),
+            FakeComment(200, author=None),
+            FakeComment(80, replies=[FakeComment(50, replies=[FakeComment(40)])]),
+        ],
+    )
+    article = make_article([thread])
+
+    (comment,) = article.get_comments(max_depth=2, percent_thres=0.5)
+    assert [c.score for c in comment.chain()] == [100, 80, 50]
+    assert comment.child is comment.child
+
+    (comment,) = article.get_comments(max_depth=5, percent_thres=0.9)
+    assert [c.score for c in comment.chain()] == [100]
+
+
+def test_more_budget():
+    article = make_article([FakeComment(1)])
+    article.get_comments(more_budget=5)
+    assert article._article.comments.replace_more_limit == 5
+
+
+def test_batch():
+    clients = set()
+
+    def connect():
+        def submission(id):
+            if id == "broken":
+                raise prawcore.exceptions.PrawcoreException("server error")
+            score = int(id[1:])
+            comments = [FakeComment(score + i) for i in range(5)]
+            return SimpleNamespace(comments=FakeForest(comments))
+
+        client = SimpleNamespace(submission=submission)
+        clients.add(id(client))
+        return client
+
+    reader = RedditReader.__new__(RedditReader)
+    reader._local = threading.local()
+    reader._connect = connect
+    articles = [
+        RedditArticle.from_dict(
+            {
+                "title": post_id,
+                "author": "someone",
+                "selftext": "",
+                "category": None,
+                "id": post_id,
+                "url": "",
+                "score": 1,
+                "over_18": False,
+                "created_utc": 1600000000.0,
+                "media": None,
+            }
+        )
+        for post_id in ["p{}".format(i * 100) for i in range(30)] + ["broken"]
+    ]
+
+    comments = reader.get_comments(articles, max_workers=4, max_comments=2)
+    assert len(comments) == 31
+    assert [c.score for c in comments["p300"]] == [304, 303]
+    assert comments["broken"] is None
+    assert 1 <= len(clients) <= 4
+
+
+if __name__ == "__main__":
+    pytest.main()
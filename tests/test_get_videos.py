@@ -0,0 +1,110 @@
+import pytest
+import requests
+import threading
+import time
+from types import SimpleNamespace
+
+from rvidmaker.readers.reddit import RedditArticle, RedditReader, RedditVideoNotFound
+
+
+class FakeSession:
+    """Answers HEAD requests for audio tracks, tracking how many run at once"""
+
+    def __init__(self, missing_audio=(), failing=()):
+        self.missing_audio = missing_audio
+        self.failing = failing
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def head(self, url, timeout=None):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(0.01)
+            post_id = url.split("/")[3]
+            if post_id in self.failing:
+                raise requests.exceptions.ConnectionError("connection reset")
+            status = 403 if post_id in self.missing_audio else 200
+            return SimpleNamespace(status_code=status)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def make_article(post_id, media=True):
+    return RedditArticle.from_dict(
+        {
+            "title": "Post {}".format(post_id),
+            "author": "someone",
+            "selftext": "",
+            "category": None,
+            "id": post_id,
+            "url": "https://v.redd.it/{}".format(post_id),
+            "score": 100,
+            "over_18": False,
+            "created_utc": 1600000000.0,
+            "media": (
+                {
+                    "reddit_video": {
+                        "is_gif": False,
+                        "duration": 20,
+                        "fallback_url": "https://v.redd.it/{}/DASH_720.mp4".format(
+                            post_id
+                        ),
+                    }
+                }
+                if media
+                else None
+            ),
+        }
+    )
+
+
+def test_get_videos():
+    reader = RedditReader.__new__(RedditReader)
+    articles = [make_article("p{}".format(i)) for i in range(10)]
+    articles.append(make_article("novideo", media=False))
+    session = FakeSession(missing_audio=("p3",), failing=("p5",))
+
+    results = reader.get_videos(articles, max_workers=4, session=session)
+
+    assert [r.article for r in results] == articles
+    assert 1 < session.max_active <= 4
+    for i, result in enumerate(results[:10]):
+        if i == 5:
+            assert result.video is None
+            assert isinstance(result.error, requests.exceptions.RequestException)
+        else:
+            assert result.error is None
+            assert result.video.cache_key.startswith("reddit/p{}/".format(i))
+    assert results[3].video._audio_url is None
+    assert results[4].video._audio_url == "https://v.redd.it/p4/DASH_audio.mp4"
+    assert isinstance(results[10].error, RedditVideoNotFound)
+
+
+def test_get_videos_malformed_media():
+    reader = RedditReader.__new__(RedditReader)
+    no_url = make_article("nourl")
+    del no_url._media["reddit_video"]["fallback_url"]
+    bad_duration = make_article("badduration")
+    bad_duration._media["reddit_video"]["duration"] = "unknown"
+    articles = [no_url, bad_duration, make_article("good")]
+
+    results = reader.get_videos(articles, session=FakeSession())
+
+    # Malformed posts fail on their own, without aborting the batch.
+    assert isinstance(results[0].error, KeyError)
+    assert isinstance(results[1].error, ValueError)
+    assert results[2].error is None
+    assert results[2].video is not None
+
+
+def test_get_videos_empty():
+    reader = RedditReader.__new__(RedditReader)
+    assert reader.get_videos([]) == []
+
+
+if __name__ == "__main__":
+    pytest.main()
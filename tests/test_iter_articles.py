@@ -0,0 +1,251 @@
+from concurrent.futures import ThreadPoolExecutor
+import prawcore
+import pytest
+import sys
+import threading
+from itertools import islice
+from types import SimpleNamespace
+
+from rvidmaker.readers.cache import ListingCache
+from rvidmaker.readers.reddit import RedditApiException, RedditReader
+
+
+def make_submission(i, over_18=False, video=True):
+    media = None
+    if video:
+        media = {
+            "reddit_video": {
+                "is_gif": False,
+                "duration": 10 + i,
+                "fallback_url": "https://v.redd.it/p{}/DASH_720.mp4".format(i),
+            }
+        }
+    return SimpleNamespace(
+        title="Post {}".format(i),
+        author=None,
+        selftext="",
+        category=None,
+        id="p{}".format(i),
+        url="https://v.redd.it/p{}".format(i),
+        score=1000 - i,
+        over_18=over_18,
+        created_utc=1600000000.0,
+        media=media,
+    )
+
+
+class FakeSubreddit:
+    def __init__(self, submissions):
+        self.submissions = submissions
+        self.pulled = 0
+
+    def top(self, time_filter="all", limit=None):
+        for sub in self.submissions[:limit]:
+            self.pulled += 1
+            yield sub
+
+    hot = top
+
+    def new(self, limit=None):
+        return self.top(limit=limit)
+
+
+def make_reader(submissions, listing_cache=None):
+    subreddit = FakeSubreddit(submissions)
+    reader = RedditReader.__new__(RedditReader)
+    reader.reddit = SimpleNamespace(subreddit=lambda name: subreddit)
+    reader._listing_cache = listing_cache
+    reader._listing_client = None
+    reader._prefetch_pages = 0
+    return reader, subreddit
+
+
+def test_filters():
+    submissions = [
+        make_submission(0),
+        make_submission(1, over_18=True),
+        make_submission(2, video=False),
+        make_submission(3),
+        make_submission(500),
+    ]
+    reader, _ = make_reader(submissions)
+    articles = reader.iter_articles(
+        "videos",
+        min_score=600,
+        include_nsfw=False,
+        video_only=True,
+        max_duration=12,
+    )
+    assert [art.id for art in articles] == ["p0"]
+
+
+def test_stops_early():
+    reader, subreddit = make_reader([make_submission(i) for i in range(100)])
+    articles = reader.iter_articles("videos", limit=100)
+    assert [art.id for art in islice(articles, 3)] == ["p0", "p1", "p2"]
+    assert subreddit.pulled == 3
+
+
+def test_partial_listing_cached(tmp_path):
+    cache = ListingCache(str(tmp_path / "listings.sqlite"))
+    reader, subreddit = make_reader(
+        [make_submission(i) for i in range(100)], listing_cache=cache
+    )
+    articles = reader.iter_articles("videos", time_filter="week", limit=100)
+    list(islice(articles, 5))
+    articles.close()
+    assert len(cache.get("videos", "top", "week", 5)) == 5
+    assert cache.get("videos", "top", "week", 100) is None
+
+    # The cached articles are read back without going through the API.
+    articles = reader.iter_articles("videos", "top", "week", limit=5)
+    assert [art.id for art in articles] == ["p0", "p1", "p2", "p3", "p4"]
+    assert subreddit.pulled == 5
+
+
+def test_iter_subreddits():
+    submissions = {
+        "videos": [make_submission(i) for i in range(5)],
+        "funny": [make_submission(i, over_18=True) for i in range(5)],
+    }
+
+    def connect():
+        def subreddit(name):
+            if name not in submissions:
+                raise RedditApiException("banned")
+            return FakeSubreddit(submissions[name])
+
+        return SimpleNamespace(subreddit=subreddit)
+
+    reader = RedditReader.__new__(RedditReader)
+    reader._listing_cache = None
+    reader._listing_client = None
+    reader._prefetch_pages = 0
+    reader._local = threading.local()
+    reader._connect = connect
+    results = reader.iter_subreddits(
+        ["videos", "funny", "banned"], max_workers=3, limit=3, include_nsfw=False
+    )
+    results = {r.subreddit: r for r in results}
+    assert [art.id for art in results["videos"].articles] == ["p0", "p1", "p2"]
+    assert results["funny"].articles == []
+    assert results["banned"].articles is None
+    assert isinstance(results["banned"].error, RedditApiException)
+
+
+def test_iter_subreddits_before_py39(monkeypatch):
+    class OldExecutor(ThreadPoolExecutor):
+        # Python 3.8 and older have no `cancel_futures`.
+        def shutdown(self, wait=True):
+            super().shutdown(wait=wait)
+
+    module = sys.modules[RedditReader.__module__]
+    monkeypatch.setattr(module, "ThreadPoolExecutor", OldExecutor)
+    monkeypatch.setattr(module, "sys", SimpleNamespace(version_info=(3, 8, 0)))
+    subs = {name: FakeSubreddit([make_submission(0)]) for name in ("a", "b", "c")}
+    reader, _ = make_reader([])
+    reader._local = threading.local()
+    reader._connect = lambda: SimpleNamespace(subreddit=subs.get)
+
+    results = list(reader.iter_subreddits(["a", "b", "c"], max_workers=1))
+    assert sorted(r.subreddit for r in results) == ["a", "b", "c"]
+
+    results = reader.iter_subreddits(["a", "b", "c"], max_workers=1)
+    next(results)
+    results.close()
+
+
+def test_update_pool(tmp_path):
+    cache = ListingCache(str(tmp_path / "listings.sqlite"))
+    submissions = [make_submission(i) for i in range(5, 10)]
+    for i, sub in enumerate(submissions):
+        sub.created_utc = 1600000000.0 - i
+    reader, subreddit = make_reader(submissions, listing_cache=cache)
+    assert reader.update_pool("videos") == 5
+    assert subreddit.pulled == 5
+
+    # Only articles newer than the cursor are added.
+    newer = [make_submission(i) for i in range(2)]
+    for i, sub in enumerate(newer):
+        sub.created_utc = 1600000100.0 - i
+    subreddit.submissions = newer + submissions
+    subreddit.pulled = 0
+    assert reader.update_pool("videos") == 2
+    assert subreddit.pulled == 3
+
+    articles = reader.get_pool_articles("videos", min_score=994)
+    assert [art.id for art in articles] == ["p0", "p1", "p5", "p6"]
+    # Every article is years old.
+    assert reader.get_pool_articles("videos", max_age=24) == []
+
+
+def test_refresh_pool(tmp_path):
+    cache = ListingCache(str(tmp_path / "listings.sqlite"))
+    reader, _ = make_reader([make_submission(i) for i in range(250)], cache)
+    reader.update_pool("videos")
+
+    lookups = []
+
+    def info(fullnames):
+        lookups.append(len(fullnames))
+        for fullname in fullnames:
+            i = int(fullname[len("t3_p") :])
+            if i == 3:
+                # Deleted
+                continue
+            sub = make_submission(i)
+            sub.score = 2000 + i
+            sub.author = SimpleNamespace(name="someone")
+            sub.removed_by_category = "moderator" if i == 4 else None
+            yield sub
+
+    reader.reddit.info = info
+    refreshed = reader.refresh_articles(["p0", "p3", "p4"])
+    assert refreshed["p0"].score == 2000
+    assert refreshed["p3"] is None and refreshed["p4"] is None
+
+    lookups.clear()
+    articles = reader.get_pool_articles("videos", min_score=2240, refresh=True)
+    assert lookups == [100, 100, 50]
+    assert [art.id for art in articles] == [
+        "p{}".format(i) for i in range(249, 239, -1)
+    ]
+    pool_ids = {d["id"] for d in cache.pool("videos")}
+    assert len(pool_ids) == 248 and "p3" not in pool_ids and "p4" not in pool_ids
+
+
+def test_refresh_articles_error():
+    reader, _ = make_reader([])
+
+    def info(fullnames):
+        raise prawcore.exceptions.RequestException(OSError("offline"), (), {})
+        yield
+
+    reader.reddit.info = info
+    with pytest.raises(RedditApiException):
+        reader.refresh_articles(["p0"])
+
+
+def test_listing_error(tmp_path):
+    def top(time_filter="all", limit=None):
+        raise prawcore.exceptions.RequestException(OSError("offline"), (), {})
+        yield
+
+    reader, subreddit = make_reader([], ListingCache(str(tmp_path / "cache.sqlite")))
+    subreddit.top = top
+    with pytest.raises(RedditApiException):
+        list(reader.iter_articles("videos"))
+    with pytest.raises(RedditApiException):
+        reader.update_pool("videos")
+
+
+def test_invalid_listing():
+    reader, _ = make_reader([])
+    with pytest.raises(RedditApiException):
+        list(reader.iter_articles("videos", listing="new"))
+    with pytest.raises(RedditApiException):
+        list(reader.iter_articles("videos", time_filter="decade"))
+
+
+if __name__ == "__main__":
+    pytest.main()
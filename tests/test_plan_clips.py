@@ -0,0 +1,68 @@
+import pytest
+
+from rvidmaker.editor.planner import plan_clips
+
+
+class Candidate:
+    def __init__(self, name, score, duration):
+        self.name = name
+        self.score = score
+        self.duration = duration
+
+
+def names(clips):
+    return [c.name for c in clips]
+
+
+def test_fits_target():
+    candidates = [
+        Candidate("a", 1000, 30),
+        Candidate("b", 900, 30),
+        Candidate("c", 800, 30),
+        Candidate("d", 700, 30),
+    ]
+    plan = plan_clips(candidates, 70, standby_count=1)
+    assert names(plan.clips) == ["a", "b"]
+    assert names(plan.standby) == ["c"]
+    assert plan.duration == 60
+
+
+def test_short_clips_preferred():
+    candidates = [
+        Candidate("long", 1000, 60),
+        Candidate("short1", 900, 10),
+        Candidate("short2", 800, 10),
+    ]
+    plan = plan_clips(candidates, 60, standby_count=1, length_weight=1)
+    # Candidates keep their original order.
+    assert names(plan.clips) == ["short1", "short2"]
+    assert plan.standby == []
+
+    plan = plan_clips(candidates, 60, length_weight=0)
+    assert names(plan.clips) == ["long"]
+
+
+def test_standby_fits_budget():
+    candidates = [
+        Candidate("a", 1000, 20),
+        Candidate("b", 900, 30),
+        Candidate("long", 1000, 45),
+        Candidate("c", 500, 25),
+    ]
+    plan = plan_clips(candidates, 60, length_weight=1)
+    assert names(plan.clips) == ["a", "b"]
+    # Swapping the long clip in for either chosen clip would go over the target.
+    assert names(plan.standby) == ["c"]
+    for clip in plan.clips:
+        assert plan.duration - clip.duration + plan.standby[0].duration <= 60
+
+
+def test_unknown_duration_ignored():
+    candidates = [Candidate("unknown", 1000, None), Candidate("known", 10, 5)]
+    plan = plan_clips(candidates, 60)
+    assert names(plan.clips) == ["known"]
+    assert plan.standby == []
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,88 @@
+import pytest
+import time
+
+from rvidmaker.readers.prefetch import prefetch
+
+
+class SlowPages:
+    """Yields items in pages, taking a while to fetch each page"""
+
+    def __init__(self, pages, page_size, delay):
+        self.pages = pages
+        self.page_size = page_size
+        self.delay = delay
+        self.fetched = 0
+
+    def __iter__(self):
+        for page in range(self.pages):
+            time.sleep(self.delay)
+            self.fetched += 1
+            for i in range(self.page_size):
+                yield page * self.page_size + i
+
+
+def test_order():
+    assert list(prefetch(range(1000), 10)) == list(range(1000))
+    assert list(prefetch(range(10), 0)) == list(range(10))
+
+
+def test_overlaps_work():
+    pages = SlowPages(pages=4, page_size=10, delay=0.1)
+    start = time.time()
+    for i in prefetch(pages, 10):
+        if i % 10 == 0:
+            # Work on each page takes as long as fetching one.
+            time.sleep(0.1)
+    # Serially, fetching and working would take 0.8s.
+    assert time.time() - start < 0.65
+
+
+def test_bounded_and_closed():
+    pages = SlowPages(pages=100, page_size=10, delay=0.01)
+    items = prefetch(pages, 10)
+    assert next(items) == 0
+    time.sleep(0.2)
+    # The first page, plus at most one page read ahead, plus one blocked on the queue.
+    assert pages.fetched <= 3
+    items.close()
+    time.sleep(0.3)
+    fetched = pages.fetched
+    time.sleep(0.2)
+    assert pages.fetched == fetched
+
+
+def test_close_waits_for_producer():
+    state = {"pulled": 0, "closed": False}
+
+    def source():
+        try:
+            for i in range(100):
+                state["pulled"] += 1
+                time.sleep(0.05)
+                yield i
+        finally:
+            state["closed"] = True
+
+    items = prefetch(source(), 2)
+    assert next(items) == 0
+    items.close()
+    # The source is closed, and not pulled from, once the generator is closed.
+    assert state["closed"]
+    pulled = state["pulled"]
+    time.sleep(0.2)
+    assert state["pulled"] == pulled <= 4
+
+
+def test_errors():
+    def failing():
+        yield 1
+        raise ValueError("page failed")
+
+    items = prefetch(failing(), 5)
+    assert next(items) == 1
+    with pytest.raises(ValueError):
+        next(items)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,26 @@
+import pytest
+
+from rvidmaker.editor.overlay import render_caption
+
+
+def test_caption_is_transparent():
+    img = render_caption("A title", "someone", (1920, 1080))
+    assert img.mode == "RGBA"
+    # Pixels away from the text are fully transparent.
+    assert img.getpixel((img.width - 1, img.height - 1))[3] == 0
+
+
+def test_caption_fits_resolution():
+    img = render_caption("A very long title " * 20, "someone", [640, 360])
+    assert img.width <= 640
+    assert img.height <= 360
+
+
+def test_caption_is_cached():
+    assert render_caption("A title", "someone", [1920, 1080]) is render_caption(
+        "A title", "someone", (1920, 1080)
+    )
+
+
+if __name__ == "__main__":
+    pytest.main()
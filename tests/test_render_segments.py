@@ -0,0 +1,107 @@
+import os
+import shutil
+
+import ffmpeg
+from PIL import Image
+import pytest
+
+from rvidmaker.editor import VideoCompiler, ffmpegrender, moviepyrender
+from rvidmaker.videos import VideoRef
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None, reason="FFmpeg is not installed"
+)
+
+# Moviepy 1.0.3 resizes clips with a Pillow constant removed in Pillow 10.
+requires_moviepy_resize = pytest.mark.skipif(
+    not hasattr(Image, "ANTIALIAS"), reason="Moviepy cannot resize with this Pillow"
+)
+
+RES = (64, 48)
+
+
+def make_clip(path, audio=True):
+    streams = [ffmpeg.input("testsrc=size=64x48:rate=30:d=1", f="lavfi").video]
+    if audio:
+        streams.append(ffmpeg.input("sine=d=1", f="lavfi").audio)
+    ffmpeg.output(*streams, path, vcodec="libx264", pix_fmt="yuv420p").run(
+        quiet=True, overwrite_output=True
+    )
+    return path
+
+
+def assert_playable(path):
+    # Decoding fails if either stream is missing.
+    video = ffmpeg.input(path)
+    ffmpeg.output(video.video, video.audio, "-", f="null").run(quiet=True)
+
+
+class ClipRef(VideoRef):
+    def __init__(self, title, path):
+        self._title = title
+        self._path = path
+
+    def download(self, output_path):
+        output_path = "{}.mp4".format(output_path)
+        shutil.copyfile(self._path, output_path)
+        return output_path
+
+    @property
+    def title(self):
+        return self._title
+
+    @property
+    def author(self):
+        return "author"
+
+
+@pytest.fixture
+def clips(tmp_path):
+    return [
+        make_clip(str(tmp_path / "audio.mp4")),
+        make_clip(str(tmp_path / "silent.mp4"), audio=False),
+    ]
+
+
+@requires_moviepy_resize
+def test_render_segment(tmp_path, clips):
+    for i, path in enumerate(clips):
+        segment_path = str(tmp_path / "segment{}.mp4".format(i))
+        duration = moviepyrender.render_segment(
+            path, "Title", "author", None, RES, 0.7, (0, 0, 0), segment_path
+        )
+        assert duration == pytest.approx(1, abs=0.1)
+        # Segments get silence if the clip has no audio, so they can all be joined.
+        assert_playable(segment_path)
+
+
+def test_concat_segments(tmp_path):
+    segment_dir = tmp_path / "segments"
+    segment_dir.mkdir()
+    segment_paths = [
+        make_clip(str(segment_dir / "it's {}.mp4".format(i))) for i in range(2)
+    ]
+    output_path = str(tmp_path / "out.mp4")
+    ffmpegrender.concat_segments(segment_paths, output_path).run(
+        quiet=True, overwrite_output=True
+    )
+    assert_playable(output_path)
+    with open(str(segment_dir / "segments.txt")) as f:
+        assert f.read().count("file ") == 2
+
+
+@requires_moviepy_resize
+def test_render_segments_backend(tmp_path, monkeypatch, clips):
+    monkeypatch.chdir(tmp_path)
+    compiler = VideoCompiler(censor=None, backend="segments")
+    for i, path in enumerate(clips):
+        compiler.add_video(ClipRef("clip{}".format(i), path))
+    output_path = str(tmp_path / "out.mp4")
+    manifest = compiler.render_video(RES, output_path)
+    assert [entry.video.title for entry in manifest] == ["clip0", "clip1"]
+    assert_playable(output_path)
+    assert not os.path.exists(".downloaded")
+
+
+if __name__ == "__main__":
+    pytest.main()
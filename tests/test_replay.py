@@ -0,0 +1,139 @@
+import http.server
+import json
+import os
+import pytest
+import socketserver
+import threading
+import time
+
+from rvidmaker.replay import (
+    INDEX_NAME,
+    FixtureArchive,
+    record_session,
+    replay_session,
+)
+from rvidmaker.videos.segmented import download_file
+
+BODY = bytes(range(256)) * 64
+
+
+class Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    # `http.server.ThreadingHTTPServer` needs Python 3.7.
+    daemon_threads = True
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/api/v1/access_token"):
+            body = json.dumps({"access_token": "secret", "expires_in": 3600}).encode()
+        elif self.path.startswith("/video"):
+            body = BODY
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        range_header = self.headers.get("Range")
+        if range_header:
+            start, end = (int(x) for x in range_header[len("bytes=") :].split("-"))
+            end = min(end, len(body) - 1)
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", "bytes {}-{}/{}".format(start, end, len(body))
+            )
+            body = body[start : end + 1]
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Custom", "yes")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = Server(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}".format(httpd.server_address[1])
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def archive_dir(tmp_path, server):
+    root = str(tmp_path / "archive")
+    session = record_session(root)
+    assert session.get(server + "/video?b=2&a=1").content == BODY
+    token = session.get(server + "/api/v1/access_token").json()
+    assert token["access_token"] == "secret"
+    assert session.get(server + "/missing").status_code == 404
+    return root
+
+
+def test_record(archive_dir):
+    with open(os.path.join(archive_dir, INDEX_NAME)) as f:
+        index = json.load(f)
+    assert len(index["entries"]) == 3
+    assert len(FixtureArchive(archive_dir)) == 3
+    assert "secret" not in json.dumps(index)
+
+
+def test_replay(archive_dir, server):
+    session = replay_session(archive_dir)
+    # Query parameters may be in any order.
+    response = session.get(server + "/video?a=1&b=2", stream=True)
+    assert response.status_code == 200
+    assert response.headers["X-Custom"] == "yes"
+    assert b"".join(response.iter_content(1000)) == BODY
+    assert session.get(server + "/missing").status_code == 404
+    assert session.get(server + "/unrecorded").status_code == 404
+    token = session.get(server + "/api/v1/access_token").json()
+    assert token["access_token"] == "replay"
+
+    head = session.head(server + "/video?a=1&b=2")
+    assert head.status_code == 200
+    assert head.headers["Content-Length"] == str(len(BODY))
+    assert head.content == b""
+
+
+def test_replay_range(archive_dir, server):
+    session = replay_session(archive_dir)
+    url = server + "/video?a=1&b=2"
+    response = session.get(url, headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == "bytes 100-199/{}".format(len(BODY))
+    assert response.content == BODY[100:200]
+    assert session.get(url, headers={"Range": "bytes=-10"}).content == BODY[-10:]
+    assert session.get(url, headers={"Range": "bytes=16000-"}).content == BODY[16000:]
+    response = session.get(url, headers={"Range": "bytes=99999-"})
+    assert response.status_code == 416
+
+
+def test_replay_segmented_download(tmp_path, server):
+    root = str(tmp_path / "archive")
+    url = server + "/video"
+    path = str(tmp_path / "recorded.mp4")
+    download_file(url, path, session=record_session(root), segment_size=1000)
+    with open(path, "rb") as f:
+        assert f.read() == BODY
+    # Only the whole file is recorded, not each range.
+    assert len(FixtureArchive(root)) == 1
+
+    path = str(tmp_path / "replayed.mp4")
+    download_file(url, path, session=replay_session(root), segment_size=1000)
+    with open(path, "rb") as f:
+        assert f.read() == BODY
+
+
+def test_replay_throttled(archive_dir, server):
+    session = replay_session(archive_dir, latency=0.05, bandwidth=len(BODY) * 5)
+    start = time.time()
+    assert session.get(server + "/video?a=1&b=2").content == BODY
+    assert time.time() - start >= 0.2
+
+
+if __name__ == "__main__":
+    pytest.main()